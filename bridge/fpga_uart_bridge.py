@@ -5,6 +5,7 @@ import requests
 import threading
 import numpy as np
 import collections
+import struct
 
 # Using Flask-SocketIO to push data to frontend if needed, 
 # or just forwarding analysis results to Java.
@@ -13,11 +14,17 @@ import collections
 # 2. Buffers Audio
 # 3. Detects Tone (using dsp.py)
 # 4. Sends "Press Event" to Java
+#
+# Capture / replay (debugging without hardware):
+#   python bridge/fpga_uart_bridge.py --capture session.cap              # record raw serial bytes
+#   python bridge/fpga_uart_bridge.py --replay session.cap --speed 4     # same pipeline, 4x real time
+#   python bridge/fpga_uart_bridge.py --replay session.cap --speed 0 --no-post   # throughput benchmark
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from src.core import dsp, config
+from src.core import dsp, config, instrument
+from src.ml.detectors import available_detectors, create_detector
 
 # Config
 BAUD_RATE = 115200
@@ -38,13 +45,151 @@ def find_fpga_port():
         return ports[0].device
     return None
 
-def process_audio_stream(port_name):
-    print(f"Connecting to FPGA on {port_name}...")
-    try:
-        ser = serial.Serial(port_name, BAUD_RATE, timeout=0.1)
-    except Exception as e:
-        print(f"Error opening serial: {e}")
-        return
+
+# ===== Capture / replay =====
+# Capture file: CAPTURE_MAGIC, float64 wall-clock start time, then one record per read():
+# float64 seconds since start + uint32 length + the raw bytes (little-endian).
+# A zero-length record marks when the pipeline first read the clock (its stabilization start).
+CAPTURE_MAGIC = b'DTMFCAP1'
+_RECORD = struct.Struct('<dI')
+
+
+class CaptureSerial:
+    """Wraps a serial port and records every read() with its timestamp"""
+
+    def __init__(self, ser, path):
+        self.ser = ser
+        self.file = open(path, 'wb')
+        self.t0 = time.time()
+        self.marked = False
+        self.file.write(CAPTURE_MAGIC + struct.pack('<d', self.t0))
+
+    def clock(self):
+        now = time.time()
+        if not self.marked:
+            self.file.write(_RECORD.pack(now - self.t0, 0))
+            self.marked = True
+        return now
+
+    @property
+    def in_waiting(self):
+        return self.ser.in_waiting
+
+    def read(self, n=1):
+        data = self.ser.read(n)
+        if data:
+            self.file.write(_RECORD.pack(time.time() - self.t0, len(data)) + data)
+        return data
+
+    def close(self):
+        self.file.close()
+        self.ser.close()
+
+
+def load_capture(path):
+    """:return: (start time, [(seconds since start, bytes), ...])"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+        raise ValueError(f"{path} is not a bridge capture file")
+    (t0,) = struct.unpack_from('<d', data, len(CAPTURE_MAGIC))
+    pos = len(CAPTURE_MAGIC) + 8
+    records = []
+    while pos + _RECORD.size <= len(data):
+        t, n = _RECORD.unpack_from(data, pos)
+        pos += _RECORD.size
+        records.append((t, data[pos:pos + n]))
+        pos += n
+    return t0, records
+
+
+class ReplaySource:
+    """
+    Serial-like source that plays back a capture with the original read() chunking.
+    speed: 1.0 = real time, N = N x faster, 0 = as fast as possible.
+    clock() follows the capture timeline, so time-based logic (stabilization) behaves as live.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.t0, records = load_capture(path)
+        self.records = [r for r in records if r[1]]
+        self.speed = speed
+        self.index = 0
+        self.offset = 0          # bytes of the current record already read
+        self.now = records[0][0] if records else 0.0     # capture time of the last delivered record
+        self.start = None
+
+    @property
+    def exhausted(self):
+        return self.index >= len(self.records)
+
+    @property
+    def total_bytes(self):
+        return sum(len(data) for _, data in self.records)
+
+    @property
+    def duration(self):
+        return self.records[-1][0] if self.records else 0.0
+
+    def _due(self):
+        if self.exhausted:
+            return False
+        if not self.speed:
+            return True
+        if self.start is None:
+            self.start = time.monotonic() - self.records[0][0] / self.speed
+        return (time.monotonic() - self.start) * self.speed >= self.records[self.index][0]
+
+    @property
+    def in_waiting(self):
+        return len(self.records[self.index][1]) - self.offset if self._due() else 0
+
+    def read(self, n=1):
+        if not self._due():
+            return b''
+        t, data = self.records[self.index]
+        chunk = data[self.offset:self.offset + n]
+        self.offset += len(chunk)
+        if self.offset >= len(data):
+            self.index += 1
+            self.offset = 0
+        self.now = t
+        return chunk
+
+    def clock(self):
+        return self.t0 + self.now
+
+    def close(self):
+        pass
+
+
+def process_audio_stream(source, detector=None, on_event=None):
+    """
+    :param source: serial port name, or any serial-like object with in_waiting / read()
+                   (CaptureSerial, ReplaySource). Objects with an `exhausted` attribute end
+                   the loop when it becomes true; a `clock()` method replaces time.time.
+    :param detector: Detector from the registry (src.ml.detectors);
+                     default is Goertzel with validation
+    :param on_event: called as on_event(key, waveform) for each new key; default send_to_java
+    :return: number of events
+    With instrumentation enabled (src.core.instrument) every stage is timed as bridge.<stage>
+    (serial_read, convert, filter, detect, http_post); bytes read, blocks, events and dropped
+    samples are counted, and the pending serial bytes / block fill are reported as gauges.
+    """
+    if detector is None:
+        detector = create_detector('goertzel', require_valid=True)
+    if on_event is None:
+        on_event = send_to_java
+    if isinstance(source, str):
+        print(f"Connecting to FPGA on {source}...")
+        try:
+            ser = serial.Serial(source, BAUD_RATE, timeout=0.1)
+        except Exception as e:
+            print(f"Error opening serial: {e}")
+            return 0
+    else:
+        ser = source
+    clock = getattr(ser, 'clock', time.time)
 
     print("Listening for waveforms...")
     
@@ -52,17 +197,23 @@ def process_audio_stream(port_name):
     current_block = []
     last_key = None
     silence_cnt = 0
+    # Causal band-pass with state carried across blocks (no per-block edge transients)
+    bp_filter = dsp.BandpassStream()
     
     # 忽略启动后前 1 秒的数据，等待 FPGA 和串口稳定
     # Ignore startup transient noise
-    start_time = time.time()
+    start_time = clock()
     stabilized = False
+    n_events = 0
 
-    
-    while True:
+    while not getattr(ser, 'exhausted', False):
         # Read byte
-        if ser.in_waiting:
-            chunk = ser.read(ser.in_waiting)
+        waiting = ser.in_waiting
+        instrument.gauge('bridge.queue_depth', waiting)
+        if waiting:
+            with instrument.timer('bridge.serial_read'):
+                chunk = ser.read(waiting)
+            instrument.count('bridge.bytes_read', len(chunk))
             # Convert unsigned byte (0-255) to float (-1.0 to 1.0)
             # FPGA sends: (audio >> 8) + 128
             # Restore roughly: (val - 128) / 128.0
@@ -70,9 +221,11 @@ def process_audio_stream(port_name):
             # if len(chunk) > 0:
             #      print(f".", end="", flush=True)
 
-            for b in chunk:
-                val = (float(b) - 128.0) / 128.0
-                current_block.append(val)
+            with instrument.timer('bridge.convert'):
+                for b in chunk:
+                    val = (float(b) - 128.0) / 128.0
+                    current_block.append(val)
+            instrument.gauge('bridge.block_fill', len(current_block))
             # FORCE DEBUG: Print raw chunk size if > 0
             # print(f"[Debug] Rx {len(chunk)} bytes")
         
@@ -80,7 +233,8 @@ def process_audio_stream(port_name):
         if len(current_block) >= BLOCK_SIZE:
             # Check for stabilization
             if not stabilized:
-                if time.time() - start_time < 1.0:
+                if clock() - start_time < 1.0:
+                    instrument.count('bridge.samples_dropped', len(current_block))
                     current_block = [] # Discard data during stabilization
                     continue
                 else:
@@ -88,14 +242,20 @@ def process_audio_stream(port_name):
                     print("   [Info] Stream stabilized. Ready for events.")
 
             # Analyze
+            instrument.count('bridge.blocks')
             sig = np.array(current_block)
-            key = dsp.identify_key(sig, use_filter=True, require_valid=True)
+            with instrument.timer('bridge.filter'):
+                filtered = bp_filter.process(sig)
+            with instrument.timer('bridge.detect'):
+                key = detector.detect(filtered).key
             
             if key:
                 silence_cnt = 0
                 if last_key != key:
                     print(f"   [UART Event] Detected Tone: {key}")
-                    send_to_java(key, sig)
+                    instrument.count('bridge.events')
+                    n_events += 1
+                    on_event(key, sig)
                     last_key = key
             else:
                 silence_cnt += 1
@@ -103,10 +263,12 @@ def process_audio_stream(port_name):
                     last_key = None
             
             # Slide buffer (Overlap?)
-            # For simplicity, just reset
+            # For simplicity, just reset; samples beyond BLOCK_SIZE are dropped
+            instrument.count('bridge.samples_dropped', len(current_block) - BLOCK_SIZE)
             current_block = [] # Non-overlapping for now to keep up with speed
-            
-        time.sleep(0.001)
+        elif not waiting:
+            time.sleep(0.001)
+    return n_events
 
 def send_to_java(key, waveform):
     """Send detected key AND actual waveform to Java for adaptive analysis"""
@@ -114,18 +276,71 @@ def send_to_java(key, waveform):
         # Send waveform as JSON array (limit to 4000 samples for efficiency)
         waveform_list = waveform[:4000].tolist() if len(waveform) > 4000 else waveform.tolist()
         
-        resp = requests.post(
-            JAVA_URL, 
-            params={'key': key, 'duration': 0.1, 'snr': 0, 'noiseType': 'FPGA_RAW', 'source': 'hardware'},
-            json={'waveform': waveform_list}
-        )
+        with instrument.timer('bridge.http_post'):
+            resp = requests.post(
+                JAVA_URL, 
+                params={'key': key, 'duration': 0.1, 'snr': 0, 'noiseType': 'FPGA_RAW', 'source': 'hardware'},
+                json={'waveform': waveform_list}
+            )
         print(f"   [Bridge] Sent to Java: {resp.status_code}")
     except Exception as e:
+        instrument.count('bridge.post_errors')
         print(f"   [Bridge] Error sending to Java: {e}")
 
 if __name__ == "__main__":
-    port = find_fpga_port()
-    if port:
-        process_audio_stream(port)
-    else:
-        print("No serial port found. Check USB connection.")
+    import argparse
+    parser = argparse.ArgumentParser(description="FPGA UART -> DTMF detector -> Java bridge")
+    parser.add_argument('--detector', choices=available_detectors(), default='goertzel')
+    parser.add_argument('--port', help="serial device (default: auto-detect; a pty from the load generator works too)")
+    parser.add_argument('--capture', metavar='FILE', help="record the raw serial bytes with timestamps to FILE")
+    parser.add_argument('--replay', metavar='FILE', help="feed a capture file instead of the serial port")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay speed: 1 = real time, N = N x, 0 = as fast as possible (throughput benchmark)")
+    parser.add_argument('--no-post', action='store_true', help="print events only, do not post them to Java")
+    parser.add_argument('--metrics', metavar='FILE', help="enable instrumentation and write periodic summaries here")
+    parser.add_argument('--metrics-format', choices=['json', 'prometheus'], default='json')
+    parser.add_argument('--metrics-interval', type=float, default=10.0, help="summary period in seconds")
+    parser.add_argument('--metrics-port', type=int,
+                        help="enable instrumentation and serve /metrics (Prometheus) and /metrics.json on localhost")
+    args = parser.parse_args()
+
+    reporter = None
+    if args.metrics or args.metrics_port:
+        instrument.enable()
+        reporter = instrument.Reporter(args.metrics, args.metrics_interval, args.metrics_format, echo=True).start()
+        if args.metrics_port:
+            instrument.serve_metrics(args.metrics_port)
+            print(f"   [Metrics] http://127.0.0.1:{args.metrics_port}/metrics")
+
+    kwargs = {'require_valid': True} if args.detector == 'goertzel' else {}
+    detector = create_detector(args.detector, **kwargs)
+    on_event = (lambda key, waveform: None) if args.no_post else None
+    source = None
+    try:
+        if args.replay:
+            source = ReplaySource(args.replay, args.speed)
+            print(f"Replaying {args.replay}: {source.duration:.1f}s, {source.total_bytes} bytes "
+                  f"at {'max' if not args.speed else f'{args.speed:g}x'} speed")
+            t0 = time.perf_counter()
+            n_events = process_audio_stream(source, detector, on_event)
+            elapsed = time.perf_counter() - t0
+            audio_s = source.total_bytes / SAMPLE_RATE
+            print(f"Replay done: {n_events} events, {audio_s:.1f}s of audio in {elapsed:.2f}s "
+                  f"({audio_s / elapsed:.1f}x real time)")
+        else:
+            port = args.port or find_fpga_port()
+            if port and args.capture:
+                source = CaptureSerial(serial.Serial(port, BAUD_RATE, timeout=0.1), args.capture)
+                print(f"Capturing serial bytes to {args.capture}")
+                process_audio_stream(source, detector, on_event)
+            elif port:
+                process_audio_stream(port, detector, on_event)
+            else:
+                print("No serial port found. Check USB connection.")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if source is not None:
+            source.close()
+        if reporter is not None:
+            reporter.stop()
@@ -0,0 +1,101 @@
+library IEEE;
+use IEEE.STD_LOGIC_1164.ALL;
+use IEEE.NUMERIC_STD.ALL;
+use std.textio.all;
+use work.dtmf_pkg.ALL;
+
+-- Reference dump for the bit-exact Python model (src/core/fpga_model.py)
+-- Presses key_idx 0..15 in turn (TONE_CYCLES each, GAP_CYCLES apart) and, like ax309_top,
+-- samples audio_out every 6250 clocks. Each line of DUMP_FILE: <edge number> <audio_out>
+-- Edge numbers count rising edges after reset release, starting at 1.
+-- Run: ./simulate_vhdl.sh --dump ; then python -m src.core.fpga_model --compare sim_build/fpga_dump.txt
+entity model_dump_tb is
+    generic (
+        TONE_CYCLES : natural := 1_000_000;   -- 20 ms
+        GAP_CYCLES  : natural := 250_000;     -- 5 ms
+        DUMP_FILE   : string := "fpga_dump.txt"
+    );
+end model_dump_tb;
+
+architecture Behavioral of model_dump_tb is
+    COMPONENT dtmf_generator
+    PORT(
+        clk : IN  std_logic;
+        rst_n : IN  std_logic;
+        key_idx : IN  integer range 0 to 15;
+        key_valid : IN  std_logic;
+        audio_out : OUT signed(15 downto 0)
+    );
+    END COMPONENT;
+
+    constant CLK_PERIOD  : time := 20 ns;
+    constant SLOT_CYCLES : natural := TONE_CYCLES + GAP_CYCLES;
+
+    signal clk : std_logic := '0';
+    signal rst_n : std_logic := '0';
+    signal key_idx : integer range 0 to 15 := 0;
+    signal key_valid : std_logic := '0';
+    signal audio_out : signed(15 downto 0);
+    signal done : boolean := false;
+
+begin
+
+    uut: dtmf_generator PORT MAP (
+        clk => clk,
+        rst_n => rst_n,
+        key_idx => key_idx,
+        key_valid => key_valid,
+        audio_out => audio_out
+    );
+
+    -- Clock stops when the schedule is finished, which ends the simulation
+    clk_process: process
+    begin
+        while not done loop
+            clk <= '0';
+            wait for CLK_PERIOD/2;
+            clk <= '1';
+            wait for CLK_PERIOD/2;
+        end loop;
+        wait;
+    end process;
+
+    rst_n <= '1' after 100 ns;
+
+    -- Stimulus assigned at edge n is seen by the generator from edge n+1
+    stim_dump: process(clk)
+        file dump : text open write_mode is DUMP_FILE;
+        variable l : line;
+        variable n : natural := 0;
+        variable m : natural;
+    begin
+        if rising_edge(clk) and rst_n = '1' then
+            if n = 0 then
+                write(l, string'("# tone_cycles "));
+                write(l, TONE_CYCLES);
+                write(l, string'(" gap_cycles "));
+                write(l, GAP_CYCLES);
+                writeline(dump, l);
+            end if;
+            n := n + 1;
+            m := n - 1;
+            if m / SLOT_CYCLES < 16 and m mod SLOT_CYCLES < TONE_CYCLES then
+                key_idx <= m / SLOT_CYCLES;
+                key_valid <= '1';
+            else
+                key_valid <= '0';
+            end if;
+            -- Sampler of ax309_top: audio_out as it was before this edge
+            if n mod 6250 = 0 then
+                write(l, n);
+                write(l, string'(" "));
+                write(l, to_integer(audio_out));
+                writeline(dump, l);
+            end if;
+            if n = 16 * SLOT_CYCLES then
+                done <= true;
+            end if;
+        end if;
+    end process;
+
+end Behavioral;
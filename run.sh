@@ -16,11 +16,13 @@ show_usage() {
     echo ""
     echo "Commands:"
     echo "  gui       Launch the Java Web GUI (Interactive demo)"
-    echo "  bridge    Start the FPGA-to-Java serial bridge (Python)"
+    echo "  bridge    Start the FPGA-to-Java serial bridge (extra args passed through, e.g. --metrics m.json)"
     echo "  all       Start both GUI and Bridge together"
     echo "  stop      Stop the running GUI server (kill port 8081)"
     echo "  sim       Run basic Python simulation (Generates plots in images/)"
     echo "  exp       Run performance comparison experiments"
+    echo "  bench     Run detector throughput/latency benchmarks (extra args passed through)"
+    echo "  server    Start the multi-channel detection server (extra args passed through, e.g. --tcp :9300)"
     echo "  report    Build the LaTeX report (PDF)"
     echo "  clean     Remove temporary files and build artifacts"
     echo "  help      Show this help message"
@@ -66,7 +68,7 @@ run_bridge() {
         pip install pyserial requests numpy
     fi
     
-    ./venv/bin/python ./bridge/fpga_uart_bridge.py
+    ./venv/bin/python ./bridge/fpga_uart_bridge.py "$@"
 }
 
 run_all() {
@@ -101,6 +103,18 @@ run_exp() {
     venv/bin/python3 -m src.experiments.extreme_talkoff_test
 }
 
+run_bench() {
+    echo -e "${GREEN}Running Detector Benchmarks...${NC}"
+    export PYTHONPATH=$PYTHONPATH:.
+    venv/bin/python3 -m src.experiments.detector_benchmark "$@"
+}
+
+run_server() {
+    echo -e "${GREEN}Starting Multi-channel Detection Server...${NC}"
+    export PYTHONPATH=$PYTHONPATH:.
+    venv/bin/python3 -m src.detection_server "$@"
+}
+
 build_report() {
     echo -e "${GREEN}Building LaTeX Report...${NC}"
     
@@ -157,7 +171,8 @@ case "$1" in
         run_gui
         ;;
     bridge)
-        run_bridge
+        shift
+        run_bridge "$@"
         ;;
     all)
         run_all
@@ -172,6 +187,14 @@ case "$1" in
     exp)
         run_exp
         ;;
+    bench)
+        shift
+        run_bench "$@"
+        ;;
+    server)
+        shift
+        run_server "$@"
+        ;;
     report)
         build_report
         ;;
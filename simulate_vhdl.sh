@@ -1,6 +1,8 @@
 #!/bin/bash
 
 # VHDL Simulation Script for GHDL + GTKWave
+# Usage: ./simulate_vhdl.sh          (waveforms)
+#        ./simulate_vhdl.sh --dump   (also dump the reference output for src/core/fpga_model.py)
 # Exit on error
 set -e
 
@@ -20,10 +22,12 @@ ghdl -a --std=08 --workdir=$WORK_DIR fpga/ax309_top.vhd
 # 3. Testbenches
 ghdl -a --std=08 --workdir=$WORK_DIR fpga/dtmf_tb.vhd
 ghdl -a --std=08 --workdir=$WORK_DIR fpga/dataset_tb.vhd
+ghdl -a --std=08 --workdir=$WORK_DIR fpga/model_dump_tb.vhd
 
 echo "--- [2/3] Elaborating testbenches ---"
 ghdl -e --std=08 --workdir=$WORK_DIR dtmf_tb
 ghdl -e --std=08 --workdir=$WORK_DIR dataset_tb
+ghdl -e --std=08 --workdir=$WORK_DIR model_dump_tb
 
 echo "--- [3/3] Running simulations ---"
 # 1. Run Algorithm Simulation (dtmf_tb)
@@ -35,6 +39,13 @@ echo "   > Running dataset_tb..."
 # dataset_tb involves 20ms debounce, so we simulate for 40ms
 ghdl -r --std=08 --workdir=$WORK_DIR dataset_tb --stop-time=40ms --wave=top_wave.ghw
 
+# 3. Reference dump for the Python model (16 keys x 25 ms, ends by itself)
+if [ "$1" = "--dump" ]; then
+    echo "   > Running model_dump_tb..."
+    ghdl -r --std=08 --workdir=$WORK_DIR model_dump_tb -gDUMP_FILE=$WORK_DIR/fpga_dump.txt
+    python3 -m src.core.fpga_model --compare $WORK_DIR/fpga_dump.txt
+fi
+
 echo ""
 echo "=========================================================="
 echo "SUCCESS: Both simulations finished."
@@ -0,0 +1,205 @@
+"""
+analyze_sessions.py
+电话会话批量分析 (audio/<session>/*.wav)
+
+Web 端电话模式把每次按键保存为 audio/<session>/NN_<key>.wav，
+并在 Java 端逐个文件串行分析。本工具对全部 (或指定) 会话批量重新打分：
+- 进程池并行：每个工作进程负责整个会话 (读 WAV + 检测)
+- 会话内批量检测：检测器由注册表 (ml.detectors) 按名称创建，统一调用 detect_batch
+- 输出每个会话的号码串、与文件名标注按键的对比准确率，以及延迟 / 吞吐统计
+- 无法读取的 WAV 记录在会话的 errors 中 ({'file', 'error'})，不参与检测与准确率
+
+Usage:
+    python -m src.analyze_sessions                         # 全部会话, Goertzel 全长检测
+    python -m src.analyze_sessions --detector adaptive -j 8 -o report.json
+    python -m src.analyze_sessions call_20250101_120000 --detector fixed --duration 0.04
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.io import wavfile
+
+from .core import config
+from .core.decoder import pcm_to_float
+from .ml.detectors import available_detectors, create_detector
+
+# 'fixed' 为截取固定时长的 Goertzel 检测 (goertzel + --duration)
+DETECTORS = ('fixed',) + tuple(available_detectors())
+
+# 工作进程内的检测器 (由 _init_worker 设置，避免每个会话重复构造 / 训练)
+_worker_state = {}
+
+
+def list_sessions(root, names=None):
+    """列出包含 WAV 文件的会话目录，按名称排序"""
+    if not os.path.isdir(root):
+        return []
+    sessions = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if names and name not in names:
+            continue
+        if os.path.isdir(path) and any(f.lower().endswith('.wav') for f in os.listdir(path)):
+            sessions.append(path)
+    return sessions
+
+
+def _expected_key(filename):
+    """从文件名提取标注按键 (格式: 01_5.wav)，无法解析时返回 None"""
+    stem = os.path.splitext(filename)[0]
+    parts = stem.split('_')
+    return parts[1][0] if len(parts) > 1 and parts[1] else None
+
+
+def build_detector(name, rf_samples=200, duration=None):
+    """
+    按名称从检测器注册表创建检测器；随机森林在主进程训练一次，再分发给各工作进程
+    :param duration: 固定时长模式的截取时长 (秒)，None 表示使用完整信号
+    """
+    if name in ('fixed', 'goertzel'):
+        return create_detector('goertzel', duration=duration)
+    if name == 'music':
+        return create_detector('music', n_elements=80, n_signals=4)
+    if name == 'rf':
+        return create_detector('rf', samples_per_key=rf_samples)
+    if name == 'cascade':
+        return create_detector('cascade', fallback='rf', samples_per_key=rf_samples)
+    return create_detector(name)
+
+
+def detect_signals(detector, signals):
+    """
+    对一组信号批量检测 (长度不同的信号由检测器按长度分组)
+    :return: 按键列表 (检测失败为 None)
+    """
+    return [d.key for d in detector.detect_batch(signals)]
+
+
+def _init_worker(detector):
+    _worker_state.update(detector=detector)
+
+
+def analyze_session(session_dir):
+    """分析单个会话 (在工作进程中执行)"""
+    t_start = time.perf_counter()
+    files = sorted(f for f in os.listdir(session_dir) if f.lower().endswith('.wav'))
+    names, signals, errors = [], [], []
+    for fname in files:
+        try:
+            fs, data = wavfile.read(os.path.join(session_dir, fname))
+            if data.ndim > 1:
+                data = data[:, 0]
+            sig = pcm_to_float(data)
+            if fs != config.fs:
+                from .core.resample import resample
+                sig = resample(sig, fs, config.fs)
+        except Exception as e:
+            errors.append({'file': fname, 'error': f"{type(e).__name__}: {e}"})
+            continue
+        names.append(fname)
+        signals.append(sig)
+    t_loaded = time.perf_counter()
+
+    keys = detect_signals(_worker_state['detector'], signals)
+    t_done = time.perf_counter()
+
+    details = []
+    for fname, key in zip(names, keys):
+        expected = _expected_key(fname)
+        details.append({'file': fname, 'expected': expected, 'identified': key,
+                        'match': expected is not None and key == expected})
+    labelled = [d for d in details if d['expected'] is not None]
+
+    return {
+        'session': os.path.basename(session_dir),
+        'digits': ''.join(key if key else '?' for key in keys),
+        'files': len(names),
+        'accuracy': sum(d['match'] for d in labelled) / len(labelled) if labelled else None,
+        'audio_s': round(sum(len(s) for s in signals) / config.fs, 3),
+        'load_ms': round((t_loaded - t_start) * 1000, 3),
+        'detect_ms': round((t_done - t_loaded) * 1000, 3),
+        'details': details,
+        'errors': errors,
+    }
+
+
+def summarize(results, wall_s):
+    """汇总延迟与吞吐统计"""
+    n_files = sum(r['files'] for r in results)
+    detect_ms = np.array([r['detect_ms'] for r in results]) if results else np.zeros(1)
+    per_file_ms = np.array([r['detect_ms'] / r['files'] for r in results if r['files']]) \
+        if results else np.zeros(1)
+    labelled = [d for r in results for d in r['details'] if d['expected'] is not None]
+    return {
+        'sessions': len(results),
+        'files': n_files,
+        'audio_s': round(sum(r['audio_s'] for r in results), 3),
+        'wall_s': round(wall_s, 3),
+        'files_per_s': round(n_files / wall_s, 1) if wall_s > 0 else None,
+        'accuracy': sum(d['match'] for d in labelled) / len(labelled) if labelled else None,
+        'errors': sum(len(r['errors']) for r in results),
+        'session_detect_ms_p50': round(float(np.percentile(detect_ms, 50)), 3),
+        'session_detect_ms_p99': round(float(np.percentile(detect_ms, 99)), 3),
+        'file_detect_ms_mean': round(float(per_file_ms.mean()), 4) if len(per_file_ms) else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch re-analysis of recorded phone sessions")
+    parser.add_argument('sessions', nargs='*', help="session names (default: all)")
+    parser.add_argument('--root', default=config.WAV_DIR, help="audio root (default: config.WAV_DIR)")
+    parser.add_argument('--detector', choices=DETECTORS, default='fixed')
+    parser.add_argument('--duration', type=float, default=None,
+                        help="fixed mode: analyse only the first N seconds (default: full signal)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('-o', '--output', help="write the full JSON report to this file")
+    args = parser.parse_args(argv)
+
+    sessions = list_sessions(args.root, set(args.sessions))
+    if not sessions:
+        print(f"No sessions found under {args.root}", file=sys.stderr)
+        return 1
+
+    detector = build_detector(args.detector, duration=args.duration)
+    init_args = (detector,)
+
+    wall_start = time.perf_counter()
+    if args.workers <= 1:
+        _init_worker(*init_args)
+        results = [analyze_session(s) for s in sessions]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            results = list(pool.map(analyze_session, sessions))
+    summary = summarize(results, time.perf_counter() - wall_start)
+
+    print(f"{'Session':<24} | {'Files':>5} | {'Acc':>6} | {'Detect':>9} | Digits")
+    print("-" * 70)
+    for r in results:
+        acc = f"{r['accuracy']:.0%}" if r['accuracy'] is not None else '-'
+        print(f"{r['session']:<24} | {r['files']:>5} | {acc:>6} | {r['detect_ms']:>7.2f}ms | {r['digits']}")
+    print("-" * 70)
+    acc = f"{summary['accuracy']:.1%}" if summary['accuracy'] is not None else '-'
+    print(f"[{args.detector}] {summary['sessions']} sessions, {summary['files']} files in "
+          f"{summary['wall_s']:.2f}s ({summary['files_per_s']} files/s), accuracy {acc}")
+    print(f"Session detect latency p50/p99: {summary['session_detect_ms_p50']:.2f}/"
+          f"{summary['session_detect_ms_p99']:.2f} ms, per file {summary['file_detect_ms_mean']} ms")
+    for r in results:
+        for err in r['errors']:
+            print(f"Unreadable: {r['session']}/{err['file']}: {err['error']}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'detector': args.detector, 'duration': args.duration,
+                       'summary': summary, 'sessions': results}, f, ensure_ascii=False, indent=2)
+        print(f"Report saved to {args.output}")
+    return 2 if summary['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
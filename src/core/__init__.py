@@ -1,3 +1,4 @@
 # Core module - basic configuration and DSP algorithms
 from .config import *
 from .dsp import *
+from .decoder import decode_sequence
@@ -0,0 +1,261 @@
+"""
+channel.py
+批量信道损伤模型 (Batched Channel Impairments)
+
+所有损伤环节作用于 (N, n) 信号矩阵 (一维输入视为 N=1 并按原形状返回)，
+参数可以是标量或逐行 (N,) 数组，随机数统一来自传入的 np.random.Generator：
+- impulse_noise:       向量化掩码叠加 ±A 脉冲 (电火花干扰)
+- white_noise:         按逐行 SNR 叠加高斯白噪声
+- pink_noise:          一次批量 rfft 把白噪声整形为 1/f 噪声
+- voice_interference:  随机正弦分量 + 基频谐波的广播求和 (语音 / Talk-off)
+- frequency_drift:     加窗 sinc 分数延迟插值的真实重采样 (时间伸缩 -> 频率偏移)
+
+Channel 把多个环节串联为一个可调用对象，用于在线批量合成带噪训练集：
+    ch = Channel(partial(channel.impulse_noise, rate=0.01, amplitude=2.0),
+                 partial(channel.pink_noise, snr_db=5))
+    noisy = ch(channel.dtmf_batch(keys), rng)
+"""
+import numpy as np
+from functools import lru_cache
+from . import config
+
+NOISE_TYPES = ('impulse', 'pink', 'voice', 'drift', 'mixed')
+
+
+def _batch(x):
+    """转换为 (N, n) 浮点副本，并返回是否为一维输入"""
+    x = np.asarray(x, dtype=float)
+    return np.atleast_2d(x).copy(), x.ndim == 1
+
+
+def _column(value, n_rows):
+    """标量或 (N,) 参数广播为 (N, 1) 列向量"""
+    return np.broadcast_to(np.asarray(value, dtype=float), (n_rows,))[:, None]
+
+
+def _rng(rng):
+    """未指定 Generator 时由全局随机状态派生，np.random.seed() 仍可复现"""
+    return rng if rng is not None else np.random.default_rng(np.random.randint(2**31))
+
+
+def _unbatch(y, squeeze):
+    return y[0] if squeeze else y
+
+
+def _scale_to_snr(x, noise, snr_db):
+    """按逐行信号功率缩放噪声到目标 SNR"""
+    signal_power = np.mean(x**2, axis=-1, keepdims=True)
+    noise_power = np.mean(noise**2, axis=-1, keepdims=True)
+    target = signal_power / 10**(_column(snr_db, len(x)) / 10)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain = np.where(noise_power > 0, np.sqrt(target / noise_power), 0.0)
+    return noise * gain
+
+
+def dtmf_batch(keys, duration=None, fs=None):
+    """
+    批量生成无噪 DTMF 信号 (与 dsp.generate_dtmf 逐个生成的结果一致)
+    :param keys: 按键序列
+    :return: (len(keys), n) 信号矩阵
+    """
+    if duration is None:
+        duration = config.duration
+    if fs is None:
+        fs = config.fs
+    t = np.linspace(0, duration, int(fs * duration), endpoint=False)
+    freqs = np.array([config.freq_map[k] for k in keys], dtype=float)
+    return np.sin(2 * np.pi * freqs[:, :1] * t) + np.sin(2 * np.pi * freqs[:, 1:] * t)
+
+
+def impulse_noise(x, rate=0.01, amplitude=3.0, rng=None):
+    """
+    脉冲噪声：每个采样点以概率 rate 叠加幅度为 ±amplitude 的脉冲
+    :param rate: 脉冲出现概率 (标量或逐行)
+    :param amplitude: 脉冲幅度 (标量或逐行)
+    """
+    x, squeeze = _batch(x)
+    rng = _rng(rng)
+    mask = rng.random(x.shape) < _column(rate, len(x))
+    signs = rng.integers(0, 2, size=x.shape) * 2 - 1
+    x += mask * signs * _column(amplitude, len(x))
+    return _unbatch(x, squeeze)
+
+
+def white_noise(x, snr_db, rng=None):
+    """高斯白噪声，snr_db 为标量或逐行"""
+    x, squeeze = _batch(x)
+    noise = _rng(rng).standard_normal(x.shape)
+    return _unbatch(x + _scale_to_snr(x, noise, snr_db), squeeze)
+
+
+@lru_cache(maxsize=16)
+def _pink_filter(n):
+    """1/sqrt(f) 幅度响应 (直流置零)，按长度缓存"""
+    freqs = np.fft.rfftfreq(n)
+    response = np.zeros_like(freqs)
+    response[1:] = 1 / np.sqrt(freqs[1:])
+    response.setflags(write=False)
+    return response
+
+
+def pink_noise(x, snr_db, rng=None):
+    """
+    粉红噪声 (1/f 功率谱，低频能量更强)：整批白噪声一次 rfft / irfft 完成整形
+    :param snr_db: 信噪比 (标量或逐行)
+    """
+    x, squeeze = _batch(x)
+    n = x.shape[-1]
+    white = _rng(rng).standard_normal(x.shape)
+    pink = np.fft.irfft(np.fft.rfft(white, axis=-1) * _pink_filter(n), n, axis=-1)
+    return _unbatch(x + _scale_to_snr(x, pink, snr_db), squeeze)
+
+
+def _sum_of_sines(norm_freqs, amps, phases, n):
+    """
+    逐行正弦分量求和 sum_k A_k sin(2*pi*f_k*t + phi_k)，t = 0..n-1
+    按块分解 t = a*B + b 并利用 exp(i*w*(aB+b)) = exp(i*w*aB) * exp(i*w*b)，
+    把 N*n*K 次三角函数运算变为 N*K*(n/B + B) 次，求和部分为一次批量复数矩阵乘法
+    :param norm_freqs: (N, K) 归一化频率 f/fs
+    """
+    block = int(np.ceil(np.sqrt(n)))
+    n_blocks = -(-n // block)
+    w = 2 * np.pi * norm_freqs[:, :, None]
+    outer = amps[:, :, None] * np.exp(1j * (w * (np.arange(n_blocks) * block) + phases[:, :, None]))
+    inner = np.exp(1j * w * np.arange(block))
+    y = np.matmul(outer.transpose(0, 2, 1), inner).imag
+    return y.reshape(len(norm_freqs), -1)[:, :n]
+
+
+def voice_interference(x, level=0.5, rng=None, fs=None,
+                       n_components=(5, 15), n_harmonics=6):
+    """
+    模拟语音干扰：每行 5~14 个 100-3000Hz 随机正弦分量，加上 100-300Hz 基频的 2~7 次谐波
+    各行分量数不同，不足的分量幅度置零，整批一次求和 (见 _sum_of_sines)
+    :param level: 干扰强度 (标量或逐行)
+    """
+    if fs is None:
+        fs = config.fs
+    x, squeeze = _batch(x)
+    rng = _rng(rng)
+    n_rows, n = x.shape
+    max_components = n_components[1] - 1
+
+    counts = rng.integers(n_components[0], n_components[1], size=n_rows)
+    freqs = rng.uniform(100, 3000, size=(n_rows, max_components))
+    amps = rng.uniform(0.1, 0.5, size=(n_rows, max_components))
+    amps *= np.arange(max_components) < counts[:, None]
+    phases = rng.uniform(0, 2 * np.pi, size=(n_rows, max_components))
+
+    fundamental = rng.uniform(100, 300, size=n_rows)
+    harmonic_freqs = fundamental[:, None] * np.arange(2, 2 + n_harmonics)
+    harmonic_amps = rng.uniform(0.05, 0.2, size=(n_rows, n_harmonics))
+
+    freqs = np.concatenate((freqs, harmonic_freqs), axis=1)
+    amps = np.concatenate((amps, harmonic_amps), axis=1)
+    phases = np.concatenate((phases, np.zeros((n_rows, n_harmonics))), axis=1)
+
+    voice = _sum_of_sines(freqs / fs, amps, phases, n)
+    return _unbatch(x + voice * _column(level, n_rows), squeeze)
+
+
+def frequency_drift(x, drift_hz=10, ref_freq=1000.0, taps=16, rng=None):
+    """
+    频率漂移：以 1 + drift_hz / ref_freq 的比例对信号做时间压缩 (真实分数倍重采样)，
+    ref_freq 处的频率分量恰好偏移 drift_hz。采用 Blackman 加窗 sinc 插值，
+    超出原信号末尾的部分补零
+    :param drift_hz: 频率偏移量 (标量或逐行)
+    :param taps: 插值核长度 (偶数)
+    :param rng: 未使用，保持与其他环节一致的接口
+    """
+    x, squeeze = _batch(x)
+    n_rows, n = x.shape
+    ratio = 1 + _column(drift_hz, n_rows) / ref_freq
+    ratio = np.maximum(ratio, 1e-3)
+    pos = np.arange(n) * ratio
+    base = np.floor(pos).astype(np.int64)
+    frac = pos - base
+    # 时间压缩 (ratio > 1) 相当于抽取，按比例降低截止频率以抗混叠
+    cutoff = np.minimum(1.0, 1.0 / ratio)
+
+    # 核函数 sinc(c*d) * blackman(d)，d = k - frac。各抽头只差整数 k，
+    # 三角函数按和角公式由 frac 的三角函数值一次算出，每个抽头只剩乘加与查表
+    half = taps // 2
+    s_c, c_c = np.sin(np.pi * cutoff * frac), np.cos(np.pi * cutoff * frac)
+    s_w, c_w = np.sin(np.pi * frac / half), np.cos(np.pi * frac / half)
+
+    padded = np.pad(x, ((0, 0), (half, half)))
+    base = np.minimum(base, n - 1) + half
+    rows = np.arange(n_rows)[:, None]
+    y = np.zeros_like(x)
+    for k in range(-half + 1, half + 1):
+        d = k - frac
+        # sin(pi*c*(k - frac)) 与 cos(pi*(k - frac)/half)
+        sin_arg = np.sin(np.pi * cutoff * k) * c_c - np.cos(np.pi * cutoff * k) * s_c
+        cos_w = np.cos(np.pi * k / half) * c_w + np.sin(np.pi * k / half) * s_w
+        window = 0.42 + 0.5 * cos_w + 0.08 * (2 * cos_w**2 - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kernel = np.where(d == 0, cutoff, sin_arg / (np.pi * d))
+        y += kernel * window * padded[rows, base + k]
+    y[pos > n - 1] = 0.0
+    return _unbatch(y, squeeze)
+
+
+class Channel:
+    """
+    串联多个损伤环节的信道
+    :param stages: 可调用对象 stage(x, rng=...) -> y，通常为 functools.partial 绑定参数后的环节函数
+    """
+
+    def __init__(self, *stages):
+        self.stages = stages
+
+    def __call__(self, x, rng=None):
+        rng = _rng(rng)
+        for stage in self.stages:
+            x = stage(x, rng=rng)
+        return x
+
+
+def realistic_noise(x, noise_type='mixed', severity=0.5, rng=None):
+    """
+    按噪声类型与严重程度 (0-1，标量或逐行) 施加真实噪声，参数映射与 realistic_noise_test 一致
+    :param noise_type: 'impulse', 'pink', 'voice', 'drift', 'mixed'
+    """
+    rng = _rng(rng)
+    s = np.asarray(severity, dtype=float)
+    if noise_type == 'impulse':
+        return impulse_noise(x, rate=0.02 * s, amplitude=2 + 3 * s, rng=rng)
+    if noise_type == 'pink':
+        return pink_noise(x, snr_db=20 - 30 * s, rng=rng)  # severity=0 -> 20dB, 1 -> -10dB
+    if noise_type == 'voice':
+        return voice_interference(x, level=0.3 + 0.7 * s, rng=rng)
+    if noise_type == 'drift':
+        drifted = frequency_drift(x, drift_hz=5 + 20 * s)
+        return white_noise(drifted, snr_db=15 - 10 * s, rng=rng)
+    if noise_type == 'mixed':
+        x = impulse_noise(x, rate=0.01 * s, amplitude=1 + 2 * s, rng=rng)
+        x = pink_noise(x, snr_db=15 - 20 * s, rng=rng)
+        return voice_interference(x, level=0.2 * s, rng=rng)
+    return np.array(x, dtype=float)
+
+
+def realistic_dtmf_batch(keys, noise_type='mixed', severity=0.5, rng=None, duration=None):
+    """
+    批量生成带真实噪声的 DTMF 信号
+    :param keys: 按键序列
+    :param noise_type: 单一噪声类型，或与 keys 等长的逐行类型序列
+    :param severity: 严重程度 (标量或逐行)
+    :return: (len(keys), n) 信号矩阵
+    """
+    rng = _rng(rng)
+    clean = dtmf_batch(keys, duration)
+    severity = np.broadcast_to(np.asarray(severity, dtype=float), (len(clean),))
+    if isinstance(noise_type, str):
+        return realistic_noise(clean, noise_type, severity, rng)
+
+    noise_type = np.asarray(noise_type)
+    out = np.empty_like(clean)
+    for nt in np.unique(noise_type):
+        rows = noise_type == nt
+        out[rows] = realistic_noise(clean[rows], nt, severity[rows], rng)
+    return out
@@ -1,5 +1,7 @@
 import numpy as np
 import os
+from dataclasses import dataclass, replace
+from functools import cached_property, lru_cache
 
 # 基础参数
 fs = 8000
@@ -23,7 +25,179 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 IMG_DIR = os.path.join(PROJECT_ROOT, 'images')
 WAV_DIR = os.path.join(PROJECT_ROOT, 'audio')
 
-# 确保目录存在
-for d in [IMG_DIR, WAV_DIR]:
-    if not os.path.exists(d):
-        os.makedirs(d)
+
+
+def ensure_dirs():
+    """
+    创建输出目录 (images/, audio/)
+    导入本模块不再有文件系统副作用，由保存图片 / 音频的代码在写入前调用
+    """
+    for d in [IMG_DIR, WAV_DIR]:
+        os.makedirs(d, exist_ok=True)
+
+
+# ===== 检测器配置 =====
+# 上面的模块级变量是默认频率方案；检测器通过 DetectorConfig 取参数，
+# 同一进程内可以同时运行不同采样率 / 频率方案的检测器
+
+@lru_cache(maxsize=64)
+def dft_bins(n, freqs, fs):
+    """N 点 DFT 中最接近各频率的整数频点 k = int(0.5 + N*f/fs)，只读"""
+    bins = np.floor(0.5 + n * np.asarray(freqs, dtype=float) / fs).astype(int)
+    bins.setflags(write=False)
+    return bins
+
+
+def _dft_basis(n, freqs, fs):
+    w = (2 * np.pi / n) * dft_bins(n, freqs, fs)
+    t = np.arange(n)[:, np.newaxis]
+    basis = np.hstack([np.cos(t * w), np.sin(t * w)])
+    basis.setflags(write=False)
+    return basis
+
+
+_cached_dft_basis = lru_cache(maxsize=16)(_dft_basis)
+
+
+def dft_basis(n, freqs, fs, cached=True):
+    """
+    N 点 DFT 在 Goertzel 频点上的实值基 (N, 2F)：前 F 列为 cos，后 F 列为 sin，只读
+    :param cached: 按 (N, 频率, 采样率) 缓存；帧长固定的调用方 (解码帧、固定时长检测、探测段) 使用缓存，
+                   帧长随输入变化的调用方 (自适应积分) 传 False，避免一次性的长度占满缓存
+    """
+    if cached:
+        return _cached_dft_basis(n, freqs, fs)
+    return _dft_basis(n, freqs, fs)
+
+
+@lru_cache(maxsize=16)
+def steering_matrix(m, freqs, fs):
+    """MUSIC 导向矩阵 A[t, i] = exp(-j*w_i*t)，形状 (M, F)，只读"""
+    w = 2 * np.pi * np.asarray(freqs, dtype=float) / fs
+    a = np.exp(-1j * np.outer(np.arange(m), w))
+    a.setflags(write=False)
+    return a
+
+
+@dataclass(frozen=True)
+class DetectorConfig:
+    """
+    不可变的检测参数：采样率、频率方案、帧长 / 帧移、判决门限
+    可哈希，派生数据 (Goertzel 系数、频点、导向矩阵、带通 SOS、按键表) 首次使用时计算并缓存
+    :param keys: 按键按 (低频组, 高频组) 行优先排列，长度为 len(low_freqs) * len(high_freqs)
+    """
+    fs: int = fs
+    low_freqs: tuple = tuple(low_freqs)
+    high_freqs: tuple = tuple(high_freqs)
+    keys: tuple = tuple(keys)
+    duration: float = duration
+    frame_length: float = 205 / 8000     # 解码帧长 (8kHz 下为 205 点)
+    hop_length: float = 0.01             # 解码帧移
+    min_on: float = 0.04                 # 最短按键音
+    min_off: float = 0.04                # 最短按键间隔
+    min_tone_fraction: float = 0.3       # 双音能量占帧能量的最低比例
+    peak_ratio_threshold: float = 1.5    # 峰值比门限
+    energy_ratio_threshold: float = 0.01 # DTMF 能量占比门限
+    bandpass: tuple = (600, 1600, 4)     # 带通 (低截止, 高截止, 阶数)
+
+    def __post_init__(self):
+        for name in ('low_freqs', 'high_freqs', 'keys', 'bandpass'):
+            object.__setattr__(self, name, tuple(getattr(self, name)))
+        if len(self.keys) != len(self.low_freqs) * len(self.high_freqs):
+            raise ValueError(f"Expected {len(self.low_freqs) * len(self.high_freqs)} keys, "
+                             f"got {len(self.keys)}")
+
+    def replace(self, **changes):
+        """返回修改了部分参数的新配置"""
+        return replace(self, **changes)
+
+    # ----- 频率方案 -----
+    @cached_property
+    def freqs(self):
+        """全部检测频率 (低频组在前)"""
+        return self.low_freqs + self.high_freqs
+
+    @property
+    def n_low(self):
+        return len(self.low_freqs)
+
+    @cached_property
+    def freq_map(self):
+        """{按键: (低频, 高频)}"""
+        return {k: (self.low_freqs[i // len(self.high_freqs)], self.high_freqs[i % len(self.high_freqs)])
+                for i, k in enumerate(self.keys)}
+
+    @cached_property
+    def key_table(self):
+        """
+        频点下标 -> 按键的二维表 (n_low 行 n_high 列)
+        key_table[i][j] 为低频组第 i 个与高频组第 j 个频率组合的按键，argmax 下标直接查表 (O(1))
+        """
+        n_high = len(self.high_freqs)
+        return tuple(self.keys[i:i + n_high] for i in range(0, len(self.keys), n_high))
+
+    @cached_property
+    def code_table(self):
+        """频点下标 -> 按键编码 (keys 中的下标) 的整型矩阵 (n_low, n_high)，供批量 fancy-index，只读"""
+        table = np.arange(len(self.keys)).reshape(len(self.low_freqs), len(self.high_freqs))
+        table.setflags(write=False)
+        return table
+
+    @cached_property
+    def key_lookup(self):
+        """
+        按键编码 -> 按键的对象数组，末尾附加 None
+        key_lookup[codes] 批量取按键，编码 -1 (验证失败) 正好映射为 None
+        """
+        return np.array(list(self.keys) + [None], dtype=object)
+
+    @cached_property
+    def key_index(self):
+        """{按键: 编码}，编码为 keys 中的下标"""
+        return {k: i for i, k in enumerate(self.keys)}
+
+    # ----- 帧参数 -----
+    @property
+    def frame_samples(self):
+        return int(round(self.frame_length * self.fs))
+
+    @property
+    def hop_samples(self):
+        return int(round(self.hop_length * self.fs))
+
+    # ----- 派生数据 (按 N 缓存) -----
+    def goertzel_bins(self, n):
+        """N 点帧上各检测频率的整数频点"""
+        return dft_bins(n, self.freqs, self.fs)
+
+    def goertzel_coeffs(self, n):
+        """N 点帧上各检测频率的 Goertzel 系数 2*cos(2*pi*k/N)"""
+        return 2 * np.cos(2 * np.pi * self.goertzel_bins(n) / n)
+
+    def goertzel_basis(self, n, cached=True):
+        """N 点帧上的 DFT 实值基 (N, 2F)，见 dft_basis"""
+        return dft_basis(n, self.freqs, self.fs, cached)
+
+    def steering_matrix(self, m):
+        """M 维 MUSIC 导向矩阵 (M, F)"""
+        return steering_matrix(m, self.freqs, self.fs)
+
+    @cached_property
+    def bandpass_sos(self):
+        """带通滤波器 SOS 系数 (首次访问时设计，只读)"""
+        from .dsp import design_bandpass
+        low, high, order = self.bandpass
+        return design_bandpass(low, high, order, self.fs)
+
+
+DEFAULT = DetectorConfig()
+
+
+def resolve(cfg=None, **overrides):
+    """
+    取检测配置：cfg 为 None 时使用 DEFAULT，非 None 的 overrides (如 fs=16000) 覆盖对应参数
+    :return: DetectorConfig
+    """
+    cfg = cfg or DEFAULT
+    changes = {k: v for k, v in overrides.items() if v is not None and getattr(cfg, k) != v}
+    return cfg.replace(**changes) if changes else cfg
@@ -0,0 +1,432 @@
+"""
+decoder.py
+长录音 DTMF 号码串解码 (Digit-String Decoder)
+
+流程 (单次向量化处理)：
+  1. 分帧：sliding_window_view 按帧移取帧 (零拷贝视图)
+  2. 8 频点 Goertzel 能量：一次矩阵乘法 (dsp.goertzel_batch)
+  3. 有效性验证 + 按键判决：dsp.classify_powers，得到逐帧按键编码，
+     再用双音能量占比 (与帧长无关的归一化) 剔除噪声帧
+  4. 时序规则 (参考 ITU-T Q.24)：
+     - 同一按键之间短于 min_off 的中断视为掉帧，合并 (先于去抖，被掉帧切碎的按键音不会被丢弃)
+     - 短于 min_on 的音段视为抖动，丢弃
+     - 其余静音段作为按键间隔，分隔相邻号码
+流式 / 多路：
+  - StreamSegmenter:      增量执行第 4 步，逐块输入帧标签，按键音结束后立即产出号码
+  - MultiChannelDecoder:  多路音频流各自缓存采样，每次 process() 把所有通道待处理的帧
+                          堆叠为一个矩阵，一次完成第 2、3 步，再分发给各通道的 StreamSegmenter
+"""
+import numpy as np
+from . import config, dsp
+
+# 默认时序参数 (秒)，即 config.DEFAULT 中的取值；各函数参数为 None 时从 cfg 读取
+FRAME_LENGTH = config.DEFAULT.frame_length            # 帧长 205 点 (8kHz 下各 DTMF 频率最接近整数频点的经典帧长)
+HOP_LENGTH = config.DEFAULT.hop_length                # 帧移 10ms
+MIN_TONE_ON = config.DEFAULT.min_on                   # 最短按键音 40ms
+MIN_TONE_OFF = config.DEFAULT.min_off                 # 最短按键间隔 40ms
+MIN_TONE_FRACTION = config.DEFAULT.min_tone_fraction  # 双音能量占帧能量的最低比例 (理想双音约为 1，白噪声约为 8/N)
+
+
+def _frames_within(duration, frame_length, hop_length):
+    """时长为 duration 的区间内能完整容纳的帧数 (至少 1 帧)"""
+    return max(1, int((duration - frame_length) / hop_length + 1e-9) + 1)
+
+
+def pcm_to_float(data):
+    """
+    PCM 采样转浮点：整型按位宽归一化到 [-1, 1)，uint8 (8-bit WAV / FPGA 串口格式) 去除 128 偏置
+    """
+    data = np.asarray(data)
+    if data.dtype == np.uint8:
+        return (data.astype(float) - 128.0) / 128.0
+    if np.issubdtype(data.dtype, np.integer):
+        return data.astype(float) / float(2 ** (8 * data.dtype.itemsize - 1))
+    return data.astype(float, copy=False)
+
+
+def _runs(labels):
+    """游程编码：返回 (values, starts, lengths)"""
+    if len(labels) == 0:
+        empty = np.array([], dtype=int)
+        return empty, empty, empty
+    change = np.flatnonzero(np.diff(labels)) + 1
+    starts = np.concatenate(([0], change))
+    lengths = np.diff(np.concatenate((starts, [len(labels)])))
+    return labels[starts], starts, lengths
+
+
+def frame_labels(audio, fs=None, frame_length=None, hop_length=None,
+                 require_valid=True, min_tone_fraction=None, cfg=None):
+    """
+    逐帧按键判决
+    :param audio: 输入信号 (一维)
+    :param fs: 采样率，若为 None 则使用 cfg.fs
+    :param frame_length: 帧长 (秒)，若为 None 则使用 cfg.frame_length (下同)
+    :param hop_length: 帧移 (秒)
+    :param require_valid: 是否执行有效性验证 (否则每帧都会判为某个按键)
+    :param min_tone_fraction: 双音能量占比门限 2*(P_L+P_H) / (N^2 * mean(x^2))
+    :param cfg: 检测配置，若为 None 则使用 config.DEFAULT
+    :return: 按键编码数组 (n_frames,)，值为 cfg.keys 的下标，-1 表示无有效按键
+    """
+    cfg = config.resolve(cfg, fs=fs, frame_length=frame_length, hop_length=hop_length,
+                         min_tone_fraction=min_tone_fraction)
+    frame_samples = cfg.frame_samples
+    hop_samples = cfg.hop_samples
+
+    audio = pcm_to_float(audio)
+    if len(audio) < frame_samples:
+        return np.array([], dtype=int)
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame_samples)[::hop_samples]
+    l_powers, h_powers = dsp.dtmf_powers(frames, cfg)
+
+    if not require_valid:
+        return dsp.classify_powers(l_powers, h_powers, cfg=cfg)
+
+    # 每帧平均功率：用累加和代替逐帧求和
+    csum = np.concatenate(([0.0], np.cumsum(audio**2)))
+    starts = np.arange(len(frames)) * hop_samples
+    frame_power = (csum[starts + frame_samples] - csum[starts]) / frame_samples
+
+    return _tone_codes(l_powers, h_powers, frame_power, frame_samples, cfg)
+
+
+def _tone_codes(l_powers, h_powers, frame_power, frame_samples, cfg):
+    """有效性验证 + 双音能量占比门限，返回逐帧按键编码 (-1 为无有效按键)"""
+    codes = dsp.classify_powers(l_powers, h_powers, frame_power, frame_samples, cfg)
+
+    # 双音能量占比：identify_key 的能量门限不随帧长归一化，对白噪声几乎总能通过
+    tone_power = l_powers.max(axis=1) + h_powers.max(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fraction = 2 * tone_power / (frame_samples**2 * frame_power)
+    return np.where(fraction >= cfg.min_tone_fraction, codes, -1)
+
+
+def iter_frame_labels(chunks, fs=None, frame_length=None, hop_length=None,
+                      min_tone_fraction=None, cfg=None):
+    """
+    流式逐帧判决：逐块产出帧标签，块间保留不足一帧的尾部采样
+    拼接结果与对整段信号调用 frame_labels 一致
+    :param chunks: 可迭代的采样块 (任意长度，可为整型 PCM)
+    """
+    cfg = config.resolve(cfg, fs=fs, frame_length=frame_length, hop_length=hop_length,
+                         min_tone_fraction=min_tone_fraction)
+    frame_samples = cfg.frame_samples
+    hop_samples = cfg.hop_samples
+
+    tail = np.zeros(0)
+    for chunk in chunks:
+        buf = np.concatenate((tail, pcm_to_float(chunk)))
+        if len(buf) < frame_samples:
+            tail = buf
+            continue
+        n_frames = (len(buf) - frame_samples) // hop_samples + 1
+        yield frame_labels(buf, cfg=cfg)
+        tail = buf[n_frames * hop_samples:]
+
+
+def _bridge_gaps(labels, min_off_frames):
+    """两段相同按键之间短于 min_off_frames 的静音填为该按键"""
+    values, starts, lengths = _runs(labels)
+    if len(values) < 3:
+        return labels
+    prev_v, next_v = values[:-2], values[2:]
+    mid = slice(1, -1)
+    bridge = (values[mid] < 0) & (lengths[mid] < min_off_frames) & \
+             (prev_v >= 0) & (prev_v == next_v)
+    values[mid] = np.where(bridge, prev_v, values[mid])
+    return np.repeat(values, lengths)
+
+
+def segment_labels(labels, frame_length=None, hop_length=None,
+                   min_on=None, min_off=None, cfg=None):
+    """
+    将逐帧按键编码按时序规则切分为号码
+    :param labels: frame_labels 的输出
+    :param frame_length: 帧长 (秒)，若为 None 则使用 cfg.frame_length (下同)
+    :param hop_length: 帧移 (秒)
+    :param min_on: 最短按键音时长 (秒)
+    :param min_off: 最短按键间隔 (秒)，更短的同键中断会被合并
+    :param cfg: 检测配置 (按键表)，若为 None 则使用 config.DEFAULT
+    :return: [(key, start_time, end_time), ...]，时间单位为秒
+    """
+    cfg = cfg or config.DEFAULT
+    frame_length = cfg.frame_length if frame_length is None else frame_length
+    hop_length = cfg.hop_length if hop_length is None else hop_length
+    min_on = cfg.min_on if min_on is None else min_on
+    min_off = cfg.min_off if min_off is None else min_off
+    labels = np.asarray(labels)
+    min_on_frames = _frames_within(min_on, frame_length, hop_length)
+    min_off_frames = _frames_within(min_off, frame_length, hop_length)
+
+    # 1. 同一按键之间的短中断 (如线路丢帧) 合并为一个按键音，先于去抖，
+    #    否则被切成若干段、每段都短于 min_on 的按键音会被整个丢弃
+    labels = _bridge_gaps(labels, min_off_frames)
+
+    # 2. 去抖：过短的音段置为静音
+    values, starts, lengths = _runs(labels)
+    short_tone = (values >= 0) & (lengths < min_on_frames)
+    values = np.where(short_tone, -1, values)
+    labels = np.repeat(values, lengths)
+
+    # 3. 去抖后再合并一次：被去掉的短毛刺 (其他按键) 留下的中断
+    labels = _bridge_gaps(labels, min_off_frames)
+
+    # 4. 输出按键段
+    values, starts, lengths = _runs(labels)
+    tones = values >= 0
+    t_start = starts[tones] * hop_length
+    t_end = (starts[tones] + lengths[tones] - 1) * hop_length + frame_length
+
+    return [(key, float(t0), float(t1))
+            for key, t0, t1 in zip(dsp.codes_to_keys(values[tones], cfg), t_start, t_end)]
+
+
+def _rounded(cfg):
+    """帧长 / 帧移取整到采样点，时间戳按实际取整后的值计算"""
+    return config.resolve(cfg, frame_length=cfg.frame_samples / cfg.fs, hop_length=cfg.hop_samples / cfg.fs)
+
+
+def decode_sequence(audio, fs=None, min_on=None, min_off=None,
+                    frame_length=None, hop_length=None,
+                    min_tone_fraction=None, chunk_size=None, cfg=None):
+    """
+    长录音号码串解码入口
+    :param audio: 输入信号 (一维)
+    :param fs: 采样率，若为 None 则使用 cfg.fs
+    :param min_on: 最短按键音时长 (秒)，若为 None 则使用 cfg.min_on (下同)
+    :param min_off: 最短按键间隔 (秒)
+    :param frame_length: 帧长 (秒)
+    :param hop_length: 帧移 (秒)
+    :param min_tone_fraction: 双音能量占比门限
+    :param chunk_size: 分块大小 (采样点)。给定时逐块转换与判决，
+                       只有逐帧标签常驻内存，适合 np.memmap 等超长输入；结果与整段处理一致
+    :param cfg: 检测配置，若为 None 则使用 config.DEFAULT
+    :return: [(key, start_time, end_time), ...]
+    """
+    cfg = _rounded(config.resolve(cfg, fs=fs, min_on=min_on, min_off=min_off,
+                                  frame_length=frame_length, hop_length=hop_length,
+                                  min_tone_fraction=min_tone_fraction))
+
+    if chunk_size is None:
+        return segment_labels(frame_labels(audio, cfg=cfg), cfg=cfg)
+
+    chunks = (audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size))
+    return decode_chunks(chunks, cfg=cfg)
+
+
+def decode_chunks(chunks, fs=None, min_on=None, min_off=None,
+                  frame_length=None, hop_length=None,
+                  min_tone_fraction=None, cfg=None):
+    """
+    分块输入的号码串解码 (如内存映射文件分块、流式重采样输出)
+    只有逐帧标签常驻内存，参数含义同 decode_sequence
+    """
+    cfg = _rounded(config.resolve(cfg, fs=fs, min_on=min_on, min_off=min_off,
+                                  frame_length=frame_length, hop_length=hop_length,
+                                  min_tone_fraction=min_tone_fraction))
+
+    labels = list(iter_frame_labels(chunks, cfg=cfg))
+    labels = np.concatenate(labels) if labels else np.array([], dtype=int)
+    return segment_labels(labels, cfg=cfg)
+
+
+class StreamSegmenter:
+    """
+    增量版 segment_labels：逐块输入帧标签，产出已确定的号码
+    全部块输入并 flush() 后，产出的号码与对完整标签序列调用 segment_labels 一致。
+    号码在无法再与后续同键合并时产出 (静音达到 min_off，或出现另一个已确认的按键音)
+    :param cfg: 检测配置 (帧长 / 帧移 / 时序参数 / 按键表)
+    """
+
+    def __init__(self, cfg=None):
+        cfg = cfg or config.DEFAULT
+        self.cfg = cfg
+        self.min_on = _frames_within(cfg.min_on, cfg.frame_length, cfg.hop_length)
+        self.min_off = _frames_within(cfg.min_off, cfg.frame_length, cfg.hop_length)
+        self.n_frames = 0
+        self.run = (-1, 0, 0)       # 当前未结束的原始游程 (值, 起始帧, 长度)
+        self.held = None            # 去抖前合并：已结束的按键音游程，可能与短中断后的同键游程合并
+        self.held_gap = None        # held 之后短于 min_off 的静音游程
+        self.pending = None         # 待定的按键音 (编码, 起始帧, 结束帧)，可能与后续同键合并
+        self.gap = 0                # pending 之后已结束的 (去抖后) 静音帧数
+
+    def _event(self):
+        code, start, end = self.pending
+        self.pending = None
+        hop = self.cfg.hop_length
+        return (self.cfg.key_lookup[code], start * hop, end * hop + self.cfg.frame_length)
+
+    def _finish_run(self, value, start, length, events):
+        """原始游程结束：同键之间的短中断先合并 (对应 segment_labels 第 1 步)，再交给 _segment"""
+        if self.held is None:
+            if value >= 0:
+                self.held = (value, start, length)
+            else:
+                self._segment(value, start, length, events)
+        elif self.held_gap is None:
+            if value < 0 and length < self.min_off:
+                self.held_gap = (value, start, length)
+            else:
+                self._release(events)
+                self._finish_run(value, start, length, events)
+        elif value == self.held[0]:
+            held_value, held_start, _ = self.held
+            self.held = (held_value, held_start, start + length - held_start)
+            self.held_gap = None
+        else:
+            self._release(events)
+            self._finish_run(value, start, length, events)
+
+    def _release(self, events):
+        """held (及其后的静音) 不会再合并，交给 _segment"""
+        self._segment(*self.held, events)
+        if self.held_gap is not None:
+            self._segment(*self.held_gap, events)
+        self.held = self.held_gap = None
+
+    def _segment(self, value, start, length, events):
+        """去抖与去抖后的同键合并 (segment_labels 第 2、3 步)"""
+        if value >= 0 and length < self.min_on:
+            value = -1                              # 去抖：过短的音段视为静音
+        if value < 0:
+            self.gap += length
+            if self.pending is not None and self.gap >= self.min_off:
+                events.append(self._event())
+        elif self.pending is not None and self.pending[0] == value:
+            self.pending = (value, self.pending[1], start + length - 1)   # 短中断：合并
+            self.gap = 0
+        else:
+            if self.pending is not None:
+                events.append(self._event())
+            self.pending = (value, start, start + length - 1)
+            self.gap = 0
+
+    def update(self, labels):
+        """
+        :param labels: 新的帧标签 (frame_labels 的输出片段)
+        :return: 本次确定的号码 [(key, start_time, end_time), ...]，时间从流开始计
+        """
+        events = []
+        values, starts, lengths = _runs(np.asarray(labels))
+        for value, start, length in zip(values.tolist(), (starts + self.n_frames).tolist(), lengths.tolist()):
+            run_value, run_start, run_length = self.run
+            if value == run_value:
+                self.run = (run_value, run_start, run_length + length)
+                continue
+            if run_length:
+                self._finish_run(run_value, run_start, run_length, events)
+            self.run = (value, start, length)
+        self.n_frames += len(labels)
+
+        # 当前游程已排除 held 的合并 (静音已达到 min_off，或出现其他按键音)：不必等游程结束
+        if self.held is not None:
+            value, _, length = self.run
+            if (value < 0 and self.held_gap is None and length >= self.min_off) or \
+                    (value >= 0 and value != self.held[0]):
+                self._release(events)
+
+        # 尚未交给 _segment 的部分已足以排除与 pending 合并的可能时，提前产出：
+        # 之后出现一定能通过去抖的其他按键音，或 pending 之后的静音已达到 min_off
+        if self.pending is not None:
+            value, _, length = self.held or self.run
+            if value != self.pending[0] and \
+                    ((value >= 0 and length >= self.min_on) or (value < 0 and self.gap + length >= self.min_off)):
+                events.append(self._event())
+        return events
+
+    def flush(self):
+        """流结束：结束当前游程并产出剩余号码"""
+        events = []
+        value, start, length = self.run
+        if length:
+            self._finish_run(value, start, length, events)
+        if self.held is not None:
+            self._release(events)
+        self.run = (-1, self.n_frames, 0)
+        if self.pending is not None:
+            events.append(self._event())
+        return events
+
+
+class MultiChannelDecoder:
+    """
+    多路流式号码解码
+    feed() 只缓存采样；process() 取出所有通道的完整帧，堆叠为一个矩阵一次计算 8 频点能量与判决，
+    各通道的帧标签交给各自的 StreamSegmenter。结果与对每路完整音频调用 decode_sequence 一致
+    (帧功率的计算方式不同，只在门限边界上可能有舍入差异)
+    :param cfg: 检测配置 (采样率、帧参数、时序参数)
+    """
+
+    def __init__(self, cfg=None):
+        self.cfg = _rounded(config.resolve(cfg))
+        self.channels = {}
+
+    def open(self, channel):
+        """登记通道 (feed 时自动登记)"""
+        if channel not in self.channels:
+            self.channels[channel] = {'chunks': [], 'tail': np.zeros(0),
+                                      'segmenter': StreamSegmenter(self.cfg)}
+
+    def feed(self, channel, samples):
+        """
+        :param samples: 采样块 (浮点或整型 PCM)
+        """
+        self.open(channel)
+        self.channels[channel]['chunks'].append(pcm_to_float(samples))
+
+    def pending_samples(self):
+        """所有通道尚未处理的采样点数"""
+        return sum(len(st['tail']) + sum(len(c) for c in st['chunks']) for st in self.channels.values())
+
+    def process(self):
+        """
+        处理所有通道已缓存的完整帧
+        :return: [(channel, key, start_time, end_time), ...]
+        """
+        frame_samples = self.cfg.frame_samples
+        hop_samples = self.cfg.hop_samples
+        owners, blocks = [], []
+        for channel, st in self.channels.items():
+            if st['chunks']:
+                st['tail'] = np.concatenate([st['tail']] + st['chunks'])
+                st['chunks'] = []
+            buf = st['tail']
+            if len(buf) < frame_samples:
+                continue
+            n_frames = (len(buf) - frame_samples) // hop_samples + 1
+            blocks.append(np.lib.stride_tricks.sliding_window_view(buf, frame_samples)[::hop_samples][:n_frames])
+            owners.append((channel, n_frames))
+            st['tail'] = buf[n_frames * hop_samples:]
+        if not blocks:
+            return []
+
+        frames = np.concatenate(blocks)
+        l_powers, h_powers = dsp.dtmf_powers(frames, self.cfg)
+        frame_power = np.einsum('ij,ij->i', frames, frames) / frame_samples
+        codes = _tone_codes(l_powers, h_powers, frame_power, frame_samples, self.cfg)
+
+        events = []
+        offset = 0
+        for channel, n_frames in owners:
+            for event in self.channels[channel]['segmenter'].update(codes[offset:offset + n_frames]):
+                events.append((channel,) + event)
+            offset += n_frames
+        return events
+
+    def close(self, channel):
+        """
+        结束通道：处理剩余的完整帧并产出剩余号码
+        :return: [(channel, key, start_time, end_time), ...]
+        """
+        if channel not in self.channels:
+            return []
+        others = {c: st for c, st in self.channels.items() if c != channel}
+        self.channels = {channel: self.channels[channel]}
+        try:
+            events = self.process()
+        finally:
+            st = self.channels.pop(channel)
+            others.update(self.channels)
+            self.channels = others
+        return events + [(channel,) + e for e in st['segmenter'].flush()]
@@ -1,31 +1,102 @@
 import numpy as np
-from scipy import signal as scipy_signal
-from . import config
+from functools import lru_cache
+from . import config, instrument, kernels
 
-def bandpass_filter(sig, low_freq=600, high_freq=1600, order=4):
+# scipy.signal 导入耗时约 0.4s，只在用到滤波器时才加载 (检测器与工作进程的启动路径只依赖 NumPy)
+
+# 有效性验证门限的默认值 (各函数通过 cfg 取值，见 config.DetectorConfig)
+PEAK_RATIO_THRESHOLD = config.DEFAULT.peak_ratio_threshold      # 峰值比：最大值至少是次大值的 1.5 倍
+ENERGY_RATIO_THRESHOLD = config.DEFAULT.energy_ratio_threshold  # DTMF 能量应占总能量的至少 1%
+
+@lru_cache(maxsize=16)
+def design_bandpass(low_freq=600, high_freq=1600, order=4, fs=None):
+    """
+    设计 Butterworth 带通滤波器 (SOS 二阶节形式，数值上比 b/a 形式更稳定)
+    按参数组合缓存，只设计一次 (返回的是只读的共享数组)
+    :return: sos 数组 (n_sections, 6)
+    """
+    from scipy import signal as scipy_signal
+    if fs is None:
+        fs = config.fs
+    nyquist = fs / 2
+    sos = scipy_signal.butter(order, [low_freq / nyquist, high_freq / nyquist],
+                              btype='band', output='sos')
+    sos.setflags(write=False)
+    return sos
+
+
+def _bandpass_sos(cfg, low_freq, high_freq, order):
+    """
+    取 cfg 的带通滤波器，显式给出的参数覆盖 cfg.bandpass
+    缓存的 SOS 为只读数组，而 scipy 的 sosfilt 内核要求可写缓冲区，这里返回一份副本 (只有几十个元素)
+    """
+    cfg = cfg or config.DEFAULT
+    if low_freq is None and high_freq is None and order is None:
+        return cfg.bandpass_sos.copy()
+    low, high, n = cfg.bandpass
+    return design_bandpass(low_freq or low, high_freq or high, order or n, cfg.fs).copy()
+
+
+@instrument.timed('dsp.bandpass_filter')
+def bandpass_filter(sig, low_freq=None, high_freq=None, order=None, axis=-1, cfg=None):
+    """
+    带通滤波预处理，保留 DTMF 频段 (默认 600-1600Hz，见 DetectorConfig.bandpass)
+    零相位 (前向-后向) 整段滤波；sig 为二维帧矩阵 (n_frames, N) 时沿 axis 批量处理
+    :param cfg: 检测配置 (采样率与默认通带)，若为 None 则使用 config.DEFAULT
+    """
+    from scipy import signal as scipy_signal
+    sos = _bandpass_sos(cfg, low_freq, high_freq, order)
+    return scipy_signal.sosfiltfilt(sos, sig, axis=axis)
+
+
+class BandpassStream:
     """
-    带通滤波预处理，保留 DTMF 频段 (600-1600Hz)
+    有状态流式带通滤波器
+    因果 sosfilt，跨块保留滤波器状态 zi：逐块处理的拼接结果与整段 sosfilt 一致，
+    块边界不再产生 filtfilt 那样的边缘瞬态，也不需要等待整段数据
     """
-    nyquist = config.fs / 2
-    low = low_freq / nyquist
-    high = high_freq / nyquist
-    b, a = scipy_signal.butter(order, [low, high], btype='band')
-    filtered = scipy_signal.filtfilt(b, a, sig)
-    return filtered
 
-def generate_dtmf(key, snr_db=None, duration=None):
+    def __init__(self, low_freq=None, high_freq=None, order=None, cfg=None):
+        self.sos = _bandpass_sos(cfg, low_freq, high_freq, order)
+        self.zi = None
+
+    def reset(self):
+        self.zi = None
+
+    @instrument.timed('dsp.bandpass_stream')
+    def process(self, chunk):
+        """
+        :param chunk: 一维采样块 (n,)，或多通道块 (n_channels, n)
+        :return: 滤波后的采样块，形状与输入相同
+        """
+        from scipy import signal as scipy_signal
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.shape[-1] == 0:
+            return chunk
+        if self.zi is None:
+            # 以首个采样点的稳态初始化，避免从零状态起步的阶跃瞬态
+            zi = scipy_signal.sosfilt_zi(self.sos)
+            first = chunk[..., 0]
+            self.zi = zi.reshape((zi.shape[0],) + (1,) * first.ndim + (2,)) * first[..., np.newaxis]
+        out, self.zi = scipy_signal.sosfilt(self.sos, chunk, axis=-1, zi=self.zi)
+        return out
+
+
+def generate_dtmf(key, snr_db=None, duration=None, cfg=None):
     """
     生成 DTMF 信号
     :param key: 按键字符
     :param snr_db: 信噪比 (dB)，若为 None 则不加噪
-    :param duration: 信号时长 (s)，若为 None 则使用 config 默认值
+    :param duration: 信号时长 (s)，若为 None 则使用 cfg 默认值
+    :param cfg: 检测配置 (采样率与频率方案)，若为 None 则使用 config.DEFAULT
     :return: 信号数组
     """
+    cfg = cfg or config.DEFAULT
     if duration is None:
-        duration = config.duration
+        duration = cfg.duration
         
-    fL, fH = config.freq_map[key]
-    t = np.linspace(0, duration, int(config.fs * duration), endpoint=False)
+    fL, fH = cfg.freq_map[key]
+    t = np.linspace(0, duration, int(cfg.fs * duration), endpoint=False)
     signal = np.sin(2 * np.pi * fL * t) + np.sin(2 * np.pi * fH * t)
     
     if snr_db is not None:
@@ -37,73 +108,153 @@ def generate_dtmf(key, snr_db=None, duration=None):
         
     return signal
 
-def goertzel(signal, target_freq):
+def goertzel(signal, target_freq, fs=None):
     """
     Goertzel 算法计算特定频率能量
+    逐采样递推由 kernels.goertzel 完成 (安装 numba 时为编译版本)
+    :param fs: 采样率，若为 None 则使用 config.fs
     """
     N = len(signal)
     if N == 0: return 0
-    k = int(0.5 + (N * target_freq) / config.fs)
+    if fs is None:
+        fs = config.fs
+    k = int(0.5 + (N * target_freq) / fs)
     w = (2 * np.pi / N) * k
     coeff = 2 * np.cos(w)
-    
-    s_prev1 = 0
-    s_prev2 = 0
-    for x in signal:
-        s = x + coeff * s_prev1 - s_prev2
-        s_prev2 = s_prev1
-        s_prev1 = s
-    
-    power = s_prev1**2 + s_prev2**2 - coeff * s_prev1 * s_prev2
-    return power
+    return kernels.goertzel(signal, (coeff,))[0]
+
+def goertzel_batch(frames, target_freqs, fs=None):
+    """
+    向量化 Goertzel：一次矩阵乘法计算多帧、多频点能量
+    使用与 goertzel() 相同的整数频点 k = int(0.5 + N*f/fs)，结果等于 |X(k)|^2
+    :param frames: 帧矩阵 (n_frames, N)，或单帧 (N,)
+    :param target_freqs: 目标频率序列
+    :param fs: 采样率，若为 None 则使用 config.fs
+    :return: 能量矩阵 (n_frames, n_freqs)
+    """
+    if fs is None:
+        fs = config.fs
+    frames = np.atleast_2d(frames)
+    n_freqs = len(target_freqs)
+    basis = config.dft_basis(frames.shape[-1], tuple(target_freqs), fs)
+    proj = frames @ basis
+    return proj[:, :n_freqs]**2 + proj[:, n_freqs:]**2
+
+
+@instrument.timed('dsp.dtmf_powers')
+def dtmf_powers(frames, cfg=None, cached=True):
+    """
+    cfg 频率方案下的低频组 / 高频组能量 (使用 cfg 缓存的 DFT 基)
+    :param frames: 帧矩阵 (n_frames, N)，或单帧 (N,)
+    :param cached: 是否缓存 N 点 DFT 基 (帧长不固定时传 False，见 config.dft_basis)
+    :return: (l_powers (n_frames, n_low), h_powers (n_frames, n_high))
+    """
+    cfg = cfg or config.DEFAULT
+    frames = np.atleast_2d(frames)
+    n_freqs = len(cfg.freqs)
+    proj = frames @ cfg.goertzel_basis(frames.shape[-1], cached)
+    powers = proj[:, :n_freqs]**2 + proj[:, n_freqs:]**2
+    return powers[:, :cfg.n_low], powers[:, cfg.n_low:]
+
+
+@instrument.timed('dsp.classify_powers')
+def classify_powers(l_powers, h_powers, frame_power=None, frame_len=None, cfg=None):
+    """
+    向量化按键判决 (identify_key 的批量版本)
+    安装 numba 时由编译内核 kernels.classify 逐帧完成，结果与 NumPy 路径一致
+    :param l_powers: 低频组能量 (n_frames, 4)
+    :param h_powers: 高频组能量 (n_frames, 4)
+    :param frame_power: 每帧平均功率 mean(x^2)，提供时执行与 require_valid 相同的有效性验证
+    :param frame_len: 帧长 N (验证能量占比时使用)
+    :param cfg: 检测配置 (验证门限)，若为 None 则使用 config.DEFAULT
+    :return: 按键编码数组 (n_frames,)，值为 cfg.keys 的下标，验证失败为 -1
+    """
+    cfg = cfg or config.DEFAULT
+    if kernels.backend() == 'numba':
+        return kernels.classify(l_powers, h_powers, frame_power, frame_len, cfg.code_table,
+                                cfg.peak_ratio_threshold, cfg.energy_ratio_threshold)
+    codes = cfg.code_table[np.argmax(l_powers, axis=1), np.argmax(h_powers, axis=1)]
+
+    if frame_power is None:
+        return codes
+
+    top_l = np.sort(l_powers, axis=1)[:, ::-1]
+    top_h = np.sort(h_powers, axis=1)[:, ::-1]
+
+    # 检验1：峰值显著性
+    valid = (top_l[:, 0] / (top_l[:, 1] + 1e-10) >= cfg.peak_ratio_threshold) & \
+            (top_h[:, 0] / (top_h[:, 1] + 1e-10) >= cfg.peak_ratio_threshold)
+
+    # 检验2：能量门限 (总功率为 0 时不做该检验，与 identify_key 一致)
+    dtmf_power = top_l[:, 0] + top_h[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        energy_ratio = dtmf_power / (frame_power * frame_len)
+    valid &= (frame_power <= 0) | (energy_ratio >= cfg.energy_ratio_threshold)
+
+    return np.where(valid, codes, -1)
+
+
+def codes_to_keys(codes, cfg=None):
+    """
+    按键编码批量转换为按键 (一次 fancy-index)
+    :param codes: classify_powers 等返回的编码数组，-1 表示无有效按键
+    :return: 对象数组，元素为按键字符或 None
+    """
+    cfg = cfg or config.DEFAULT
+    return cfg.key_lookup[np.asarray(codes, dtype=int)]
+
 
-def identify_key(signal, use_filter=False, require_valid=False):
+@instrument.timed('dsp.identify_key')
+def identify_key(signal, use_filter=False, require_valid=False, cfg=None, cached=True):
     """
     识别 DTMF 信号对应的按键
     :param signal: 输入信号
     :param use_filter: 是否使用带通滤波预处理
     :param require_valid: 是否要求通过有效性验证（能量门限+峰值显著性）
-    :return: 按键字符，若 require_valid=True 且验证失败则返回 None
+    :param cfg: 检测配置 (采样率、频率方案、门限)，若为 None 则使用 config.DEFAULT
+    :param cached: 是否缓存该帧长的 DFT 基 (见 dtmf_powers)
+    :return: 按键字符，若 require_valid=True 且验证失败 (或信号为空) 则返回 None
     """
+    cfg = cfg or config.DEFAULT
+    if len(signal) == 0:
+        return None
     if use_filter:
-        signal = bandpass_filter(signal)
-    
-    l_powers = [goertzel(signal, f) for f in config.low_freqs]
-    h_powers = [goertzel(signal, f) for f in config.high_freqs]
+        signal = bandpass_filter(signal, cfg=cfg)
+
+    # 8 个频点能量：按帧长缓存的 DFT 基，一次矩阵乘法 (与逐频点 goertzel() 相同的整数频点)
+    l_powers, h_powers = dtmf_powers(signal, cfg, cached)
+    l_powers, h_powers = l_powers[0], h_powers[0]
     
     # ===== 有效性验证 =====
-    if require_valid:
-        # 检验1：峰值显著性 - 最大能量应显著高于次大能量
-        sorted_l = sorted(l_powers, reverse=True)
-        sorted_h = sorted(h_powers, reverse=True)
-        
-        # 峰值比阈值：最大值至少是次大值的 1.5 倍
-        PEAK_RATIO_THRESHOLD = 1.5
-        ratio_l = sorted_l[0] / (sorted_l[1] + 1e-10)
-        ratio_h = sorted_h[0] / (sorted_h[1] + 1e-10)
-        
-        if ratio_l < PEAK_RATIO_THRESHOLD or ratio_h < PEAK_RATIO_THRESHOLD:
-            return None  # 峰值不够显著，可能是噪声
-        
-        # 检验2：能量门限 - DTMF 能量需高于信号总能量的一定比例
-        total_signal_power = np.mean(signal**2)
-        dtmf_power = sorted_l[0] + sorted_h[0]
-        
-        # 归一化后的 DTMF 能量占比阈值
-        ENERGY_RATIO_THRESHOLD = 0.01  # DTMF 能量应占总能量的至少 1%
-        if total_signal_power > 0:
-            energy_ratio = dtmf_power / (total_signal_power * len(signal))
-            if energy_ratio < ENERGY_RATIO_THRESHOLD:
-                return None  # 能量太低，可能无有效按键
+    if require_valid and not _is_valid(signal, l_powers, h_powers, cfg):
+        return None
     
     # ===== 最大值判决 =====
-    best_l = config.low_freqs[np.argmax(l_powers)]
-    best_h = config.high_freqs[np.argmax(h_powers)]
+    return cfg.key_table[np.argmax(l_powers)][np.argmax(h_powers)]
+
+
+@instrument.timed('dsp.validate')
+def _is_valid(signal, l_powers, h_powers, cfg):
+    """identify_key 的有效性验证 (能量门限 + 峰值显著性)"""
+    # 检验1：峰值显著性 - 最大能量应显著高于次大能量
+    sorted_l = np.sort(l_powers)[::-1]
+    sorted_h = np.sort(h_powers)[::-1]
+    
+    ratio_l = sorted_l[0] / (sorted_l[1] + 1e-10)
+    ratio_h = sorted_h[0] / (sorted_h[1] + 1e-10)
+    
+    if ratio_l < cfg.peak_ratio_threshold or ratio_h < cfg.peak_ratio_threshold:
+        return False  # 峰值不够显著，可能是噪声
+    
+    # 检验2：能量门限 - DTMF 能量需高于信号总能量的一定比例
+    total_signal_power = np.mean(signal**2)
+    dtmf_power = sorted_l[0] + sorted_h[0]
     
-    for key, (fL, fH) in config.freq_map.items():
-        if fL == best_l and fH == best_h:
-            return key
-    return None
+    if total_signal_power > 0:
+        energy_ratio = dtmf_power / (total_signal_power * len(signal))
+        if energy_ratio < cfg.energy_ratio_threshold:
+            return False  # 能量太低，可能无有效按键
+    return True
 
 def run_performance_test():
     """
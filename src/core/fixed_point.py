@@ -0,0 +1,153 @@
+"""
+fixed_point.py
+定点 Goertzel 检测 (Fixed-point / Integer Goertzel)
+
+所有检测器都在 float64 上运行，而 FPGA 送来的是 8 位无符号采样，廉价的嵌入式主机或 FPGA 上
+只有整数运算。本模块按嵌入式实现的方式做整数 Goertzel，直接处理 uint8 / int16 输入：
+- 输入:     uint8 (FPGA 串口格式，减去 128) 或 int16，整体右移 shift 位防止溢出
+            (shift 默认按最坏情况的状态上界 N * max|x| / min|sin w| 自动选择)
+- 系数:     2cos(w) 量化为 coef_bits 位 Q2.(coef_bits-2) 定点数
+- 递推:     s = x + ((c * s1) >> frac) - s2，状态按 acc_bits 位补码回绕 (与 C 中的整型溢出一致)
+            acc_bits + coef_bits <= 31 时乘积用 int32 计算，否则用 int64 (要求 acc_bits + coef_bits <= 63)
+- 能量:     s1^2 + s2^2 - ((c * s1) >> frac) * s2，状态超过 POWER_BITS 位时先右移，保证 int64 不溢出
+- 判决:     最大值判决；有效性验证的门限化为分母不超过 255 的分数 (0.01 -> 1/100, 1.5 -> 3/2)，
+            全部为整数乘法比较
+对帧矩阵向量化：逐采样循环 N 次，每次同时更新所有帧、所有频点的状态。
+
+Usage:
+    from src.core import fixed_point
+    codes = fixed_point.detect_codes(uart_bytes.reshape(-1, 205), coef_bits=12, acc_bits=16, validate=True)
+    create_detector('fixed_point', coef_bits=12, acc_bits=16, input_format='uint8')
+"""
+from fractions import Fraction
+
+import numpy as np
+
+from . import config
+
+# 计算能量前状态保留的最大位数：能量 < 2^(2*POWER_BITS+2)，乘以门限分子 / 分母后仍在 int64 范围内
+POWER_BITS = 24
+MAX_DENOMINATOR = 255                   # 验证门限分数的最大分母
+INPUT_BITS = {'uint8': 8, 'int16': 16}
+
+
+def quantize_input(frames, input_format='int16'):
+    """
+    浮点信号 ([-1, 1)) 量化为整数 PCM (仿真 / 对比用)
+    :param input_format: 'int16' 或 'uint8' (FPGA 串口格式 (audio >> 8) + 128)
+    """
+    audio = np.round(np.clip(frames, -1, 1 - 2 ** -15) * 32768).astype(np.int16)
+    if input_format == 'uint8':
+        return ((audio >> 8) + 128).astype(np.uint8)
+    return audio
+
+
+def to_signed(frames):
+    """uint8 去除 128 偏置，其余整型保持；结果为 int16"""
+    frames = np.asarray(frames)
+    if frames.dtype == np.uint8:
+        return frames.astype(np.int16) - 128
+    if not np.issubdtype(frames.dtype, np.integer):
+        raise TypeError(f"Integer PCM expected, got {frames.dtype}")
+    return frames.astype(np.int16, copy=False)
+
+
+def quantize_coeffs(n, coef_bits=16, cfg=None):
+    """
+    N 点帧上各检测频率的 Goertzel 系数 2cos(w)，Q2.(coef_bits-2)
+    :return: int64 数组 (F,)
+    """
+    cfg = cfg or config.DEFAULT
+    frac = coef_bits - 2
+    limit = 2 ** (coef_bits - 1)
+    return np.clip(np.round(cfg.goertzel_coeffs(n) * 2 ** frac), -limit, limit - 1).astype(np.int64)
+
+
+def input_shift(n, input_bits=16, acc_bits=32, cfg=None):
+    """
+    保证状态不溢出的输入右移位数
+    Goertzel 状态满足 |s| <= N * max|x| / |sin w|，取所有检测频点中最坏的一个
+    """
+    cfg = cfg or config.DEFAULT
+    w = 2 * np.pi * cfg.goertzel_bins(n) / n
+    bound = n * 2 ** (input_bits - 1) / np.min(np.abs(np.sin(w)))
+    return max(0, int(np.ceil(np.log2(bound + 1))) - (acc_bits - 1))
+
+
+def _wrap(x, bits):
+    """按 bits 位补码回绕"""
+    half = 1 << (bits - 1)
+    return ((x + half) & ((half << 1) - 1)) - half
+
+
+def fixed_powers(frames, coef_bits=16, acc_bits=32, shift=None, cfg=None):
+    """
+    整数 Goertzel 能量
+    :param frames: 整数 PCM 帧矩阵 (n_frames, N) 或单帧，uint8 / int16
+    :param coef_bits: 系数位宽
+    :param acc_bits: 状态 (累加器) 位宽
+    :param shift: 输入右移位数，None 时由 input_shift 自动选择
+    :return: (l_powers, h_powers, sum_sq)，int64；三者为同一尺度 (输入右移、能量右移后)，
+             sum_sq 为每帧移位后采样的平方和，用于能量门限验证
+    """
+    if acc_bits + coef_bits > 63:
+        raise ValueError(f"acc_bits + coef_bits must be <= 63, got {acc_bits} + {coef_bits}")
+    cfg = cfg or config.DEFAULT
+    frames = np.atleast_2d(frames)
+    input_bits = 8 if frames.dtype == np.uint8 else 16
+    n = frames.shape[1]
+    if shift is None:
+        shift = input_shift(n, input_bits, acc_bits, cfg)
+    frac = coef_bits - 2
+    work = np.int32 if acc_bits + coef_bits <= 31 else np.int64
+
+    # (N, n_frames, 1) 连续存放，逐采样取一行
+    x = np.ascontiguousarray((to_signed(frames) >> shift).T).astype(work)[:, :, None]
+    c = quantize_coeffs(n, coef_bits, cfg).astype(work)
+    s1 = np.zeros((frames.shape[0], len(c)), dtype=work)
+    s2 = np.zeros_like(s1)
+    for t in range(n):
+        s = _wrap(x[t] + ((c * s1) >> frac) - s2, acc_bits)
+        s2 = s1
+        s1 = s
+
+    reduce = max(0, acc_bits - POWER_BITS)
+    s1 = s1.astype(np.int64) >> reduce
+    s2 = s2.astype(np.int64) >> reduce
+    powers = s1 * s1 + s2 * s2 - ((c.astype(np.int64) * s1) >> frac) * s2
+    x = x[:, :, 0].astype(np.int64)
+    sum_sq = np.einsum('ij,ij->j', x, x) >> (2 * reduce)
+    return powers[:, :cfg.n_low], powers[:, cfg.n_low:], sum_sq
+
+
+def classify_fixed(l_powers, h_powers, sum_sq=None, cfg=None):
+    """
+    整数判决 (classify_powers 的定点版本)
+    :param sum_sq: fixed_powers 返回的平方和，提供时执行有效性验证
+    :return: 按键编码数组 (n_frames,)，验证失败为 -1
+    """
+    cfg = cfg or config.DEFAULT
+    codes = cfg.code_table[np.argmax(l_powers, axis=1), np.argmax(h_powers, axis=1)]
+    if sum_sq is None:
+        return codes
+
+    peak = Fraction(cfg.peak_ratio_threshold).limit_denominator(MAX_DENOMINATOR)
+    energy = Fraction(cfg.energy_ratio_threshold).limit_denominator(MAX_DENOMINATOR)
+    top_l = np.sort(l_powers, axis=1)
+    top_h = np.sort(h_powers, axis=1)
+
+    # 检验1：峰值显著性 top / second >= 门限 (top 为 0 时无效)
+    valid = (top_l[:, -1] * peak.denominator >= peak.numerator * top_l[:, -2]) & (top_l[:, -1] > 0) & \
+            (top_h[:, -1] * peak.denominator >= peak.numerator * top_h[:, -2]) & (top_h[:, -1] > 0)
+    # 检验2：能量门限 (top_l + top_h) / sum(x^2) >= 门限 (平方和为 0 时不做该检验)
+    valid &= (sum_sq <= 0) | ((top_l[:, -1] + top_h[:, -1]) * energy.denominator >= energy.numerator * sum_sq)
+    return np.where(valid, codes, -1)
+
+
+def detect_codes(frames, coef_bits=16, acc_bits=32, shift=None, validate=False, cfg=None):
+    """
+    整数帧矩阵 -> 按键编码 (fixed_powers + classify_fixed)
+    :return: 按键编码数组，-1 为无有效按键
+    """
+    l_powers, h_powers, sum_sq = fixed_powers(frames, coef_bits, acc_bits, shift, cfg)
+    return classify_fixed(l_powers, h_powers, sum_sq if validate else None, cfg)
@@ -0,0 +1,268 @@
+"""
+fpga_model.py
+FPGA 双音发生器的逐位精确模型 (Bit-exact Model of fpga/dtmf_generator.vhd)
+
+GHDL 仿真 (simulate_vhdl.sh) 每秒只能推进几十毫秒；本模块用 NumPy 定点运算复现硬件，
+直接计算每个 8kHz 采样时刻的输出，一小时的硬件输出只需数秒：
+- 相位累加:   32 位累加器，增量 inc = freq * 2^32 // 50MHz (dtmf_pkg.calc_phase_inc)，
+              key_valid 为 0 时清零
+- 查表:       累加器高 8 位寻址 256 点 16 位正弦 ROM (直接解析 fpga/sine_lut.vhd 中的常量)
+- 合成:       (row + col) 的 17 位和取高 16 位，即算术右移 1 位
+- 时序:       累加器、ROM 输出、合成输出各一级寄存器，第 e 个时钟沿后的输出
+              由第 e-2 个时钟沿后的相位决定
+- 采样/串口:  与 ax309_top 相同，每 6250 个时钟取一次 audio_out，发送 (audio >> 8) + 128
+由于逐个时钟沿的状态可以由闭式 (起始相位 + 沿数 * 增量) mod 2^32 得到，只需在采样时刻求值。
+GHDL 参考输出由 fpga/model_dump_tb.vhd 生成 (./simulate_vhdl.sh --dump)，compare_dump() 逐位比对。
+
+Usage:
+    from src.core import fpga_model
+    pcm, uart = fpga_model.render([('1', 0.1, 0.2), ('9', 0.3, 0.4)], duration=0.5)
+    python -m src.core.fpga_model --compare sim_build/fpga_dump.txt
+    python -m src.core.fpga_model --decode 60 --snr 10     # 硬件量化信号上的解码准确率
+"""
+import argparse
+import functools
+import os
+import re
+import sys
+
+import numpy as np
+
+from . import config
+
+# 与 fpga/dtmf_pkg.vhd、fpga/ax309_top.vhd 一致
+CLK_FREQ = 50_000_000
+PH_ACC_WIDTH = 32
+ROW_FREQS = (697, 770, 852, 941)
+COL_FREQS = (1209, 1336, 1477, 1633)
+SAMPLE_DIVIDER = 6250                   # 50MHz / 8kHz
+SINE_LUT_VHD = os.path.join(config.PROJECT_ROOT, 'fpga', 'sine_lut.vhd')
+
+# dtmf_generator 的 key_idx 编码 -> (行, 列)
+KEY_INDEX = {'1': 1, '2': 2, '3': 3, 'A': 10, '4': 4, '5': 5, '6': 6, 'B': 11,
+             '7': 7, '8': 8, '9': 9, 'C': 12, '*': 14, '0': 0, '#': 15, 'D': 13}
+INDEX_KEY = {v: k for k, v in KEY_INDEX.items()}
+_ACC_MASK = np.uint64(2 ** PH_ACC_WIDTH - 1)
+
+
+def phase_increment(freq):
+    """calc_phase_inc: freq * 2^32 // CLK_FREQ"""
+    return freq * 2 ** PH_ACC_WIDTH // CLK_FREQ
+
+
+def key_increments(key):
+    """:return: (行频增量, 列频增量)"""
+    row, col = divmod(config.keys.index(key), 4)
+    return phase_increment(ROW_FREQS[row]), phase_increment(COL_FREQS[col])
+
+
+@functools.lru_cache(maxsize=None)
+def sine_rom(path=SINE_LUT_VHD):
+    """解析 sine_lut.vhd 中的 SINE_ROM 常量，返回 (256,) int64"""
+    with open(path) as f:
+        text = f.read()
+    values = [int(v) for v in re.findall(r'to_signed\((-?\d+),\s*16\)', text)]
+    if len(values) != 256:
+        raise ValueError(f"Expected 256 ROM entries in {path}, found {len(values)}")
+    return np.array(values, dtype=np.int64)
+
+
+class Segments:
+    """
+    key_valid 为 1 的区间 (以 dtmf_generator 看到的时钟沿计)
+    :param keys: 按键
+    :param first: 每段第一个 key_valid = 1 的时钟沿 (复位释放后从 1 开始计数)
+    :param last: 每段最后一个 key_valid = 1 的时钟沿
+    相邻两段首尾相接 (中间没有 key_valid = 0 的沿) 时，累加器不清零，后一段从前一段的相位继续累加
+    """
+
+    def __init__(self, keys, first, last):
+        order = np.argsort(first)
+        self.keys = [keys[i] for i in order]
+        self.first = np.asarray(first, dtype=np.int64)[order]
+        self.last = np.asarray(last, dtype=np.int64)[order]
+        if np.any(self.last < self.first) or np.any(self.first[1:] <= self.last[:-1]):
+            raise ValueError("Segments must be non-empty and must not overlap")
+        incs = np.array([key_increments(k) for k in self.keys], dtype=np.uint64).reshape(-1, 2)
+        self.inc = incs
+        # 每段开始前 (第 first-1 个沿之后) 的累加器值
+        self.acc0 = np.zeros_like(incs)
+        for i in range(1, len(self.keys)):
+            if self.first[i] == self.last[i - 1] + 1:
+                self.acc0[i] = self.acc_end(i - 1)
+
+    def acc_end(self, i):
+        n = np.uint64(self.last[i] - self.first[i] + 1)
+        return (self.acc0[i] + n * self.inc[i]) & _ACC_MASK
+
+    @classmethod
+    def from_times(cls, events):
+        """
+        :param events: [(key, start_time, end_time), ...] (s)
+        """
+        keys = [k for k, _, _ in events]
+        first = [int(round(t0 * CLK_FREQ)) + 1 for _, t0, _ in events]
+        last = [int(round(t1 * CLK_FREQ)) for _, _, t1 in events]
+        return cls(keys, first, last)
+
+    def locate(self, edges):
+        """:return: (所在段下标, 是否在段内)"""
+        i = np.searchsorted(self.first, edges, side='right') - 1
+        inside = i >= 0
+        inside[inside] &= edges[inside] <= self.last[i[inside]]
+        return i, inside
+
+    def acc_after(self, edges):
+        """第 edges 个时钟沿之后的 (行, 列) 累加器值，(n, 2) uint64"""
+        i, inside = self.locate(edges)
+        acc = np.zeros((len(edges), 2), dtype=np.uint64)
+        j = i[inside]
+        n = (edges[inside] - self.first[j] + 1).astype(np.uint64)
+        # uint64 乘法按 2^64 回绕，2^32 整除 2^64，取低 32 位即为 mod 2^32 的结果
+        acc[inside] = (self.acc0[j] + n[:, None] * self.inc[j]) & _ACC_MASK
+        return acc
+
+
+def audio_at(edges, segments, rom=None):
+    """
+    第 edges 个时钟沿之后 audio_out 的值
+    :param edges: 时钟沿序号 (int64 数组)
+    :return: int16 数组
+    """
+    rom = sine_rom() if rom is None else rom
+    edges = np.asarray(edges, dtype=np.int64)
+    _, valid = segments.locate(edges)
+    addr = (segments.acc_after(edges - 2) >> np.uint64(PH_ACC_WIDTH - 8)).astype(np.intp)
+    mixed = (rom[addr[:, 0]] + rom[addr[:, 1]]) >> 1
+    return np.where(valid, mixed, 0).astype(np.int16)
+
+
+def uart_bytes(audio):
+    """ax309_top 的串口字节：audio(15 downto 8) + 128"""
+    return ((np.asarray(audio, dtype=np.int16) >> 8) + 128).astype(np.uint8)
+
+
+def render(events, duration, chunk_samples=1 << 20):
+    """
+    硬件在 8kHz 采样时刻的输出
+    第 m 个采样 (m >= 1) 在第 6250*m 个时钟沿取得，值为该沿之前 (第 6250*m-1 个沿之后) 的 audio_out
+    :param events: [(key, start_time, end_time), ...] (s)，key_valid 区间
+    :param duration: 时长 (s)
+    :return: (int16 PCM, uint8 串口字节)
+    """
+    segments = Segments.from_times(events) if events else None
+    n = int(round(duration * CLK_FREQ)) // SAMPLE_DIVIDER
+    pcm = np.zeros(n, dtype=np.int16)
+    if segments is not None:
+        rom = sine_rom()
+        for start in range(0, n, chunk_samples):
+            m = np.arange(start + 1, min(start + chunk_samples, n) + 1, dtype=np.int64)
+            pcm[start:start + len(m)] = audio_at(m * SAMPLE_DIVIDER - 1, segments, rom)
+    return pcm, uart_bytes(pcm)
+
+
+def random_events(duration, rng, tone=(0.05, 0.1), gap=(0.05, 0.15)):
+    """随机号码序列 (按键音 / 间隔时长均匀分布)，用于大规模生成"""
+    events, t = [], rng.uniform(*gap)
+    while True:
+        t1 = t + rng.uniform(*tone)
+        if t1 > duration:
+            return events
+        events.append((rng.choice(config.keys), t, t1))
+        t = t1 + rng.uniform(*gap)
+
+
+# ===== 与 GHDL 参考输出比对 =====
+
+def testbench_segments(tone_cycles, gap_cycles, n_keys=16):
+    """
+    fpga/model_dump_tb.vhd 的激励：第 n 个时钟沿为 key_idx = (n-1) // slot 赋值，从第 n+1 个沿起生效
+    """
+    slot = tone_cycles + gap_cycles
+    first = [k * slot + 2 for k in range(n_keys)]
+    last = [k * slot + tone_cycles + 1 for k in range(n_keys)]
+    return Segments([INDEX_KEY[k] for k in range(n_keys)], first, last)
+
+
+def load_dump(path):
+    """
+    读取 model_dump_tb 的输出
+    :return: (激励参数 dict, 时钟沿序号, audio_out)
+    """
+    params = {}
+    edges, values = [], []
+    with open(path) as f:
+        for line in f:
+            if line.startswith('#'):
+                tokens = line[1:].split()
+                params.update({k: int(v) for k, v in zip(tokens[::2], tokens[1::2])})
+            elif line.strip():
+                n, value = line.split()
+                edges.append(int(n))
+                values.append(int(value))
+    return params, np.array(edges, dtype=np.int64), np.array(values, dtype=np.int64)
+
+
+def compare_dump(path):
+    """
+    模型与 GHDL 参考输出逐位比对
+    :return: (比对的采样数, 不一致的采样 [(时钟沿, GHDL, 模型), ...])
+    """
+    params, edges, values = load_dump(path)
+    segments = testbench_segments(params['tone_cycles'], params['gap_cycles'])
+    # 采样沿读到的是前一个沿之后的输出
+    model = audio_at(edges - 1, segments).astype(np.int64)
+    bad = np.flatnonzero(model != values)
+    return len(values), [(int(edges[i]), int(values[i]), int(model[i])) for i in bad]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bit-exact NumPy model of the FPGA DTMF generator")
+    parser.add_argument('--compare', metavar='DUMP', help="compare with a GHDL dump from model_dump_tb")
+    parser.add_argument('--render', type=float, metavar='SECONDS', help="render random digits and time it")
+    parser.add_argument('--decode', type=float, metavar='SECONDS',
+                        help="render random digits and decode the UART bytes (hardware-quantized input)")
+    parser.add_argument('--snr', type=float, help="add white noise before UART quantization (dB)")
+    parser.add_argument('-o', '--output', help="write the rendered UART bytes as an 8-bit WAV")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        if not os.path.exists(args.compare):
+            print(f"{args.compare} not found; run ./simulate_vhdl.sh --dump first (requires GHDL)")
+            return 2
+        n, mismatches = compare_dump(args.compare)
+        print(f"{n} samples compared, {len(mismatches)} mismatches")
+        for edge, ghdl, model in mismatches[:10]:
+            print(f"  edge {edge}: GHDL {ghdl}, model {model}")
+        return 1 if mismatches or n == 0 else 0
+
+    seconds = args.decode or args.render
+    if not seconds:
+        parser.error("specify --compare, --render or --decode")
+    import time
+    rng = np.random.default_rng(args.seed)
+    events = random_events(seconds, rng)
+    t0 = time.perf_counter()
+    pcm, uart = render(events, seconds)
+    elapsed = time.perf_counter() - t0
+    print(f"Rendered {seconds:.0f}s ({len(events)} digits, {len(pcm)} samples) in {elapsed:.2f}s "
+          f"({seconds / elapsed:.0f}x real time)")
+    if args.snr is not None:
+        noise = rng.standard_normal(len(pcm)) * np.sqrt(np.mean(pcm.astype(float) ** 2) / 10 ** (args.snr / 10))
+        uart = uart_bytes(np.clip(pcm + noise, -32768, 32767))
+    if args.output:
+        from scipy.io import wavfile
+        wavfile.write(args.output, config.fs, uart)
+        print(f"UART bytes written to {args.output}")
+    if args.decode:
+        from .decoder import decode_chunks
+        chunk = 60 * config.fs
+        digits = ''.join(k for k, _, _ in decode_chunks(uart[i:i + chunk] for i in range(0, len(uart), chunk)))
+        expected = ''.join(k for k, _, _ in events)
+        print(f"Decoded {len(digits)} / {len(expected)} digits, exact match: {digits == expected}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+instrument.py
+热路径埋点 (Hot-path Instrumentation)
+
+桥接程序跟不上实时流时，需要知道时间花在哪一步 (串口读取、转换、滤波、Goertzel、验证、HTTP 上报)。
+本模块提供轻量的计时器 / 计数器 / 瞬时值：
+- timer(name):     上下文管理器，记录一段代码的耗时 (对数分桶直方图 + 累计值)
+- timed(name):     函数装饰器，等价于用 timer 包住整个函数
+- count(name, n):  事件计数 (如读取字节数、丢弃的采样点)
+- gauge(name, v):  瞬时值 (如队列深度)
+默认关闭：关闭时 timer() 返回共享的空上下文，timed 包装只多一次全局变量判断，热路径开销可忽略。
+通过 enable() 或环境变量 DTMF_INSTRUMENT=1 打开。
+汇总可导出为 JSON 或 Prometheus 文本格式，Reporter 周期性写入本地文件，serve_metrics 提供本地 HTTP 端点。
+
+Usage:
+    from src.core import instrument
+    instrument.enable()
+    with instrument.timer('bridge.filter'):
+        ...
+    instrument.count('bridge.samples_dropped', 800)
+    print(instrument.to_prometheus())
+    reporter = instrument.Reporter('metrics.json', interval=10).start()
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# 直方图桶上界 (秒)：10us 到 10s，每个数量级 4 个桶，最后一个桶为 +Inf
+BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 1) for m in (1, 2, 5)) + (10.0, float('inf'))
+
+_enabled = os.environ.get('DTMF_INSTRUMENT', '') not in ('', '0')
+_lock = threading.Lock()
+
+
+class _Stat:
+    """单个计时器的累计统计"""
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def quantile(self, q):
+        """由分桶估计分位数 (返回所在桶的上界，最后一桶返回最大值)"""
+        if self.count == 0:
+            return float('nan')
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+_timers = {}
+_counters = {}
+_gauges = {}
+_started = time.time()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """清空所有统计，速率从此刻重新计算"""
+    global _started
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+        _gauges.clear()
+        _started = time.time()
+
+
+def record(name, seconds):
+    """直接记录一次耗时 (秒)"""
+    with _lock:
+        stat = _timers.get(name)
+        if stat is None:
+            stat = _timers[name] = _Stat()
+        stat.add(seconds)
+
+
+def count(name, n=1):
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def gauge(name, value):
+    if _enabled:
+        _gauges[name] = value
+
+
+class _Timer:
+    __slots__ = ('name', 't0')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """
+    计时上下文管理器；关闭时返回共享的空上下文
+    :param name: 阶段名，建议用 '模块.阶段' (如 'bridge.serial_read')
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def timed(name):
+    """函数装饰器：每次调用计入计时器 name"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+# ===== 汇总与导出 =====
+
+def snapshot():
+    """
+    当前统计的汇总
+    :return: {'time', 'uptime_s', 'timers': {名称: {count, rate_per_s, total_s, mean_ms, min_ms, p50_ms,
+              p99_ms, max_ms, buckets}}, 'counters': {名称: {value, rate_per_s}}, 'gauges': {名称: 值}}
+    """
+    with _lock:
+        uptime = max(time.time() - _started, 1e-9)
+        timers = {}
+        for name, s in sorted(_timers.items()):
+            timers[name] = {'count': s.count, 'rate_per_s': s.count / uptime, 'total_s': s.total,
+                            'mean_ms': s.total / s.count * 1000, 'min_ms': s.min * 1000,
+                            'p50_ms': s.quantile(0.5) * 1000, 'p99_ms': s.quantile(0.99) * 1000,
+                            'max_ms': s.max * 1000, 'buckets': list(s.buckets)}
+        counters = {name: {'value': v, 'rate_per_s': v / uptime} for name, v in sorted(_counters.items())}
+        gauges = dict(sorted(_gauges.items()))
+    return {'time': time.time(), 'uptime_s': uptime, 'timers': timers, 'counters': counters, 'gauges': gauges}
+
+
+def to_json(snap=None):
+    return json.dumps(snap or snapshot(), indent=2)
+
+
+def _bound(b):
+    return '+Inf' if b == float('inf') else repr(b)
+
+
+def to_prometheus(snap=None, prefix='dtmf'):
+    """
+    Prometheus 文本格式 (exposition format 0.0.4)
+    计时器为 histogram <prefix>_stage_seconds{stage=...}，计数器为 <prefix>_events_total{name=...}，
+    瞬时值为 <prefix>_gauge{name=...}
+    """
+    snap = snap or snapshot()
+    lines = [f'# HELP {prefix}_stage_seconds Time spent per processing stage',
+             f'# TYPE {prefix}_stage_seconds histogram']
+    for name, t in snap['timers'].items():
+        cumulative = 0
+        for bound, n in zip(BUCKETS, t['buckets']):
+            cumulative += n
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{_bound(bound)}"}} {cumulative}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {t["total_s"]!r}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {t["count"]}')
+    lines += [f'# HELP {prefix}_events_total Event counters', f'# TYPE {prefix}_events_total counter']
+    for name, c in snap['counters'].items():
+        lines.append(f'{prefix}_events_total{{name="{name}"}} {c["value"]}')
+    lines += [f'# HELP {prefix}_gauge Instantaneous values', f'# TYPE {prefix}_gauge gauge']
+    for name, v in snap['gauges'].items():
+        lines.append(f'{prefix}_gauge{{name="{name}"}} {v}')
+    return '\n'.join(lines) + '\n'
+
+
+def format_summary(snap=None):
+    """单行可读摘要：各阶段均值 / p99 与计数器速率"""
+    snap = snap or snapshot()
+    parts = [f"{name} {t['mean_ms']:.3f}/{t['p99_ms']:.3f}ms x{t['count']}" for name, t in snap['timers'].items()]
+    parts += [f"{name}={c['value']} ({c['rate_per_s']:.1f}/s)" for name, c in snap['counters'].items()]
+    parts += [f"{name}={v}" for name, v in snap['gauges'].items()]
+    return ' | '.join(parts)
+
+
+def write(path, fmt='json'):
+    """写入本地文件 (先写临时文件再替换，读取方不会看到半个文件)"""
+    text = to_prometheus() if fmt == 'prometheus' else to_json()
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class Reporter:
+    """
+    后台线程，每 interval 秒输出一次汇总
+    :param path: 写入的文件 (None 则不写文件)
+    :param fmt: 'json' | 'prometheus'
+    :param echo: 是否同时打印单行摘要
+    """
+
+    def __init__(self, path=None, interval=10.0, fmt='json', echo=False):
+        self.path = path
+        self.interval = interval
+        self.fmt = fmt
+        self.echo = echo
+        self._stop = threading.Event()
+        self._thread = None
+
+    def report(self):
+        if self.path:
+            write(self.path, self.fmt)
+        if self.echo:
+            print(f"   [Metrics] {format_summary()}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='instrument-reporter', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止线程并输出最后一次汇总"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.report()
+
+
+def serve_metrics(port=9108, host='127.0.0.1'):
+    """
+    在后台线程启动本地 HTTP 端点：/metrics 为 Prometheus 文本，/metrics.json 为 JSON
+    :return: HTTPServer (调用 shutdown() 停止)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/metrics':
+                body, ctype = to_prometheus(), 'text/plain; version=0.0.4'
+            elif self.path == '/metrics.json':
+                body, ctype = to_json(), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='instrument-http', daemon=True).start()
+    return server
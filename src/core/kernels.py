@@ -0,0 +1,247 @@
+"""
+kernels.py
+逐采样递推内核 (Sample-recurrence Kernels, optional Numba JIT)
+
+块处理走 dsp.dtmf_powers 的矩阵乘法即可；但流式小块、定点仿真等场景只能逐采样递推，
+解释执行的循环慢约 100 倍。这里提供三类内核：
+- goertzel():        多频点 Goertzel 递推 (dsp.goertzel 的实现)
+- SlidingDFT:        滑动 DFT，逐采样更新若干频点，任意时刻可读取最近 N 点窗口的能量
+- classify():        峰值显著性 + 能量门限验证与按键判决 (dsp.classify_powers 的内核；单帧的
+                     identify_key 验证只有几次 4 元素运算，仍走 NumPy，不为它加载 numba)
+安装了 numba 时自动使用 @njit 编译版本 (cache=True，编译结果缓存在磁盘，之后的进程直接加载)；
+否则回退到 NumPy / 纯 Python 实现。两种后端的运算顺序相同，结果逐位一致。
+numba 在第一次调用内核时才导入，导入本模块不增加启动时间。
+环境变量 DTMF_KERNELS=numpy 可强制使用回退实现 (或调用 set_backend)。
+
+Usage:
+    from src.core import kernels
+    kernels.backend()                       # 'numba' | 'numpy'
+    kernels.goertzel(signal, coeffs)        # (F,) 能量
+    sdft = kernels.SlidingDFT(205, (697, 770, 852, 941, 1209, 1336, 1477, 1633), 8000)
+    sdft.update(chunk); sdft.powers()
+"""
+import os
+
+import numpy as np
+
+
+# ===== 内核源码：同一份代码既作为纯 Python 回退执行，也交给 numba 编译 =====
+
+def _goertzel_kernel(signal, coeffs, out):
+    for j in range(len(coeffs)):
+        c = coeffs[j]
+        s1 = 0.0
+        s2 = 0.0
+        for x in signal:
+            s = x + c * s1 - s2
+            s2 = s1
+            s1 = s
+        out[j] = s1 * s1 + s2 * s2 - c * s1 * s2
+    return out
+
+
+def _sdft_kernel(chunk, ring, pos, re, im, cos_w, sin_w):
+    n = len(ring)
+    for x in chunk:
+        delta = x - ring[pos]
+        ring[pos] = x
+        pos += 1
+        if pos == n:
+            pos = 0
+        for j in range(len(re)):
+            a = re[j] + delta
+            b = im[j]
+            re[j] = a * cos_w[j] - b * sin_w[j]
+            im[j] = a * sin_w[j] + b * cos_w[j]
+    return pos
+
+
+def _classify_kernel(l_powers, h_powers, frame_power, frame_len, code_table,
+                     peak_ratio, energy_ratio, validate, out):
+    n_low = l_powers.shape[1]
+    n_high = h_powers.shape[1]
+    for i in range(l_powers.shape[0]):
+        # 最大值与次大值 (并列时取第一个最大值的下标，与 np.argmax 一致)
+        il = 0
+        top_l = l_powers[i, 0]
+        for j in range(1, n_low):
+            if l_powers[i, j] > top_l:
+                il = j
+                top_l = l_powers[i, j]
+        second_l = -np.inf
+        for j in range(n_low):
+            if j != il and l_powers[i, j] > second_l:
+                second_l = l_powers[i, j]
+        ih = 0
+        top_h = h_powers[i, 0]
+        for j in range(1, n_high):
+            if h_powers[i, j] > top_h:
+                ih = j
+                top_h = h_powers[i, j]
+        second_h = -np.inf
+        for j in range(n_high):
+            if j != ih and h_powers[i, j] > second_h:
+                second_h = h_powers[i, j]
+        code = code_table[il, ih]
+        if validate:
+            # 检验1：峰值显著性
+            if not (top_l / (second_l + 1e-10) >= peak_ratio and top_h / (second_h + 1e-10) >= peak_ratio):
+                code = -1
+            # 检验2：能量门限 (总功率为 0 时不做该检验)
+            elif not (frame_power[i] <= 0 or (top_l + top_h) / (frame_power[i] * frame_len) >= energy_ratio):
+                code = -1
+        out[i] = code
+    return out
+
+
+# ===== 后端选择 =====
+
+_backend = None
+_compiled = {}
+
+
+def _numba_available():
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def set_backend(name='auto'):
+    """
+    选择后端
+    :param name: 'auto' (有 numba 则用 numba) | 'numba' | 'numpy'
+    """
+    global _backend
+    if name == 'auto':
+        name = 'numba' if _numba_available() else 'numpy'
+    elif name == 'numba' and not _numba_available():
+        raise ImportError("numba is not installed")
+    elif name not in ('numba', 'numpy'):
+        raise ValueError(f"Unknown kernel backend {name!r}")
+    _backend = name
+    return name
+
+
+def backend():
+    """当前后端，首次调用时按 DTMF_KERNELS 环境变量 (默认 auto) 选择"""
+    if _backend is None:
+        return set_backend(os.environ.get('DTMF_KERNELS', 'auto'))
+    return _backend
+
+
+def _jit(fn):
+    """取 fn 的 numba 编译版本 (首次调用时编译或从磁盘缓存加载)"""
+    compiled = _compiled.get(fn.__name__)
+    if compiled is None:
+        import numba
+        compiled = _compiled[fn.__name__] = numba.njit(cache=True, nogil=True)(fn)
+    return compiled
+
+
+def warmup():
+    """预先编译 / 加载全部内核 (服务启动时调用，避免首个请求承担编译时间)"""
+    if backend() != 'numba':
+        return
+    goertzel(np.zeros(8), np.zeros(2))
+    SlidingDFT(8, (1000.0,), 8000).update(np.zeros(4))
+    powers = np.ones((1, 4))
+    classify(powers, powers, np.ones(1), 8, np.zeros((4, 4), dtype=np.int64), 1.5, 0.01)
+
+
+# ===== 对外接口 =====
+
+def goertzel(signal, coeffs):
+    """
+    多频点 Goertzel 递推
+    :param signal: 一维信号 (N,)
+    :param coeffs: 各频点系数 2*cos(2*pi*k/N)，(F,)
+    :return: 各频点能量 (F,)，等于 |X(k)|^2
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    out = np.empty(len(coeffs))
+    if backend() == 'numba':
+        return _jit(_goertzel_kernel)(np.asarray(signal, dtype=float), coeffs, out)
+    # 纯 Python 浮点运算 (列表迭代比逐个访问 NumPy 元素快得多)，与 numba 版本运算顺序相同
+    return _goertzel_kernel(np.asarray(signal, dtype=float).tolist(), coeffs.tolist(), out)
+
+
+class SlidingDFT:
+    """
+    滑动 DFT：X_k <- (X_k + x_new - x_old) * exp(j*2*pi*k/N)
+    X_k 始终等于最近 N 个采样 (最早的为 t=0) 的 DFT sum x[t]*exp(-j*2*pi*k*t/N)，
+    每个新采样对每个频点只需一次复数乘法，任意时刻 powers() 为该窗口的 |X(k)|^2
+    (与对该窗口做 Goertzel 相同的整数频点；窗口未填满时视前面的采样为 0)
+    长时间运行会累积舍入误差，可周期性调用 reset() 或 resync()
+    :param n: 窗口长度 N
+    :param freqs: 检测频率
+    :param fs: 采样率
+    """
+
+    def __init__(self, n, freqs, fs):
+        from .config import dft_bins
+        self.n = n
+        self.bins = dft_bins(n, tuple(freqs), fs)
+        w = 2 * np.pi * self.bins / n
+        self.cos_w = np.cos(w)
+        self.sin_w = np.sin(w)
+        self.numba = backend() == 'numba'
+        self.reset()
+
+    def reset(self):
+        n_bins = len(self.bins)
+        if self.numba:
+            self.ring, self.re, self.im = np.zeros(self.n), np.zeros(n_bins), np.zeros(n_bins)
+        else:
+            self.ring, self.re, self.im = [0.0] * self.n, [0.0] * n_bins, [0.0] * n_bins
+        self.pos = 0
+
+    def update(self, chunk):
+        """
+        逐采样处理一个块
+        :param chunk: 一维采样块 (任意长度，包括 1)
+        :return: self
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if self.numba:
+            self.pos = _jit(_sdft_kernel)(chunk, self.ring, self.pos, self.re, self.im, self.cos_w, self.sin_w)
+        else:
+            self.pos = _sdft_kernel(chunk.tolist(), self.ring, self.pos, self.re, self.im,
+                                    self.cos_w.tolist(), self.sin_w.tolist())
+        return self
+
+    def window(self):
+        """最近 N 个采样 (时间顺序)"""
+        ring = np.asarray(self.ring)
+        return np.concatenate([ring[self.pos:], ring[:self.pos]])
+
+    def resync(self):
+        """由当前窗口重新计算 X_k (直接 DFT)，清除累积的舍入误差"""
+        window = self.window()
+        t = np.arange(self.n)
+        x = window @ np.exp(-1j * np.outer(t, 2 * np.pi * self.bins / self.n))
+        re, im = x.real.copy(), x.imag.copy()
+        self.re, self.im = (re, im) if self.numba else (re.tolist(), im.tolist())
+
+    def powers(self):
+        """各频点能量 (F,)"""
+        re, im = np.asarray(self.re), np.asarray(self.im)
+        return re * re + im * im
+
+
+def classify(l_powers, h_powers, frame_power, frame_len, code_table, peak_ratio, energy_ratio):
+    """
+    逐帧判决 + 有效性验证 (numba 内核；dsp.classify_powers 在 numba 后端下调用)
+    :param frame_power: 每帧平均功率，None 表示不验证
+    :return: 按键编码 (n_frames,)，验证失败为 -1
+    """
+    l_powers = np.ascontiguousarray(l_powers, dtype=float)
+    h_powers = np.ascontiguousarray(h_powers, dtype=float)
+    validate = frame_power is not None
+    frame_power = np.zeros(len(l_powers)) if frame_power is None else \
+        np.broadcast_to(np.asarray(frame_power, dtype=float), (len(l_powers),))
+    out = np.empty(len(l_powers), dtype=np.int64)
+    return _jit(_classify_kernel)(l_powers, h_powers, np.ascontiguousarray(frame_power),
+                                  float(frame_len or 0), np.asarray(code_table, dtype=np.int64),
+                                  float(peak_ratio), float(energy_ratio), validate, out)
@@ -3,21 +3,22 @@ MUSIC (Multiple Signal Classification) Algorithm Implementation for DTMF
 基于子空间的高分辨率频率估计算法
 """
 import numpy as np
-from scipy import linalg
-from . import config
+from . import config, dsp
 
 class MusicDetector:
-    def __init__(self, fs=8000, n_elements=100, n_signals=4):
+    def __init__(self, fs=None, n_elements=100, n_signals=4, cfg=None):
         """
         初始化 MUSIC 检测器
-        :param fs: 采样率
+        :param fs: 采样率，若为 None 则使用 cfg.fs
         :param n_elements: 观测向量长度 (M)，即子空间维数，相当于 DFT 的 N
                            也常称为 M (阵元数/抽头数)。需满足 p < M < N_samples
         :param n_signals: 预计信号源数量 (p)。DTMF 是双音实信号，包含 2 个频率成分。
                           每个实正弦波对应 2 个复指数 (e^jwt, e^-jwt)，
                           所以理论上信号子空间维数为 4。
+        :param cfg: 检测配置 (频率方案、导向矩阵缓存)，若为 None 则使用 config.DEFAULT
         """
-        self.fs = fs
+        self.cfg = config.resolve(cfg, fs=fs)
+        self.fs = self.cfg.fs
         self.M = n_elements
         self.p = n_signals
         
@@ -28,6 +29,8 @@ class MusicDetector:
         :param freq_grid: 需要计算伪谱的频率点数组
         :return: 伪谱值 (dB)
         """
+        from scipy import linalg  # 延迟导入，保持 core 包轻量
+        
         N = len(signal)
         if N < self.M:
             raise ValueError(f"Signal length {N} must be greater than subspace dimension {self.M}")
@@ -59,30 +62,20 @@ class MusicDetector:
         # 预计算噪声投影矩阵 Pn = En * En^H
         Pn = En @ En.T
         
-        spectrum = []
-        for f in freq_grid:
-            # 构造导向矢量 a(f) = [1, e^-jw, ..., e^-j(M-1)w]^T
-            # 注意：这里的相位符号取决于定义，通常 e^{-j\omega n}
-            w = 2 * np.pi * f / self.fs
-            t = np.arange(self.M)
-            a = np.exp(-1j * w * t)
-            
-            # 计算分母: |a^H * En|^2 = a^H * Pn * a
-            # 由于 R 是实对称的，En 是实的 (如果 X 是实矩阵)
-            # 但导向矢量 a 是复的。
-            # P_music = 1 / abs(a.conj().T @ Pn @ a)
-            
-            # 优化计算: denom = a.H @ Pn @ a
-            denom = np.vdot(a, Pn @ a).real
-            
-            # 避免除零
-            if denom < 1e-15:
-                ps = 100 # 极大值
-            else:
-                ps = 10 * np.log10(1.0 / denom)
-            spectrum.append(ps)
-            
-        return np.array(spectrum)
+        # 导向矩阵 A 的每一列是导向矢量 a(f) = [1, e^-jw, ..., e^-j(M-1)w]^T
+        # 注意：这里的相位符号取决于定义，通常 e^{-j\omega n}
+        # 按 (M, 频率网格, fs) 缓存，重复调用不再逐频点重新构造
+        A = config.steering_matrix(self.M, tuple(freq_grid), self.fs)
+
+        # 计算分母: |a^H * En|^2 = a^H * Pn * a
+        # 由于 R 是实对称的，En 是实的 (如果 X 是实矩阵)
+        # 但导向矢量 a 是复的。
+        # P_music = 1 / abs(a.conj().T @ Pn @ a)
+        denom = np.einsum('ij,ij->j', A.conj(), Pn @ A).real
+
+        # 避免除零 (极大值 100dB)
+        with np.errstate(divide='ignore'):
+            return np.where(denom < 1e-15, 100, 10 * np.log10(1.0 / denom))
 
     def detect(self, signal):
         """
@@ -91,28 +84,65 @@ class MusicDetector:
         # 定义搜索频率网格：覆盖低频群和高频群
         # 为了提高效率，只搜索 DTMF 标称频率附近
         
-        low_freqs = config.low_freqs
-        high_freqs = config.high_freqs
+        cfg = self.cfg
         
         # 计算伪谱
         # 我们只关心 8 个标准频率点的伪谱高度
-        target_freqs = low_freqs + high_freqs
-        spectrum = self.compute_spectrum(signal, target_freqs)
+        spectrum = self.compute_spectrum(signal, cfg.freqs)
         
         # 分离低频和高频的谱值
-        l_spectrum = spectrum[:4]
-        h_spectrum = spectrum[4:]
+        l_spectrum = spectrum[:cfg.n_low]
+        h_spectrum = spectrum[cfg.n_low:]
         
         # 找峰值
         idx_l = np.argmax(l_spectrum)
         idx_h = np.argmax(h_spectrum)
         
-        best_l = low_freqs[idx_l]
-        best_h = high_freqs[idx_h]
-        
-        # 匹配按键
-        for key, (fL, fH) in config.freq_map.items():
-            if fL == best_l and fH == best_h:
-                return key, (l_spectrum[idx_l], h_spectrum[idx_h])
-        
-        return None, (0, 0)
+        # 匹配按键 (峰值下标直接查表)
+        return cfg.key_table[idx_l][idx_h], (l_spectrum[idx_l], h_spectrum[idx_h])
+
+    def spectrum_batch(self, signals):
+        """
+        批量计算各 DTMF 频点的 MUSIC 伪谱 (所有信号等长)
+        协方差矩阵由滑动窗口视图批量构造，np.linalg.eigh 对整叠矩阵一次特征分解，
+        导向矩阵取自 cfg 缓存
+        :param signals: 信号矩阵 (n, N)
+        :return: 伪谱 (n, F) dB，列顺序同 cfg.freqs (低频组在前)
+        """
+        signals = np.atleast_2d(np.asarray(signals, dtype=float))
+        N = signals.shape[1]
+        if N < self.M:
+            raise ValueError(f"Signal length {N} must be greater than subspace dimension {self.M}")
+
+        # X[n] 的每一行是一个长度为 M 的快拍，对应 Hankel 矩阵的一列
+        K = N - self.M + 1
+        X = np.lib.stride_tricks.sliding_window_view(signals, self.M, axis=1)
+        R = (np.swapaxes(X, 1, 2) @ X) / K
+
+        _, eigvecs = np.linalg.eigh(R)
+        En = eigvecs[:, :, :self.M - self.p]
+
+        A = self.cfg.steering_matrix(self.M)  # (M, F)
+
+        # a^H Pn a = ||En^T a||^2
+        proj = np.swapaxes(En, 1, 2) @ A
+        denom = np.sum(proj.real**2 + proj.imag**2, axis=1)
+        with np.errstate(divide='ignore'):
+            return np.where(denom < 1e-15, 100, 10 * np.log10(1.0 / denom))
+
+    def detect_batch(self, signals):
+        """
+        批量 MUSIC 检测 (所有信号等长)
+        :param signals: 信号矩阵 (n, N)
+        :return: [(key, (l_peak, h_peak)), ...]，与逐个调用 detect() 一致
+        """
+        cfg = self.cfg
+        spectrum = self.spectrum_batch(signals)
+
+        l_spectrum, h_spectrum = spectrum[:, :cfg.n_low], spectrum[:, cfg.n_low:]
+        idx_l = np.argmax(l_spectrum, axis=1)
+        idx_h = np.argmax(h_spectrum, axis=1)
+        rows = np.arange(len(spectrum))
+        keys = dsp.codes_to_keys(cfg.code_table[idx_l, idx_h], cfg)
+
+        return list(zip(keys, zip(l_spectrum[rows, idx_l], h_spectrum[rows, idx_h])))
@@ -0,0 +1,141 @@
+"""
+resample.py
+多相重采样前端 (Polyphase Resampling Front-end)
+
+所有检测算法都工作在 config.fs (8kHz)。16k / 44.1k / 48k 的录音需要先做
+带抗混叠滤波的有理数倍重采样，而不是直接抽取 (data[::step] 会混叠，且 44.1k 无法整数抽取)。
+
+- resample(): 整段重采样，scipy.signal.resample_poly，FIR 设计按 (up, down) 缓存
+- StreamingResampler: 有状态的分块重采样，逐块输出，拼接结果与整段 resample() 一致
+"""
+import numpy as np
+from math import gcd
+from functools import lru_cache
+from scipy import signal as scipy_signal
+
+
+def _ratio(fs_in, fs_out):
+    """化简重采样比例为互质的 (up, down)"""
+    fs_in, fs_out = int(fs_in), int(fs_out)
+    g = gcd(fs_in, fs_out)
+    return fs_out // g, fs_in // g
+
+
+@lru_cache(maxsize=32)
+def design_filter(up, down):
+    """
+    抗混叠低通 FIR (与 resample_poly 默认设计相同：Kaiser 窗 beta=5，半长 10*max(up, down))
+    只设计一次，按 (up, down) 缓存；44.1k->8k 的滤波器长达 8821 阶，重复设计代价不小
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    h = scipy_signal.firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+    h.setflags(write=False)
+    return h
+
+
+def resample(x, fs_in, fs_out, axis=-1):
+    """
+    整段重采样
+    :param x: 输入信号 (支持多维，沿 axis 重采样)
+    :param fs_in: 输入采样率
+    :param fs_out: 输出采样率
+    :return: 重采样后的浮点信号，长度 ceil(n * fs_out / fs_in)
+    """
+    up, down = _ratio(fs_in, fs_out)
+    x = np.asarray(x, dtype=float)
+    if up == down:
+        return x
+    return scipy_signal.resample_poly(x, up, down, axis=axis, window=design_filter(up, down))
+
+
+class StreamingResampler:
+    """
+    有状态流式重采样器
+
+    内部保存足够的输入历史 (约 滤波器长度/up 个采样点)，每次 process() 只输出
+    所需输入已全部到达的采样点；结束时调用 flush() 以零填充补齐尾部。
+    process() 各次输出与 flush() 的拼接结果与 resample() 整段处理一致。
+    """
+
+    def __init__(self, fs_in, fs_out):
+        self.fs_in = fs_in
+        self.fs_out = fs_out
+        self.up, self.down = _ratio(fs_in, fs_out)
+        self.reset()
+        if self.up == self.down:
+            return
+
+        # 与 resample_poly 相同的前置补零，使输出样点对齐滤波器中心
+        h = design_filter(self.up, self.down) * self.up
+        half_len = (len(h) - 1) // 2
+        n_pre_pad = self.down - half_len % self.down
+        self._h = np.concatenate((np.zeros(n_pre_pad), h))
+        self._delay = (half_len + n_pre_pad) // self.down
+
+    def reset(self):
+        self._buf = np.zeros(0)
+        self._buf_start = 0   # _buf[0] 的全局输入下标 (始终为 down 的整数倍)
+        self._n_in = 0        # 已输入采样点总数
+        self._n_out = 0       # 已输出采样点总数
+
+    def process(self, chunk):
+        """
+        输入一块采样，返回本次可以确定的输出采样
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if self.up == self.down:
+            self._n_in += len(chunk)
+            self._n_out += len(chunk)
+            return chunk
+
+        self._buf = np.concatenate((self._buf, chunk))
+        self._n_in += len(chunk)
+
+        # 输出 m 需要上采样序列下标 (m + delay) * down 处之前的全部输入
+        m_end = (self._n_in * self.up - 1) // self.down - self._delay + 1
+        return self._emit(m_end)
+
+    def flush(self):
+        """输入结束：以零补齐滤波器尾部，输出剩余采样 (总长 ceil(n_in * up / down))，并复位状态"""
+        if self.up == self.down:
+            return np.zeros(0)
+        n_total = -(-self._n_in * self.up // self.down)
+        pad = (len(self._h) // self.up) + self.down + 1
+        self._buf = np.concatenate((self._buf, np.zeros(pad)))
+        out = self._emit(n_total)
+        self.reset()
+        return out
+
+    def _emit(self, m_end):
+        if m_end <= self._n_out:
+            return np.zeros(0)
+
+        y = scipy_signal.upfirdn(self._h, self._buf, self.up, self.down)
+        offset = self._buf_start * self.up // self.down - self._delay
+        out = y[self._n_out - offset:m_end - offset]
+        self._n_out = m_end
+
+        # 丢弃后续输出不再需要的历史输入，保持 _buf_start 为 down 的整数倍
+        keep_from = max(0, ((self._n_out + self._delay) * self.down - len(self._h) + 1) // self.up)
+        keep_from -= keep_from % self.down
+        if keep_from > self._buf_start:
+            self._buf = self._buf[keep_from - self._buf_start:]
+            self._buf_start = keep_from
+        return out
+
+
+def resample_stream(chunks, fs_in, fs_out):
+    """
+    对分块输入做流式重采样的生成器
+    :param chunks: 可迭代的浮点采样块
+    :return: 逐块产出重采样后的采样
+    """
+    resampler = StreamingResampler(fs_in, fs_out)
+    for chunk in chunks:
+        out = resampler.process(chunk)
+        if len(out):
+            yield out
+    tail = resampler.flush()
+    if len(tail):
+        yield tail
@@ -0,0 +1,149 @@
+"""
+decode_files.py
+通话录音批量解码工具 (WAV -> 号码串)
+
+WAV 文件以内存映射方式打开 (scipy.io.wavfile.read(mmap=True))，
+按固定大小分块解码，单个文件无论多长都不会整段读入内存；
+非 8kHz 的录音在分块过程中经流式多相重采样 (core.resample) 转换到 config.fs；
+多个文件由进程池并行处理，结果写出为 JSONL 或 CSV，并附带每个文件的吞吐统计。
+
+Usage:
+    python -m src.decode_files recordings/ -o results.jsonl
+    python -m src.decode_files a.wav b.wav -o results.csv -j 8 --chunk-seconds 30
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from scipy.io import wavfile
+
+from .core import config, decoder, resample
+
+
+def find_wav_files(paths):
+    """展开命令行参数：文件直接使用，目录递归查找 *.wav"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, n) for n in names if n.lower().endswith('.wav'))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def decode_file(path, chunk_seconds=60.0, min_on=decoder.MIN_TONE_ON, min_off=decoder.MIN_TONE_OFF):
+    """
+    解码单个 WAV 文件；读取或解码中的任何异常都记录为该文件的 error，不中断整批
+    :return: 结果字典 (文件信息、按键事件、耗时与实时倍率)，失败时为 {'file', 'error'}
+    """
+    try:
+        return _decode(path, chunk_seconds, min_on, min_off)
+    except Exception as e:
+        return {'file': path, 'error': f"{type(e).__name__}: {e}"}
+
+
+def _decode(path, chunk_seconds, min_on, min_off):
+    start = time.perf_counter()
+    fs, data = wavfile.read(path, mmap=True)
+    if data.ndim > 1:
+        data = data[:, 0]  # 多声道只取第一声道 (仍是内存映射视图)
+
+    chunk = int(chunk_seconds * fs)
+    if chunk < 1:
+        raise ValueError(f"chunk_seconds={chunk_seconds} is less than one sample at {fs} Hz")
+    chunks = (decoder.pcm_to_float(data[i:i + chunk]) for i in range(0, len(data), chunk))
+    if fs != config.fs:
+        chunks = resample.resample_stream(chunks, fs, config.fs)
+    events = decoder.decode_chunks(chunks, config.fs, min_on=min_on, min_off=min_off)
+    elapsed = time.perf_counter() - start
+    audio_seconds = len(data) / fs
+
+    return {
+        'file': path,
+        'fs': int(fs),
+        'duration_s': round(audio_seconds, 3),
+        'digits': ''.join(key for key, _, _ in events),
+        'events': [{'key': key, 'start': round(t0, 3), 'end': round(t1, 3)}
+                   for key, t0, t1 in events],
+        'elapsed_s': round(elapsed, 4),
+        'realtime_factor': round(audio_seconds / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def _decode_job(args):
+    return decode_file(*args)
+
+
+def write_results(results, out_path, fmt):
+    """写出结果：JSONL 每行一个文件；CSV 的 events 列为 key@start-end 以空格分隔"""
+    out = open(out_path, 'w', newline='') if out_path != '-' else sys.stdout
+    try:
+        if fmt == 'jsonl':
+            for res in results:
+                out.write(json.dumps(res, ensure_ascii=False) + '\n')
+        else:
+            fields = ['file', 'fs', 'duration_s', 'digits', 'events',
+                      'elapsed_s', 'realtime_factor', 'error']
+            writer = csv.DictWriter(out, fieldnames=fields)
+            writer.writeheader()
+            for res in results:
+                row = dict(res)
+                if 'events' in row:
+                    row['events'] = ' '.join(f"{e['key']}@{e['start']}-{e['end']}"
+                                             for e in row['events'])
+                writer.writerow(row)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch DTMF digit decoding of WAV recordings")
+    parser.add_argument('paths', nargs='+', help="WAV files or directories (searched recursively)")
+    parser.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv'],
+                        help="output format (default: from output extension, else jsonl)")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-seconds', type=float, default=60.0,
+                        help="audio decoded per chunk, bounds memory per worker (default: 60)")
+    parser.add_argument('--min-on', type=float, default=decoder.MIN_TONE_ON,
+                        help="minimum tone-on duration in seconds")
+    parser.add_argument('--min-off', type=float, default=decoder.MIN_TONE_OFF,
+                        help="minimum inter-digit gap in seconds")
+    args = parser.parse_args(argv)
+    if args.chunk_seconds <= 0:
+        parser.error("--chunk-seconds must be positive")
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    files = find_wav_files(args.paths)
+    if not files:
+        print("No WAV files found.", file=sys.stderr)
+        return 1
+
+    jobs = [(f, args.chunk_seconds, args.min_on, args.min_off) for f in files]
+    wall_start = time.perf_counter()
+    if args.workers <= 1:
+        results = [_decode_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(_decode_job, jobs, chunksize=max(1, len(jobs) // (4 * args.workers))))
+    wall = time.perf_counter() - wall_start
+
+    write_results(results, args.output, fmt)
+
+    ok = [r for r in results if 'error' not in r]
+    audio_total = sum(r['duration_s'] for r in ok)
+    print(f"Decoded {len(ok)}/{len(files)} files, {audio_total / 3600:.2f} h audio "
+          f"in {wall:.2f} s ({audio_total / wall:.0f}x real-time, {args.workers} workers)",
+          file=sys.stderr)
+    return 0 if len(ok) == len(files) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+detection_server.py
+多路号码检测服务 (Multi-channel DTMF Detection Server)
+
+asyncio 服务，同时接收多路 8kHz PCM 音频流，每路对应一个通道，检测到的号码逐个回送。
+每路只缓存采样；每个处理周期 (tick) 由 decoder.MultiChannelDecoder 把所有通道待处理的帧
+堆叠为一个矩阵，一次完成 8 频点能量与判决，再由各通道的流式分段器产出号码。
+通道数增加时每个周期仍只有一次矩阵运算，不会为每路单独调用检测。
+
+接入方式：
+- TCP / Unix socket: 每个连接为一个通道。可选首行 "CHANNEL <名称>\\n" 指定通道名 (否则自动编号；
+                     名称已被其他连接占用时加后缀，如 alice~2)，之后为 PCM 字节流；号码以 JSON 行回送到同一连接，连接关闭时输出剩余号码
+- UDP:               每个数据报为 4 字节通道号 (大端 uint32) + PCM；号码以 JSON 数据报回送给发送方，
+                     超过 --idle-timeout 没有数据的通道视为结束
+PCM 格式由 --pcm 指定：s16 (int16 小端，默认) 或 u8 (FPGA 串口格式，128 偏置)。
+回送的 JSON: {"channel", "key", "start", "end", "latency_ms"}，start / end 为通道流内的秒数，
+latency_ms 为按键音最后一个采样到达到号码产出的墙钟时间。
+
+--replay N 在同一进程内启动服务并用 N 路合成呼叫回放 (实时速率)，报告号码准确率与延迟。
+
+Usage:
+    python -m src.detection_server --tcp 127.0.0.1:9300 --udp 127.0.0.1:9301
+    python -m src.detection_server --unix /tmp/dtmf.sock --pcm u8 --metrics-port 9108
+    python -m src.detection_server --replay 64 --duration 10
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import struct
+import time
+
+import numpy as np
+
+from .core import config, decoder, instrument, kernels
+
+PCM_DTYPES = {'s16': np.dtype('<i2'), 'u8': np.dtype(np.uint8)}
+
+
+class _Channel:
+    """单个通道的连接状态：不完整的采样字节、采样到达时刻、号码回送方式"""
+    __slots__ = ('name', 'send', 'expires', 'partial', 'received', 'arrivals', 'last_seen')
+
+    def __init__(self, name, send, expires=False):
+        self.name = name
+        self.send = send            # send(bytes)
+        self.expires = expires      # 无连接的通道 (UDP) 超时结束
+        self.partial = b''
+        self.received = 0           # 已收到的采样数
+        self.arrivals = ([], [])    # (各块最后一个采样的序号, 到达时刻)，用于计算检测延迟
+        self.last_seen = time.monotonic()
+
+    def arrived_at(self, sample_index):
+        """第 sample_index 个采样的到达时刻，并丢弃更早的记录"""
+        counts, times = self.arrivals
+        i = min(bisect.bisect_left(counts, sample_index), len(counts) - 1)
+        t = times[i]
+        del counts[:i], times[:i]
+        return t
+
+
+class DetectionServer:
+    """
+    多路检测服务
+    :param cfg: 检测配置
+    :param pcm: 's16' (int16 小端) 或 'u8'
+    :param tick: 处理周期 (s)
+    :param idle_timeout: UDP 通道无数据多久后结束 (s)
+    """
+
+    def __init__(self, cfg=None, pcm='s16', tick=0.02, idle_timeout=2.0):
+        self.decoder = decoder.MultiChannelDecoder(cfg)
+        self.cfg = self.decoder.cfg
+        self.dtype = PCM_DTYPES[pcm]
+        self.tick = tick
+        self.idle_timeout = idle_timeout
+        self.channels = {}
+        self._next_id = 0
+        self.on_event = None        # 可选回调 on_event(event_dict)，供进程内测试使用
+
+    # ===== 通道与采样 =====
+
+    def _new_name(self):
+        self._next_id += 1
+        return f'ch{self._next_id}'
+
+    def _unique_name(self, name):
+        """请求的通道名已被占用时加后缀 ~2, ~3 ...，不接管其他连接的通道"""
+        unique, n = name, 1
+        while unique in self.channels:
+            n += 1
+            unique = f'{name}~{n}'
+        return unique
+
+    def open_channel(self, name, send, expires=False):
+        """
+        打开通道
+        :return: 通道对象 (close_channel 据此只关闭自己打开的通道)
+        """
+        if name in self.channels:
+            raise ValueError(f"Channel {name!r} is already open")
+        ch = self.channels[name] = _Channel(name, send, expires)
+        self.decoder.open(name)
+        instrument.count('server.channels_opened')
+        return ch
+
+    def feed(self, name, data):
+        """收到一段 PCM 字节 (可以在采样中间截断)"""
+        ch = self.channels[name]
+        data = ch.partial + data
+        usable = len(data) - len(data) % self.dtype.itemsize
+        ch.partial = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype)
+        if len(samples) == 0:
+            return
+        now = time.monotonic()
+        ch.received += len(samples)
+        ch.last_seen = now
+        ch.arrivals[0].append(ch.received - 1)
+        ch.arrivals[1].append(now)
+        self.decoder.feed(name, samples)
+        instrument.count('server.samples', len(samples))
+
+    def close_channel(self, name, channel=None):
+        """
+        通道结束：处理剩余采样并回送剩余号码
+        :param channel: open_channel 返回的通道对象；给出时只在该名称仍属于它时关闭
+        """
+        if name not in self.channels or (channel is not None and self.channels[name] is not channel):
+            return
+        self._dispatch(self.decoder.close(name))
+        del self.channels[name]
+        instrument.count('server.channels_closed')
+
+    def _dispatch(self, events):
+        now = time.monotonic()
+        for name, key, t0, t1 in events:
+            ch = self.channels.get(name)
+            if ch is None:
+                continue
+            last = min(int(round(t1 * self.cfg.fs)) - 1, ch.received - 1)
+            event = {'channel': name, 'key': key, 'start': round(t0, 4), 'end': round(t1, 4),
+                     'latency_ms': round((now - ch.arrived_at(last)) * 1000, 2)}
+            instrument.count('server.events')
+            if self.on_event is not None:
+                self.on_event(event)
+            try:
+                ch.send((json.dumps(event) + '\n').encode())
+            except (ConnectionError, OSError):
+                pass
+
+    def process(self):
+        """一个处理周期：所有通道的待处理帧合并为一次批量检测"""
+        instrument.gauge('server.channels', len(self.channels))
+        instrument.gauge('server.pending_samples', self.decoder.pending_samples())
+        with instrument.timer('server.tick'):
+            self._dispatch(self.decoder.process())
+
+    async def run_ticks(self):
+        """处理循环：固定周期批量处理；UDP 通道超时结束"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            self.process()
+            now = time.monotonic()
+            for name in [n for n, ch in self.channels.items()
+                         if ch.expires and now - ch.last_seen > self.idle_timeout]:
+                self.close_channel(name)
+            next_tick += self.tick
+            delay = next_tick - loop.time()
+            if delay < 0:
+                instrument.count('server.tick_overruns')
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    # ===== 接入 =====
+
+    async def handle_stream(self, reader, writer):
+        """TCP / Unix socket 连接：一个连接一个通道"""
+        data = await reader.read(65536)
+        name = None
+        if data.startswith(b'CHANNEL '):
+            while b'\n' not in data:
+                more = await reader.read(65536)
+                if not more:
+                    break
+                data += more
+            line, _, data = data.partition(b'\n')
+            name = line[len(b'CHANNEL '):].decode(errors='replace').strip() or None
+        name = self._unique_name(name) if name else self._new_name()
+        channel = self.open_channel(name, writer.write)
+        try:
+            while True:
+                if data:
+                    self.feed(name, data)
+                data = await reader.read(65536)
+                if not data:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.close_channel(name, channel)
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    def _udp_protocol(self):
+        server = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def connection_made(self, transport):
+                self.transport = transport
+
+            def datagram_received(self, data, addr):
+                if len(data) < 4:
+                    return
+                (name,) = struct.unpack('>I', data[:4])
+                if name not in server.channels:
+                    server.open_channel(name, lambda payload, a=addr: self.transport.sendto(payload, a),
+                                        expires=True)
+                server.feed(name, data[4:])
+
+        return Protocol
+
+    async def serve(self, tcp=None, unix=None, udp=None):
+        """
+        启动接入并运行处理循环 (直到取消)
+        :param tcp: (host, port)
+        :param unix: socket 路径
+        :param udp: (host, port)
+        """
+        # 接入前加载 / 编译 numba 内核，避免首批周期承担编译时间而超时
+        kernels.warmup()
+        loop = asyncio.get_running_loop()
+        servers, transports = [], []
+        if tcp:
+            servers.append(await asyncio.start_server(self.handle_stream, *tcp))
+            print(f"   [Server] TCP {tcp[0]}:{tcp[1]}")
+        if unix:
+            servers.append(await asyncio.start_unix_server(self.handle_stream, unix))
+            print(f"   [Server] Unix socket {unix}")
+        if udp:
+            transport, _ = await loop.create_datagram_endpoint(self._udp_protocol(), local_addr=udp)
+            transports.append(transport)
+            print(f"   [Server] UDP {udp[0]}:{udp[1]}")
+        try:
+            await self.run_ticks()
+        finally:
+            for s in servers:
+                s.close()
+            for t in transports:
+                t.close()
+            for name in list(self.channels):
+                self.close_channel(name)
+
+
+# ===== 合成呼叫回放 =====
+
+def synth_call(digits, rng, snr_db=20, cfg=None):
+    """
+    合成一路呼叫：开头静音，之后每个号码为 45-100ms 按键音 + 60-200ms 间隔，整体加白噪声
+    :return: (int16 PCM, [(key, start_time, end_time), ...])
+    """
+    from .core import dsp
+    cfg = cfg or config.DEFAULT
+    parts = [np.zeros(int(rng.uniform(0.1, 0.5) * cfg.fs))]
+    truth = []
+    pos = len(parts[0])
+    for key in digits:
+        tone = 0.5 * dsp.generate_dtmf(key, None, rng.uniform(0.045, 0.1), cfg)
+        gap = np.zeros(int(rng.uniform(0.06, 0.2) * cfg.fs))
+        truth.append((key, pos / cfg.fs, (pos + len(tone)) / cfg.fs))
+        parts += [tone, gap]
+        pos += len(tone) + len(gap)
+    signal = np.concatenate(parts)
+    signal += rng.standard_normal(len(signal)) * np.sqrt(0.25 / 10 ** (snr_db / 10))
+    return (np.clip(signal, -1, 1 - 2 ** -15) * 32768).astype('<i2'), truth
+
+
+async def replay_call(host, port, name, pcm, chunk_s=0.02, fs=None, speed=1.0):
+    """
+    作为 TCP 客户端回放一路 int16 PCM (按 speed 倍实时速率分块发送)
+    :return: 服务回送的号码 [event_dict, ...]
+    """
+    fs = fs or config.fs
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f'CHANNEL {name}\n'.encode())
+    chunk = max(1, int(chunk_s * fs))
+    loop = asyncio.get_running_loop()
+    t_start = loop.time()
+    for i, start in enumerate(range(0, len(pcm), chunk)):
+        writer.write(pcm[start:start + chunk].tobytes())
+        await writer.drain()
+        if speed:
+            await asyncio.sleep(max(0.0, t_start + (i + 1) * chunk_s / speed - loop.time()))
+    writer.write_eof()
+    events = []
+    async for line in reader:
+        events.append(json.loads(line))
+    writer.close()
+    return events
+
+
+async def run_replay(n_channels=16, duration=5.0, snr_db=20, tick=0.02, port=9300, seed=None):
+    """进程内启动服务并用 n_channels 路合成呼叫回放，打印准确率与延迟"""
+    rng = np.random.default_rng(seed)
+    server = DetectionServer(tick=tick)
+    calls = {}
+    for i in range(n_channels):
+        digits = ''.join(rng.choice(config.keys, size=max(1, int(duration / 0.25))))
+        calls[f'call{i}'] = synth_call(digits, rng, snr_db)
+    task = asyncio.create_task(server.serve(tcp=('127.0.0.1', port)))
+    await asyncio.sleep(0.1)
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(replay_call('127.0.0.1', port, name, pcm)
+                                     for name, (pcm, _) in calls.items()))
+    elapsed = time.perf_counter() - t0
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    correct = total = 0
+    latencies = []
+    for (pcm, truth), events in zip(calls.values(), results):
+        decoded = ''.join(e['key'] for e in events)
+        expected = ''.join(k for k, _, _ in truth)
+        correct += decoded == expected
+        total += 1
+        latencies += [e['latency_ms'] for e in events]
+    latencies = np.array(latencies) if latencies else np.array([np.nan])
+    audio_s = sum(len(pcm) for pcm, _ in calls.values()) / config.fs
+    print(f"\nChannels: {n_channels}, audio {audio_s:.1f}s in {elapsed:.1f}s wall")
+    print(f"Calls decoded exactly: {correct}/{total}")
+    print(f"Digit latency: p50 {np.percentile(latencies, 50):.1f}ms, p99 {np.percentile(latencies, 99):.1f}ms")
+    print(f"Ticks: {instrument.format_summary()}")
+
+
+def _address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-channel DTMF detection server (batched per tick)")
+    parser.add_argument('--tcp', type=_address, metavar='HOST:PORT', help="accept one channel per TCP connection")
+    parser.add_argument('--unix', metavar='PATH', help="accept one channel per Unix socket connection")
+    parser.add_argument('--udp', type=_address, metavar='HOST:PORT',
+                        help="accept datagrams of 4-byte channel id + PCM")
+    parser.add_argument('--pcm', choices=sorted(PCM_DTYPES), default='s16', help="sample format")
+    parser.add_argument('--tick', type=float, default=0.02, help="processing period in seconds")
+    parser.add_argument('--idle-timeout', type=float, default=2.0, help="UDP channel idle timeout in seconds")
+    parser.add_argument('--metrics-port', type=int, help="serve /metrics and /metrics.json on localhost")
+    parser.add_argument('--replay', type=int, metavar='N', help="self-test: replay N synthetic calls over TCP")
+    parser.add_argument('--duration', type=float, default=5.0, help="replayed call length in seconds")
+    parser.add_argument('--snr', type=float, default=20, help="replayed call SNR in dB")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    if args.metrics_port or args.replay:
+        instrument.enable()
+    if args.metrics_port:
+        instrument.serve_metrics(args.metrics_port)
+        print(f"   [Metrics] http://127.0.0.1:{args.metrics_port}/metrics")
+
+    try:
+        if args.replay:
+            port = args.tcp[1] if args.tcp else 9300
+            asyncio.run(run_replay(args.replay, args.duration, args.snr, args.tick, port, args.seed))
+        elif args.tcp or args.unix or args.udp:
+            server = DetectionServer(pcm=args.pcm, tick=args.tick, idle_timeout=args.idle_timeout)
+            asyncio.run(server.serve(args.tcp, args.unix, args.udp))
+        else:
+            parser.error("specify at least one of --tcp, --unix, --udp or --replay")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
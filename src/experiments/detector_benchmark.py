@@ -0,0 +1,267 @@
+"""
+detector_benchmark.py
+检测器热路径性能基准 (Detector Hot-path Benchmarks)
+
+已有的 "性能" 测试 (run_performance_test, run_comparison_experiment) 只统计准确率。
+本脚本逐帧计时各检测器的热路径，按帧长报告吞吐 (frames/s) 与单帧延迟 p50 / p99：
+- goertzel:         8 个频点的逐点 Goertzel / 缓存 DFT 基的 dtmf_powers / 逐采样更新的滑动 DFT
+                    (逐采样递推的用例取决于 kernels 后端，报告中记录 kernels)
+- identify_key:     是否带通滤波 x 是否有效性验证
+- music:            compute_spectrum，M = 20 / 50 / 100
+- adaptive:         1s 缓冲，按 SNR 分别触发 Fast / Standard / Deep 模式
+- extreme:          vote / accumulate / correlation
+- rf:               特征提取 / 单帧预测
+- cnn:              单帧预测
+- batch:            注册表中各检测器的 detect_batch 吞吐 (ml.detectors；cascade 以 rf 为第二级)
+结果可保存为基线 (JSON)；之后的运行与基线比较，p50 变慢超过容差即判为回归，退出码为 1。
+基线与机器相关，应在同一台机器上生成与比较。
+
+Usage:
+    python -m src.experiments.detector_benchmark                          # 全部用例
+    python -m src.experiments.detector_benchmark -k identify_key -k music
+    python -m src.experiments.detector_benchmark --save-baseline          # 写入 benchmarks/detector_baseline.json
+    python -m src.experiments.detector_benchmark --tolerance 0.2 --skip-ml
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+from ..core import config, dsp, kernels
+
+BASELINE_PATH = os.path.join(config.PROJECT_ROOT, 'benchmarks', 'detector_baseline.json')
+
+# 帧长 (采样点)：40ms / 100ms / 200ms
+FRAME_LENGTHS = (320, 800, 1600)
+
+# 自适应检测的各模式 (模式名, 输入 SNR)，缓冲长度固定 1s
+# Deep 模式要求探测段的估计 SNR 低于 -3dB，高斯噪声几乎达不到，用 8 个 DTMF 频率同时出现的干扰触发
+ADAPTIVE_MODES = (('Fast', 30), ('Standard', -15), ('Deep', None))
+
+
+class Case:
+    """
+    一个基准用例
+    :param name: 用例名 (用于 -k 过滤与基线比较)
+    :param fn: 被测函数，参数为单帧
+    :param n_samples: 帧长
+    :param batch: fn 一次处理整批帧 (计时为每帧均摊)
+    :param snr_db: 输入帧的 SNR
+    :param frames: 自定义输入 frames(n_frames, n_samples) -> 帧矩阵，None 时使用 make_frames
+    """
+
+    def __init__(self, name, fn, n_samples, batch=False, snr_db=10, frames=None):
+        self.name = name
+        self.fn = fn
+        self.n_samples = n_samples
+        self.batch = batch
+        self.snr_db = snr_db
+        self.frames = frames
+
+    def make_frames(self, n_frames):
+        if self.frames is not None:
+            return self.frames(n_frames, self.n_samples)
+        return make_frames(n_frames, self.n_samples, self.snr_db)
+
+    @property
+    def id(self):
+        return f"{self.name}[{self.n_samples}]"
+
+
+def make_frames(n_frames, n_samples, snr_db=10, seed=0):
+    """生成 n_frames 个带噪 DTMF 帧 (随机按键)，每个用例使用相同的输入"""
+    rng = np.random.default_rng(seed)
+    keys = rng.choice(config.keys, size=n_frames)
+    return np.stack([dsp.generate_dtmf(k, snr_db, n_samples / config.fs) for k in keys])
+
+
+def adaptive_frames(detector, mode, snr_db, n_frames, n_samples, seed=0):
+    """
+    生成 n_frames 个在 AdaptiveDetector 中落入指定模式的帧，保证每个用例只计时一种积分时长
+    :param snr_db: 目标按键的 SNR；None 表示叠加全部 8 个 DTMF 频率的干扰 (触发 Deep)
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_samples) / config.fs
+    interference = np.sum([np.sin(2 * np.pi * f * t + rng.uniform(0, 2 * np.pi))
+                           for f in config.DEFAULT.freqs], axis=0)
+    frames = []
+    for _ in range(100 * n_frames):
+        key = rng.choice(config.keys)
+        if snr_db is None:
+            frame = dsp.generate_dtmf(key, 0, n_samples / config.fs) + interference
+        else:
+            frame = dsp.generate_dtmf(key, snr_db, n_samples / config.fs)
+        if detector.detect(frame).mode.startswith(mode):
+            frames.append(frame)
+            if len(frames) == n_frames:
+                return np.stack(frames)
+    raise RuntimeError(f"Could not generate inputs for adaptive mode {mode}")
+
+
+def build_cases(frame_lengths=FRAME_LENGTHS, skip_ml=False):
+    """构造全部用例；机器学习用例需要先训练模型 (小规模，只用于计时)"""
+    from ..core.music import MusicDetector
+    from ..ml.adaptive_detector import AdaptiveDetector
+    from ..ml.extreme_snr_detector import ExtremeSNRDetector
+    from ..ml.detectors import available_detectors, create_detector
+
+    cases = []
+    freqs = config.DEFAULT.freqs
+    for n in frame_lengths:
+        cases.append(Case('goertzel', lambda x: [dsp.goertzel(x, f) for f in freqs], n))
+        cases.append(Case('dtmf_powers', dsp.dtmf_powers, n))
+        sdft = kernels.SlidingDFT(n, freqs, config.fs)
+        cases.append(Case('sliding_dft', lambda x, d=sdft: d.update(x).powers(), n))
+        for use_filter in (False, True):
+            for require_valid in (False, True):
+                name = 'identify_key' + ('+filter' if use_filter else '') + ('+valid' if require_valid else '')
+                cases.append(Case(name, lambda x, f=use_filter, v=require_valid:
+                                  dsp.identify_key(x, use_filter=f, require_valid=v), n))
+        for m in (20, 50, 100):
+            if m < n:
+                music = MusicDetector(n_elements=m)
+                cases.append(Case(f'music.compute_spectrum(M={m})',
+                                  lambda x, d=music: d.compute_spectrum(x, freqs), n))
+        extreme = ExtremeSNRDetector(frame_length=0.1, hop_length=0.05)
+        for method in ('vote', 'accumulate', 'correlation'):
+            cases.append(Case(f'extreme.{method}', lambda x, m=method: extreme.detect(x, method=m), n))
+
+    adaptive = AdaptiveDetector()
+    for mode, snr in ADAPTIVE_MODES:
+        cases.append(Case(f'adaptive.{mode}', adaptive.detect, config.fs,
+                          frames=lambda n, size, m=mode, s=snr: adaptive_frames(adaptive, m, s, n, size)))
+
+    if not skip_ml:
+        from ..ml.enhanced_classifier import EnhancedClassifier, extract_features_batch
+        from ..ml.spectrogram_cnn import SpectrogramCNNClassifier
+        rf = EnhancedClassifier()
+        rf.train(samples_per_key=50)
+        cnn = SpectrogramCNNClassifier()
+        cnn.train(samples_per_key=20, epochs=1)
+        for n in frame_lengths:
+            cases.append(Case('rf.features', extract_features_batch, n))
+            cases.append(Case('rf.predict', rf.predict, n))
+            cases.append(Case('cnn.predict', cnn.predict, n))
+        detectors = {'rf': create_detector('rf', classifier=rf),
+                     'cnn': create_detector('cnn', classifier=cnn),
+                     'cascade': create_detector('cascade', fallback='rf', classifier=rf)}
+    else:
+        detectors = {}
+
+    for name in available_detectors():
+        if name not in detectors and name not in ('rf', 'cnn', 'cascade'):
+            detectors[name] = create_detector(name)
+    for n in frame_lengths:
+        for name, det in sorted(detectors.items()):
+            cases.append(Case(f'batch.{name}', det.detect_batch, n, batch=True))
+    return cases
+
+
+def run_case(case, n_frames=200, warmup=10, batch_size=256):
+    """
+    逐帧计时
+    :return: {'frames_per_s', 'p50_ms', 'p99_ms', 'n'}
+    """
+    frames = case.make_frames(n_frames)
+    if case.batch:
+        case.fn(frames[:warmup])
+        times = []
+        for start in range(0, n_frames, batch_size):
+            chunk = frames[start:start + batch_size]
+            t0 = time.perf_counter()
+            case.fn(chunk)
+            times.extend([(time.perf_counter() - t0) / len(chunk)] * len(chunk))
+    else:
+        for frame in frames[:warmup]:
+            case.fn(frame)
+        times = []
+        for frame in frames:
+            t0 = time.perf_counter()
+            case.fn(frame)
+            times.append(time.perf_counter() - t0)
+    times = np.array(times)
+    return {'frames_per_s': float(len(times) / times.sum()),
+            'p50_ms': float(np.percentile(times, 50) * 1000),
+            'p99_ms': float(np.percentile(times, 99) * 1000),
+            'n': len(times)}
+
+
+def compare(results, baseline, tolerance):
+    """
+    与基线比较 p50
+    :return: {用例: 相对变化}，只包含变慢超过 tolerance 的用例
+    """
+    regressions = {}
+    for case_id, res in results.items():
+        ref = baseline.get(case_id)
+        if ref is None:
+            continue
+        change = res['p50_ms'] / ref['p50_ms'] - 1
+        if change > tolerance:
+            regressions[case_id] = change
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput / latency benchmarks for detector hot paths")
+    parser.add_argument('-k', action='append', default=[], help="only run cases whose id contains this text")
+    parser.add_argument('--frames', type=int, default=200, help="timed frames per case")
+    parser.add_argument('--lengths', type=int, nargs='+', default=list(FRAME_LENGTHS),
+                        help="frame lengths in samples")
+    parser.add_argument('--skip-ml', action='store_true', help="skip RF / CNN (no model training)")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help="allowed p50 slowdown vs baseline (0.3 = 30%%)")
+    parser.add_argument('-o', '--output', help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # 只选了非机器学习用例时不训练模型
+    skip_ml = args.skip_ml or (args.k and not any(s in k for k in args.k for s in ('rf', 'cnn', 'batch')))
+    cases = [c for c in build_cases(args.lengths, skip_ml)
+             if not args.k or any(k in c.id for k in args.k)]
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    results = {}
+    print(f"{'Case':<42} | {'Frames/s':>10} | {'p50':>9} | {'p99':>9} | {'vs base':>8}")
+    print("-" * 90)
+    for case in cases:
+        res = run_case(case, args.frames)
+        results[case.id] = res
+        ref = baseline.get(case.id)
+        delta = f"{res['p50_ms'] / ref['p50_ms'] - 1:+.0%}" if ref else '-'
+        print(f"{case.id:<42} | {res['frames_per_s']:>10.0f} | {res['p50_ms']:>7.3f}ms | "
+              f"{res['p99_ms']:>7.3f}ms | {delta:>8}")
+
+    report = {'machine': platform.node(), 'python': platform.python_version(),
+              'numpy': np.__version__, 'kernels': kernels.backend(),
+              'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions (p50 slower than baseline by more than {args.tolerance:.0%}):")
+        for case_id, change in sorted(regressions.items()):
+            print(f"  {case_id}: {change:+.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
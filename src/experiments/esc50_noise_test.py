@@ -4,9 +4,6 @@ ESC-50 环境噪声四算法对比实验
 """
 import numpy as np
 import os
-import glob
-import matplotlib.pyplot as plt
-from scipy.io import wavfile
 import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
@@ -15,39 +12,28 @@ from src.core import config, dsp
 from src.ml.enhanced_classifier import EnhancedClassifier
 from src.core.music import MusicDetector
 from src.ml.adaptive_detector import AdaptiveDetector
+from src.utils import visualize
+from src.utils.esc50_corpus import open_corpus
+from src.utils.results_store import ResultsStore
 
-def load_esc50_noise(esc50_path, duration_samples, target_fs=8000):
-    """从 ESC-50 数据集加载随机噪声"""
-    noise_files = glob.glob(os.path.join(esc50_path, "*.wav"))
-    if not noise_files:
-        # Fallback to gaussian noise if dataset missing
+def load_esc50_noise(corpus, duration_samples):
+    """
+    从预处理的 ESC-50 语料 (utils.esc50_corpus) 中抽取随机噪声段
+    :param corpus: NoiseCorpus，数据集缺失时为 None (退化为高斯白噪声)
+    """
+    if corpus is None:
         return np.random.randn(duration_samples)
-    
-    idx = np.random.randint(len(noise_files))
-    try:
-        fs_orig, data = wavfile.read(noise_files[idx])
-    except:
-        return np.random.randn(duration_samples)
-        
-    if len(data.shape) > 1:
-        data = data[:, 0]
-    data = data.astype(float) / 32768.0
-    
-    step = max(1, fs_orig // target_fs)
-    data = data[::step]
-    
-    if len(data) < duration_samples:
-        data = np.tile(data, int(np.ceil(duration_samples / len(data))))
-    
-    start = np.random.randint(0, max(1, len(data) - duration_samples))
-    return data[start:start + duration_samples]
+    return corpus.sample(duration_samples)
 
 def run_esc50_comparison():
     print("=" * 60)
     print("ESC-50 Real-World Noise Comparison (4 Algorithms)")
     print("=" * 60)
     
-    esc50_path = "datasets/esc50/audio"
+    # 一次性预处理为 8kHz 内存映射语料，试验中只做零拷贝切片
+    corpus = open_corpus()
+    if corpus is None:
+        print("ESC-50 dataset not found, falling back to Gaussian noise")
     
     # 1. 初始化各算法
     print("Initializing Algorithms...")
@@ -71,11 +57,7 @@ def run_esc50_comparison():
     dur_std = 0.2
     dur_long = 1.0
     
-    # 结果容器
-    acc_goertzel = []
-    acc_rf = []
-    acc_music = []
-    acc_adaptive = []
+    store = ResultsStore('esc50_comparison')
     
     for snr in snr_range:
         c_g = 0
@@ -88,7 +70,7 @@ def run_esc50_comparison():
             
             # 生成 1s 长信号供自适应使用
             clean_long = dsp.generate_dtmf(key, snr_db=None, duration=dur_long)
-            noise_long = load_esc50_noise(esc50_path, len(clean_long))
+            noise_long = load_esc50_noise(corpus, len(clean_long))
             
             # 混合噪声
             sig_power = np.mean(clean_long**2)
@@ -101,58 +83,49 @@ def run_esc50_comparison():
             
             # 截取 200ms 供标准算法使用
             sig_std_noisy = sig_long_noisy[:int(dur_std * config.fs)]
+            trial = dict(snr=snr, noise_type='esc50', key=key)
             
             # --- 检测 ---
             
             # 1. Goertzel (200ms)
-            if dsp.identify_key(sig_std_noisy) == key:
+            pred_g = dsp.identify_key(sig_std_noisy)
+            store.add(algorithm='Goertzel', prediction=pred_g, latency_ms=dur_std * 1000, **trial)
+            if pred_g == key:
                 c_g += 1
                 
             # 2. Random Forest (200ms)
-            if rf_classifier.predict(sig_std_noisy) == key:
+            pred_rf, conf_rf = rf_classifier.predict_proba(sig_std_noisy)
+            store.add(algorithm='Random Forest', prediction=pred_rf, confidence=conf_rf,
+                      latency_ms=dur_std * 1000, **trial)
+            if pred_rf == key:
                 c_rf += 1
                 
             # 3. MUSIC (200ms)
             # MUSIC 容易崩溃，加 try-except
             try:
                 pred_m, _ = music.detect(sig_std_noisy)
-                if pred_m == key:
-                    c_m += 1
             except:
-                pass
+                pred_m = None
+            store.add(algorithm='MUSIC', prediction=pred_m, latency_ms=dur_std * 1000, **trial)
+            if pred_m == key:
+                c_m += 1
                 
             # 4. Adaptive (Variable Time, max 1s)
             try:
-                pred_a, _ = adaptive.detect(sig_long_noisy)
-                if pred_a == key:
-                    c_a += 1
+                res_a = adaptive.detect(sig_long_noisy)
+                pred_a, latency_a, cpu_a = res_a.key, res_a.latency_ms, res_a.cpu_s * 1000
             except:
-                pass
-        
-        acc_goertzel.append(c_g / iterations)
-        acc_rf.append(c_rf / iterations)
-        acc_music.append(c_m / iterations)
-        acc_adaptive.append(c_a / iterations)
+                pred_a, latency_a, cpu_a = None, None, None
+            store.add(algorithm='Adaptive', prediction=pred_a, latency_ms=latency_a, cpu_ms=cpu_a, **trial)
+            if pred_a == key:
+                c_a += 1
         
-        print(f"SNR={snr:3d}dB | G:{acc_goertzel[-1]:.0%} | RF:{acc_rf[-1]:.0%} | MU:{acc_music[-1]:.0%} | AD:{acc_adaptive[-1]:.0%}")
-    
-    # 绘图
-    plt.figure(figsize=(10, 6))
-    plt.plot(snr_range, acc_goertzel, 'b-o', label='Goertzel (200ms)')
-    plt.plot(snr_range, acc_rf, 'g-s', label='Random Forest (200ms)')
-    plt.plot(snr_range, acc_music, 'm-x', label='MUSIC (200ms)')
-    plt.plot(snr_range, acc_adaptive, 'r-^', label='Adaptive (Var-Time)', linewidth=2)
-    
-    plt.xlabel('SNR (dB)')
-    plt.ylabel('Accuracy')
-    plt.title('Real-World Noise (ESC-50) Robustness Comparison')
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.ylim(0, 1.05)
+        print(f"SNR={snr:3d}dB | G:{c_g / iterations:.0%} | RF:{c_rf / iterations:.0%} | "
+              f"MU:{c_m / iterations:.0%} | AD:{c_a / iterations:.0%}")
     
-    out_path = os.path.join(config.IMG_DIR, 'esc50_noise_comparison.png')
-    plt.savefig(out_path, dpi=150)
-    print(f"\nPlot saved to {out_path}")
+    # 绘图 (读取结果存储)
+    store.flush()
+    visualize.plot_esc50_comparison(run=store.run)
 
 if __name__ == "__main__":
     run_esc50_comparison()
@@ -3,39 +3,41 @@ extreme_talkoff_test.py
 极端语音干扰测试 - Talk-off 是 Goertzel 的阿喀琉斯之踵
 """
 import numpy as np
-import matplotlib.pyplot as plt
-import os
 from ..core import config
 from ..core import dsp
+from ..utils import visualize
+from ..utils.results_store import ResultsStore
 
 
-def generate_talkoff_signal():
+def generate_talkoff_signal(rng=None):
     """
     生成"Talk-off"干扰信号
     这是一种恰好包含 DTMF 频率的语音模拟信号
     会导致 Goertzel 误识别
+    :param rng: np.random.Generator (可复现)，None 时使用全局 np.random
     """
+    rng = rng or np.random
     t = np.linspace(0, config.duration, int(config.fs * config.duration), endpoint=False)
     
     # 随机选择一个"假"按键的频率组合
-    fake_key = np.random.choice(config.keys)
+    fake_key = rng.choice(config.keys)
     fL, fH = config.freq_map[fake_key]
     
     # 生成包含这些频率的"语音"，但加上谐波和调制
     signal = np.zeros_like(t)
     
     # 基频 + 一些偏移
-    signal += 0.5 * np.sin(2 * np.pi * (fL + np.random.uniform(-20, 20)) * t)
-    signal += 0.5 * np.sin(2 * np.pi * (fH + np.random.uniform(-20, 20)) * t)
+    signal += 0.5 * np.sin(2 * np.pi * (fL + rng.uniform(-20, 20)) * t)
+    signal += 0.5 * np.sin(2 * np.pi * (fH + rng.uniform(-20, 20)) * t)
     
     # 加入谐波（真语音有谐波，DTMF 没有）
     for harmonic in [2, 3, 4]:
-        signal += 0.15 * np.sin(2 * np.pi * fL * harmonic * t + np.random.uniform(0, 2*np.pi))
+        signal += 0.15 * np.sin(2 * np.pi * fL * harmonic * t + rng.uniform(0, 2*np.pi))
     
     # 加入其他随机频率（模拟语音的丰富频谱）
     for _ in range(5):
-        f = np.random.uniform(200, 2000)
-        signal += 0.2 * np.sin(2 * np.pi * f * t + np.random.uniform(0, 2*np.pi))
+        f = rng.uniform(200, 2000)
+        signal += 0.2 * np.sin(2 * np.pi * f * t + rng.uniform(0, 2*np.pi))
     
     # 幅度调制（语音的包络变化）
     envelope = 0.7 + 0.3 * np.sin(2 * np.pi * 5 * t)  # 5Hz 调制
@@ -99,6 +101,7 @@ def run_talkoff_test():
     
     goertzel_acc = []
     cnn_acc = []
+    store = ResultsStore('talkoff_test')
     
     for level in talkoff_levels:
         g_correct, c_correct = 0, 0
@@ -110,14 +113,18 @@ def run_talkoff_test():
             
             # 混合信号
             mixed = dtmf_signal + level * talkoff_signal
+            trial = dict(level=level, snr=10, noise_type='talkoff', key=true_key,
+                         fake_key=fake_key, latency_ms=config.duration * 1000)
             
             # Goertzel 识别
             detected = dsp.identify_key(mixed)
+            store.add(algorithm='Goertzel', prediction=detected, **trial)
             if detected == true_key:
                 g_correct += 1
             
             # CNN 识别
             detected = cnn.predict(mixed)
+            store.add(algorithm='CNN', prediction=detected, **trial)
             if detected == true_key:
                 c_correct += 1
         
@@ -126,31 +133,9 @@ def run_talkoff_test():
         
         print(f"  Talk-off level {level:.1f}x: Goertzel={goertzel_acc[-1]:.1%}, CNN={cnn_acc[-1]:.1%}")
     
-    # 绘图
-    plt.figure(figsize=(12, 7))
-    plt.plot(talkoff_levels, goertzel_acc, 'b-o', label='Goertzel', linewidth=2, markersize=6)
-    plt.plot(talkoff_levels, cnn_acc, 'm-^', label='CNN', linewidth=2, markersize=6)
-    
-    # 填充优势区域
-    g_arr, c_arr = np.array(goertzel_acc), np.array(cnn_acc)
-    plt.fill_between(talkoff_levels, g_arr, c_arr,
-                     where=c_arr > g_arr,
-                     alpha=0.3, color='purple', label='CNN wins')
-    plt.fill_between(talkoff_levels, g_arr, c_arr,
-                     where=g_arr > c_arr,
-                     alpha=0.3, color='blue', label='Goertzel wins')
-    
-    plt.axhline(y=0.95, color='orange', linestyle=':', alpha=0.7)
-    plt.xlabel('Talk-off Interference Level (relative to DTMF)', fontsize=12)
-    plt.ylabel('Accuracy', fontsize=12)
-    plt.title('Talk-off Test: DTMF Detection Under Voice-like Interference', fontsize=14)
-    plt.legend(loc='lower left', fontsize=10)
-    plt.grid(True, alpha=0.3)
-    plt.ylim(0, 1.05)
-    
-    out_path = os.path.join(config.IMG_DIR, 'talkoff_test.png')
-    plt.savefig(out_path, dpi=150, bbox_inches='tight')
-    print(f"\nPlot saved: {out_path}")
+    # 绘图 (读取结果存储)
+    store.flush()
+    visualize.plot_talkoff_test(run=store.run)
     
     # 总结
     print("\n" + "=" * 60)
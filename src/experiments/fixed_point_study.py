@@ -0,0 +1,131 @@
+"""
+fixed_point_study.py
+定点 Goertzel 位宽研究 (Fixed-point Accuracy vs Bit Width)
+
+嵌入式主机 / FPGA 上的检测只能用整数运算 (core.fixed_point)。本实验在 SNR 扫描上比较：
+- Float64:             浮点 Goertzel + 有效性验证 (参考)
+- <input> c<b>/a<b>:   定点 Goertzel，输入 int16 / uint8 (FPGA 串口格式)，
+                       系数位宽 coef_bits × 累加器位宽 acc_bits 全组合，同样执行有效性验证
+定点检测器直接处理整数 PCM 矩阵 (每种输入格式只量化一次，不计入耗时)。
+开始前先用 FPGA 模型 (core.fpga_model) 生成 16 个按键的串口字节，检查注册的 'fixed_point'
+检测器能直接处理 uint8 输入。
+帧先按峰值归一化到 0.9 满幅 (相当于 ADC 前的 AGC)，只测量量化误差，不混入削波。
+报告各 SNR 的准确率、与浮点参考判决的一致率 (agree) 以及每帧耗时，
+结果写入 results/fixed_point_study，绘图由 visualize.plot_fixed_point_study 读取。
+
+Usage:
+    python -m src.experiments.fixed_point_study
+    python -m src.experiments.fixed_point_study --frames 400 --coef-bits 10 12 16 --acc-bits 24 32
+"""
+import argparse
+import time
+
+import numpy as np
+
+from ..core import channel, config, dsp, fixed_point, fpga_model
+from ..utils.results_store import ResultsStore
+
+SNR_LEVELS = (-20, -15, -10, -5, 0, 10, 20)
+COEF_BITS = (8, 10, 12, 14, 16)
+ACC_BITS = (16, 24, 32)
+INPUT_FORMATS = ('int16', 'uint8')
+
+
+def make_frames(keys, snr, rng, duration=None):
+    """带白噪声的 DTMF 帧，按峰值归一化到 0.9 满幅"""
+    frames = channel.white_noise(channel.dtmf_batch(list(keys), duration or config.duration), snr, rng)
+    return 0.9 * frames / np.max(np.abs(frames), axis=1, keepdims=True)
+
+
+def check_fpga_uart(tone=0.2, gap=0.05, cfg=None):
+    """
+    FPGA 模型逐个渲染 16 个按键，串口字节 (uint8) 按音段切片后送入 'fixed_point' 检测器
+    :return: (正确数, 总数)
+    """
+    from ..ml.detectors import create_detector
+
+    cfg = cfg or config.DEFAULT
+    period = tone + gap
+    events = [(key, i * period, i * period + tone) for i, key in enumerate(config.keys)]
+    _, uart = fpga_model.render(events, period * len(events))
+    n = int(tone * cfg.fs)
+    frames = [uart[int(t0 * cfg.fs):int(t0 * cfg.fs) + n] for _, t0, _ in events]
+    detector = create_detector('fixed_point', input_format='uint8', require_valid=True, cfg=cfg)
+    keys = [r.key for r in detector.detect_batch(frames)]
+    return sum(k == key for k, (key, _, _) in zip(keys, events)), len(events)
+
+
+def run_fixed_point_study(n_frames=200, coef_bits=COEF_BITS, acc_bits=ACC_BITS, input_formats=INPUT_FORMATS,
+                          snr_levels=SNR_LEVELS, seed=None):
+    from ..ml.detectors import create_detector
+    from ..utils import visualize
+
+    print("=" * 78)
+    print("Fixed-point Goertzel: accuracy vs coefficient / accumulator bit width")
+    print("=" * 78)
+
+    cfg = config.DEFAULT
+    rng = np.random.default_rng(seed)
+    reference = create_detector('goertzel', require_valid=True)
+    store = ResultsStore('fixed_point_study')
+    n = int(cfg.fs * cfg.duration)
+    print(f"{n_frames} frames x {len(snr_levels)} SNR levels, N = {n}, "
+          f"coef_bits {list(coef_bits)}, acc_bits {list(acc_bits)}")
+    correct, total = check_fpga_uart(cfg=cfg)
+    print(f"FPGA model UART bytes -> fixed_point detector: {correct}/{total} keys")
+
+    summary = {}
+    for snr in snr_levels:
+        keys = rng.choice(config.keys, size=n_frames)
+        frames = make_frames(keys, np.full(n_frames, snr), rng)
+        trial = dict(snr=snr, noise_type='gaussian', latency_ms=n / cfg.fs * 1000)
+
+        results = reference.detect_batch(frames)
+        ref = np.array([r.key for r in results], dtype=object)
+        for key, r in zip(keys, results):
+            store.add(algorithm='Float64', input_format='float64', coef_bits=64, acc_bits=64,
+                      key=key, prediction=r.key, agree=True, cpu_ms=r.cpu_s * 1000, **trial)
+        summary.setdefault('Float64', []).append((snr, np.mean(ref == keys), 1.0, results[0].cpu_s * 1000, 8 * n))
+
+        for fmt in input_formats:
+            pcm = fixed_point.quantize_input(frames, fmt)
+            for cb in coef_bits:
+                for ab in acc_bits:
+                    name = f"{fmt} c{cb}/a{ab}"
+                    t0 = time.process_time()
+                    codes = fixed_point.detect_codes(pcm, cb, ab, validate=True, cfg=cfg)
+                    cpu_ms = (time.process_time() - t0) / n_frames * 1000
+                    pred = np.array(dsp.codes_to_keys(codes, cfg), dtype=object)
+                    agree = pred == ref
+                    for key, p, a in zip(keys, pred, agree):
+                        store.add(algorithm=name, input_format=fmt, coef_bits=cb, acc_bits=ab,
+                                  key=key, prediction=p, agree=bool(a), cpu_ms=cpu_ms, **trial)
+                    summary.setdefault(name, []).append(
+                        (snr, np.mean(pred == keys), np.mean(agree), cpu_ms, pcm.itemsize * n))
+
+    header = ' | '.join(f"{s:>6g}" for s in snr_levels)
+    print(f"\n{'Detector':<18} | {header} | {'agree':>6} | {'ms/frame':>8} | {'bytes':>6}")
+    print("-" * (48 + 9 * len(snr_levels)))
+    for name, rows in summary.items():
+        _, acc, agree, cpu_ms, nbytes = zip(*rows)
+        cells = ' | '.join(f"{a:>6.1%}" for a in acc)
+        print(f"{name:<18} | {cells} | {np.mean(agree):>6.1%} | {np.mean(cpu_ms):>8.3f} | {nbytes[0]:>6}")
+
+    store.flush()
+    visualize.plot_fixed_point_study(run=store.run)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fixed-point Goertzel accuracy vs bit width against float64")
+    parser.add_argument('--frames', type=int, default=200, help="frames per SNR level")
+    parser.add_argument('--coef-bits', type=int, nargs='+', default=list(COEF_BITS))
+    parser.add_argument('--acc-bits', type=int, nargs='+', default=list(ACC_BITS))
+    parser.add_argument('--inputs', nargs='+', choices=INPUT_FORMATS, default=list(INPUT_FORMATS))
+    parser.add_argument('--snr', type=float, nargs='+', default=list(SNR_LEVELS))
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    run_fixed_point_study(args.frames, args.coef_bits, args.acc_bits, args.inputs, args.snr, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -157,6 +157,7 @@ def run_transmission_demo():
     
     plt.suptitle(f"DTMF Image Transmission Experiment (SNR={snr}dB)", fontsize=16, color='darkblue', weight='bold')
     
+    config.ensure_dirs()
     out_path = os.path.join(config.IMG_DIR, 'image_transmission_demo.png')
     plt.savefig(out_path, dpi=150, bbox_inches='tight')
     print(f"\nResult saved to {out_path}")
@@ -0,0 +1,102 @@
+"""
+import_benchmark.py
+导入耗时基准 (Import-time Budget)
+
+工作进程按调用 fork / spawn，启动时间直接计入延迟。本脚本在全新的解释器中重复导入各检测模块，
+统计导入耗时 (不含解释器自身启动) 并检查：
+- 耗时不超过预算 (取多次运行的中位数)
+- 没有加载 matplotlib / torch / sklearn / scipy.signal 等重量级依赖
+- 导入过程没有文件系统副作用 (os.makedirs 被替换为报错)
+任一检查失败时退出码为 1，可直接用于 CI。
+
+Usage:
+    python -m src.experiments.import_benchmark
+    python -m src.experiments.import_benchmark --budget 0.05 --repeat 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 模块: 导入预算 (秒)
+BUDGETS = {
+    'src.core.dsp': 0.1,
+    'src.core': 0.1,
+    'src.core.decoder': 0.1,
+    'src.core.music': 0.1,
+    'src.ml.adaptive_detector': 0.1,
+    'src.ml.extreme_snr_detector': 0.1,
+}
+
+HEAVY_MODULES = ('matplotlib', 'torch', 'sklearn', 'scipy.signal', 'scipy.linalg', 'PIL')
+
+# 子进程内执行：禁止创建目录，计时导入，报告已加载的重量级模块
+_CHILD = r'''
+import json, os, sys, time, importlib
+def _no_makedirs(*args, **kwargs):
+    raise RuntimeError("filesystem side effect during import: os.makedirs%r" % (args,))
+os.makedirs = os.mkdir = _no_makedirs
+t0 = time.perf_counter()
+error = None
+try:
+    importlib.import_module(sys.argv[1])
+except Exception as e:
+    error = "%s: %s" % (type(e).__name__, e)
+elapsed = time.perf_counter() - t0
+heavy = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+print(json.dumps({"elapsed": elapsed, "heavy": heavy, "error": error}))
+'''
+
+
+def measure(module, repeat=5):
+    """
+    在全新解释器中导入 repeat 次
+    :return: {'median': 秒, 'min': 秒, 'heavy': [...], 'error': str 或 None}
+    """
+    times, heavy, error = [], set(), None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _CHILD, module, json.dumps(HEAVY_MODULES)],
+                             cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(res['elapsed'])
+        heavy.update(res['heavy'])
+        error = error or res['error']
+    return {'median': statistics.median(times), 'min': min(times),
+            'heavy': sorted(heavy), 'error': error}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import time of detector modules against a budget")
+    parser.add_argument('modules', nargs='*', help="modules to check (default: all budgeted modules)")
+    parser.add_argument('--budget', type=float, default=None,
+                        help="override the budget (seconds) for all checked modules")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    modules = args.modules or list(BUDGETS)
+    failed = False
+    print(f"{'Module':<30} | {'Median':>8} | {'Min':>8} | {'Budget':>7} | Status")
+    print("-" * 75)
+    for module in modules:
+        budget = args.budget if args.budget is not None else BUDGETS.get(module, 0.1)
+        res = measure(module, args.repeat)
+        problems = []
+        if res['error']:
+            problems.append(res['error'])
+        if res['median'] > budget:
+            problems.append("over budget")
+        if res['heavy']:
+            problems.append("loaded " + ", ".join(res['heavy']))
+        failed |= bool(problems)
+        status = "OK" if not problems else "FAIL: " + "; ".join(problems)
+        print(f"{module:<30} | {res['median'] * 1000:6.1f}ms | {res['min'] * 1000:6.1f}ms | "
+              f"{budget * 1000:5.0f}ms | {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""
+load_generator.py
+合成话务负载生成与端到端压测 (Synthetic Call Load Generator)
+
+没有 FPGA 硬件时无法压测接入链路 (find_fpga_port 找不到设备时会退回任意串口)。
+本工具生成逼真的通话音频并按实时速率 (或 --speed 倍速) 持续送入被测程序，
+逐级增加通道数，测量号码检测延迟与漏检率，直到被测程序饱和：
+- 号码:      随机号码串，按键音 50-100ms、间隔 50-150ms (ITU-T Q.24 要求 >= 40ms)，呼叫之间 1-3s 静音
+- Talk-off:  号码之间随机插入 extreme_talkoff_test.generate_talkoff_signal 的类语音干扰 (不应产生号码)
+- 噪声:      ESC-50 语料 (utils.esc50_corpus) 按 --snr 叠加；语料不存在时使用白噪声
+被测目标：
+- bridge:    每个通道创建一对伪终端 (pty)，启动一个 bridge/fpga_uart_bridge.py --port <pty> 进程，
+             按 FPGA 串口格式 ((audio >> 8) + 128) 写入，从其输出中解析 "[UART Event] Detected Tone"
+- server:    每个通道一个 TCP 连接，int16 PCM 送入 detection_server (未指定 --connect 时自动启动子进程)，
+             解析回送的 JSON 号码
+每个号码按 "按键音最后一个采样写出时刻 -> 号码到达时刻" 计算延迟；按键相同且到达时间落在
+[按键音开始, 按键音结束 + --max-latency] 内的号码与之匹配，未匹配的号码为漏检，多余的号码为误报。
+漏检率超过 --max-miss、p99 延迟超过 --max-latency 或生成端被阻塞 (写入落后于计划超过 10%) 即判为饱和。
+逐号码结果写入 results/load_test。
+
+Usage:
+    python -m src.experiments.load_generator --target server --channels 1 8 32 128 256
+    python -m src.experiments.load_generator --target server --connect 127.0.0.1:9300 --speed 4
+    python -m src.experiments.load_generator --target bridge --channels 1 2 4 --duration 20
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from ..core import config, dsp
+from ..utils.results_store import ResultsStore
+
+BRIDGE_SCRIPT = os.path.join(config.PROJECT_ROOT, 'bridge', 'fpga_uart_bridge.py')
+BRIDGE_EVENT = re.compile(r'Detected Tone: (\S)')
+
+
+class CallGenerator:
+    """
+    单个通道的合成话务
+    :param rng: np.random.Generator
+    :param snr_db: 按键音相对噪声的信噪比
+    :param talkoff_rate: 每个号码之后插入一段 talk-off 干扰的概率
+    :param corpus: utils.esc50_corpus.NoiseCorpus，None 时使用白噪声
+    :param lead_in: 开头静音时长 (s)，bridge 启动后会丢弃前 1s 数据
+    """
+
+    def __init__(self, rng, snr_db=20, talkoff_rate=0.1, corpus=None, lead_in=1.5, cfg=None):
+        self.rng = rng
+        self.snr_db = snr_db
+        self.talkoff_rate = talkoff_rate
+        self.corpus = corpus
+        self.lead_in = lead_in
+        self.cfg = cfg or config.DEFAULT
+
+    def _ms(self, low, high):
+        return np.zeros(int(self.rng.uniform(low, high) / 1000 * self.cfg.fs))
+
+    def generate(self, duration, digits_per_call=(7, 11)):
+        """
+        :param duration: 总时长 (s)，连续生成多次呼叫直到填满
+        :return: (float 信号, 号码 [(key, start_sample, end_sample), ...], talk-off 段数)
+        """
+        from .extreme_talkoff_test import generate_talkoff_signal
+        fs = self.cfg.fs
+        total = int(duration * fs)
+        parts = [np.zeros(int(self.lead_in * fs))]
+        pos = len(parts[0])
+        truth = []
+        talkoffs = 0
+        while pos < total:
+            for key in self.rng.choice(config.keys, size=self.rng.integers(*digits_per_call, endpoint=True)):
+                tone = 0.5 * dsp.generate_dtmf(key, None, self.rng.uniform(0.05, 0.1), self.cfg)
+                gap = self._ms(50, 150)
+                segment = [tone, gap]
+                if self.rng.random() < self.talkoff_rate:
+                    talkoff, _ = generate_talkoff_signal(self.rng)
+                    segment += [0.25 * talkoff, self._ms(50, 150)]
+                    talkoffs += 1
+                if pos + sum(map(len, segment)) > total:
+                    break
+                truth.append((key, pos, pos + len(tone)))
+                parts += segment
+                pos += sum(map(len, segment))
+            gap = self._ms(1000, 3000)
+            parts.append(gap[:max(total - pos, 0)])
+            pos += len(parts[-1])
+        signal = np.concatenate(parts)[:total]
+
+        noise_power = 0.25 / 10 ** (self.snr_db / 10)    # 双音各 0.5 幅度，平均功率 0.25
+        if self.corpus is not None:
+            noise = np.asarray(self.corpus.sample(len(signal), self.rng), dtype=float)
+            noise = noise * np.sqrt(noise_power / max(np.mean(noise ** 2), 1e-12))
+        else:
+            noise = self.rng.standard_normal(len(signal)) * np.sqrt(noise_power)
+        return signal + noise, truth, talkoffs
+
+
+def to_pcm(signal, fmt):
+    """'s16': int16 小端；'u8': FPGA 串口格式 (audio >> 8) + 128"""
+    audio = (np.clip(signal, -1, 1 - 2 ** -15) * 32768).astype('<i2')
+    if fmt == 'u8':
+        return ((audio >> 8) + 128).astype(np.uint8)
+    return audio
+
+
+# ===== 被测目标 =====
+
+class ServerTarget:
+    """
+    detection_server：每个通道一个 TCP 连接
+    :param address: (host, port)；None 时启动 detection_server 子进程
+    """
+    fmt = 's16'
+
+    def __init__(self, address=None, tick=0.02):
+        self.proc = None
+        if address is None:
+            address = ('127.0.0.1', _free_port())
+            self.proc = subprocess.Popen([sys.executable, '-m', 'src.detection_server', '--tcp',
+                                          f'{address[0]}:{address[1]}', '--tick', str(tick)],
+                                         cwd=config.PROJECT_ROOT, stdout=subprocess.DEVNULL)
+            _wait_for_port(address)
+        self.address = address
+
+    def open(self, name, on_event):
+        """
+        :return: (write(bytes), close())；检测到的号码以 on_event(key) 回调 (在读取线程中)
+        """
+        sock = socket.create_connection(self.address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.sendall(f'CHANNEL {name}\n'.encode())
+
+        def read():
+            for line in sock.makefile('rb'):
+                on_event(json.loads(line)['key'])
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+
+        def close():
+            sock.shutdown(socket.SHUT_WR)       # 服务端输出剩余号码后关闭连接
+            reader.join(timeout=5)
+            sock.close()
+
+        return sock.sendall, close
+
+    def shutdown(self):
+        if self.proc is not None:
+            self.proc.terminate()
+            self.proc.wait()
+
+
+class BridgeTarget:
+    """bridge/fpga_uart_bridge.py：每个通道一对 pty 与一个 bridge 进程"""
+    fmt = 'u8'
+
+    def __init__(self, detector='goertzel'):
+        self.detector = detector
+
+    def open(self, name, on_event):
+        import tty
+        master, slave = os.openpty()
+        tty.setraw(slave)       # 不做换行转换与回显，字节原样到达
+        proc = subprocess.Popen([sys.executable, '-u', BRIDGE_SCRIPT, '--port', os.ttyname(slave),
+                                 '--detector', self.detector],
+                                cwd=config.PROJECT_ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True)
+        ready = threading.Event()
+
+        def read():
+            for line in proc.stdout:
+                if 'Listening' in line:
+                    ready.set()
+                match = BRIDGE_EVENT.search(line)
+                if match:
+                    on_event(match.group(1))
+            ready.set()
+
+        threading.Thread(target=read, daemon=True).start()
+        ready.wait(timeout=30)
+
+        def write(data):
+            view = memoryview(data)
+            while view:
+                view = view[os.write(master, view):]
+
+        def close():
+            proc.terminate()
+            proc.wait()
+            os.close(master)
+            os.close(slave)
+
+        return write, close
+
+    def shutdown(self):
+        pass
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(address, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(address, timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"detection server did not start on {address[0]}:{address[1]}")
+
+
+# ===== 单个负载等级 =====
+
+def _feed(write, pcm, chunk, speed, fs, sent_at, lag):
+    """按计划时刻分块写出，记录每块写完的时刻与最大落后量"""
+    period = chunk / fs / (speed or float('inf'))
+    t_start = time.monotonic()
+    for i, start in enumerate(range(0, len(pcm), chunk)):
+        write(pcm[start:start + chunk].tobytes())
+        now = time.monotonic()
+        sent_at[i] = now
+        lag[0] = max(lag[0], now - t_start - i * period)
+        delay = t_start + (i + 1) * period - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+def match_events(truth, events, sent_at, chunk, max_latency):
+    """
+    把号码与真实按键音对应
+    :param truth: [(key, start_sample, end_sample), ...]
+    :param events: [(arrival_time, key), ...]
+    :return: (每个按键音的延迟 ms (未检出为 nan), 检出的号码或 None, 误报数)
+    """
+    latency = np.full(len(truth), np.nan)
+    detected = [None] * len(truth)
+    false_alarms = 0
+    for t, key in sorted(events):
+        for i, (k, start, end) in enumerate(truth):
+            if detected[i] is not None or k != key:
+                continue
+            t_start, t_end = sent_at[start // chunk], sent_at[(end - 1) // chunk]
+            if t_start <= t <= t_end + max_latency:
+                detected[i] = key
+                latency[i] = (t - t_end) * 1000
+                break
+        else:
+            false_alarms += 1
+    return latency, detected, false_alarms
+
+
+def run_level(target, n_channels, duration, speed=1.0, snr_db=20, talkoff_rate=0.1, corpus=None,
+              chunk_s=0.02, max_latency=1.0, seed=None):
+    """
+    一个负载等级：n_channels 个通道同时送入 target
+    :return: 汇总 dict 与逐号码记录列表
+    """
+    rng = np.random.default_rng(seed)
+    fs = config.fs
+    chunk = max(1, int(chunk_s * fs))
+    channels = []
+    for i in range(n_channels):
+        signal, truth, talkoffs = CallGenerator(rng, snr_db, talkoff_rate, corpus).generate(duration)
+        events = []
+        write, close = target.open(f'load{i}', lambda key, ev=events: ev.append((time.monotonic(), key)))
+        pcm = to_pcm(signal, target.fmt)
+        channels.append({'pcm': pcm, 'truth': truth, 'talkoffs': talkoffs, 'events': events,
+                         'write': write, 'close': close,
+                         'sent_at': np.full(-(-len(pcm) // chunk), np.nan), 'lag': [0.0]})
+
+    threads = [threading.Thread(target=_feed, args=(c['write'], c['pcm'], chunk, speed, fs, c['sent_at'], c['lag']),
+                                daemon=True) for c in channels]
+    t0 = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - t0
+    time.sleep(max_latency)     # 等待最后的号码
+    for c in channels:
+        c['close']()
+
+    records, latencies = [], []
+    n_digits = misses = false_alarms = talkoffs = 0
+    for i, c in enumerate(channels):
+        latency, detected, fa = match_events(c['truth'], c['events'], c['sent_at'], chunk, max_latency)
+        for (key, _, _), lat, pred in zip(c['truth'], latency, detected):
+            records.append({'channel': i, 'key': key, 'prediction': pred, 'latency_ms': lat})
+        latencies.append(latency)
+        n_digits += len(c['truth'])
+        misses += int(np.isnan(latency).sum())
+        false_alarms += fa
+        talkoffs += c['talkoffs']
+    latencies = np.concatenate(latencies) if latencies else np.array([])
+    found = latencies[~np.isnan(latencies)]
+    planned = duration / (speed or float('inf'))
+    summary = {'channels': n_channels, 'speed': speed, 'digits': n_digits,
+               'miss_rate': misses / max(n_digits, 1), 'false_alarms': false_alarms, 'talkoffs': talkoffs,
+               'p50_ms': float(np.percentile(found, 50)) if len(found) else float('nan'),
+               'p99_ms': float(np.percentile(found, 99)) if len(found) else float('nan'),
+               'lag_s': max(c['lag'][0] for c in channels), 'elapsed_s': elapsed,
+               'audio_s': n_channels * duration, 'planned_s': planned}
+    return summary, records
+
+
+def saturated(summary, max_miss, max_latency):
+    """漏检率、p99 延迟或生成端落后任一超限"""
+    late = summary['planned_s'] > 0 and summary['lag_s'] > 0.1 * summary['planned_s']
+    return summary['miss_rate'] > max_miss or not summary['p99_ms'] <= max_latency * 1000 or late
+
+
+def run_load_test(target_name='server', levels=(1, 4, 16, 64, 256), duration=10.0, speed=1.0, snr_db=20,
+                  talkoff_rate=0.1, max_miss=0.05, max_latency=1.0, connect=None, detector='goertzel',
+                  use_esc50=True, stop_at_saturation=True, seed=None):
+    corpus = None
+    if use_esc50:
+        from ..utils.esc50_corpus import open_corpus
+        corpus = open_corpus()
+    print("=" * 86)
+    print(f"Load test: target={target_name}, {duration:.0f}s per channel at {speed:g}x real time, "
+          f"SNR {snr_db:g} dB, noise={'ESC-50' if corpus is not None else 'white'}")
+    print("=" * 86)
+
+    target = ServerTarget(connect) if target_name == 'server' else BridgeTarget(detector)
+    store = ResultsStore('load_test')
+    print(f"{'Channels':>8} | {'Digits':>6} | {'Miss':>6} | {'FA':>4} | {'Talk-off':>8} | "
+          f"{'p50':>8} | {'p99':>8} | {'Gen lag':>8} | {'Audio/wall':>10}")
+    print("-" * 86)
+    try:
+        for n in levels:
+            summary, records = run_level(target, n, duration, speed, snr_db, talkoff_rate, corpus,
+                                         max_latency=max_latency, seed=seed)
+            for r in records:
+                store.add(algorithm=target_name, channels=n, speed=speed, snr=snr_db, **r)
+            sat = saturated(summary, max_miss, max_latency)
+            print(f"{n:>8} | {summary['digits']:>6} | {summary['miss_rate']:>6.1%} | {summary['false_alarms']:>4} | "
+                  f"{summary['talkoffs']:>8} | {summary['p50_ms']:>6.1f}ms | {summary['p99_ms']:>6.1f}ms | "
+                  f"{summary['lag_s']:>7.2f}s | {summary['audio_s'] / summary['elapsed_s']:>9.1f}x"
+                  + ("  <- saturated" if sat else ""))
+            if sat and stop_at_saturation:
+                break
+    finally:
+        target.shutdown()
+        store.flush()
+
+
+def _address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic call load generator for end-to-end throughput tests")
+    parser.add_argument('--target', choices=['server', 'bridge'], default='server')
+    parser.add_argument('--channels', type=int, nargs='+', help="channel counts, increasing "
+                        "(default: 1 4 16 64 256 for server, 1 2 4 8 for bridge)")
+    parser.add_argument('--duration', type=float, default=10.0, help="audio seconds per channel and level")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback rate (x real time, 0 = unpaced)")
+    parser.add_argument('--snr', type=float, default=20)
+    parser.add_argument('--talkoff-rate', type=float, default=0.1, help="talk-off bursts per digit")
+    parser.add_argument('--max-miss', type=float, default=0.05, help="miss rate that counts as saturated")
+    parser.add_argument('--max-latency', type=float, default=1.0, help="seconds; later digits count as missed")
+    parser.add_argument('--connect', type=_address, metavar='HOST:PORT', help="use a running detection_server")
+    parser.add_argument('--detector', default='goertzel', help="bridge detector")
+    parser.add_argument('--no-esc50', action='store_true', help="white noise instead of the ESC-50 corpus")
+    parser.add_argument('--no-stop', action='store_true', help="keep going past saturation")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+    levels = args.channels or ((1, 4, 16, 64, 256) if args.target == 'server' else (1, 2, 4, 8))
+    run_load_test(args.target, levels, args.duration, args.speed, args.snr, args.talkoff_rate, args.max_miss,
+                  args.max_latency, args.connect, args.detector, not args.no_esc50, not args.no_stop, args.seed)
+
+
+if __name__ == "__main__":
+    main()
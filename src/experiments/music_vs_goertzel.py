@@ -65,6 +65,7 @@ def run_comparison():
     plt.grid(True, alpha=0.3)
     plt.ylim(0, 1.05)
     
+    config.ensure_dirs()
     out_path = os.path.join(config.IMG_DIR, 'music_vs_goertzel.png')
     plt.savefig(out_path)
     print(f"\nPlot saved to {out_path}")
@@ -5,7 +5,6 @@ window_length_study.py
 测试窗口：40ms, 100ms, 200ms
 """
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 import sys
 
@@ -15,6 +14,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 from src.core import config, dsp
 from src.core.music import MusicDetector
 from src.ml.enhanced_classifier import EnhancedClassifier
+from src.utils import visualize
+from src.utils.results_store import ResultsStore
 
 def run_study():
     print("=" * 60)
@@ -33,7 +34,7 @@ def run_study():
     window_lengths = [0.04, 0.10, 0.20] # 40ms, 100ms, 200ms
     snr_range = range(-20, 11, 5) # -20, -15, ..., 10
     
-    results = {} # {window_len: {algo: [acc]}}
+    store = ResultsStore('window_length_study')
     
     for length in window_lengths:
         print(f"\nTesting Window Length: {length*1000:.0f}ms")
@@ -43,10 +44,6 @@ def run_study():
         music_M = min(100, n_samples // 3)
         music.M = music_M
         
-        res_g = []
-        res_ml = []
-        res_music = []
-        
         for snr in snr_range:
             c_g = 0
             c_ml = 0
@@ -56,57 +53,32 @@ def run_study():
             for _ in range(iterations):
                 key = np.random.choice(config.keys)
                 sig = dsp.generate_dtmf(key, snr_db=snr, duration=length)
+                trial = dict(window_ms=round(length * 1000), snr=snr, noise_type='gaussian',
+                             key=key, latency_ms=length * 1000)
                 
                 # Goertzel
-                if dsp.identify_key(sig) == key:
+                pred_g = dsp.identify_key(sig)
+                store.add(algorithm='Goertzel', prediction=pred_g, **trial)
+                if pred_g == key:
                     c_g += 1
                 
                 # ML
-                if ml_clf.predict(sig) == key:
+                pred_ml, conf_ml = ml_clf.predict_proba(sig)
+                store.add(algorithm='Random Forest', prediction=pred_ml, confidence=conf_ml, **trial)
+                if pred_ml == key:
                     c_ml += 1
                     
                 # MUSIC
                 pred, _ = music.detect(sig)
+                store.add(algorithm='MUSIC', prediction=pred, **trial)
                 if pred == key:
                     c_music += 1
             
-            res_g.append(c_g/iterations)
-            res_ml.append(c_ml/iterations)
-            res_music.append(c_music/iterations)
-            print(f"  SNR={snr:3d}dB | G:{res_g[-1]:.0%} | ML:{res_ml[-1]:.0%} | MU:{res_music[-1]:.0%}")
-            
-        results[length] = {
-            'Goertzel': res_g,
-            'Random Forest': res_ml,
-            'MUSIC': res_music
-        }
-    
-    # === 绘图 ===
-    fig, axes = plt.subplots(1, 3, figsize=(18, 5), sharey=True)
-    
-    for i, length in enumerate(window_lengths):
-        ax = axes[i]
-        dat = results[length]
-        
-        ax.plot(snr_range, dat['Goertzel'], 'b-o', label='Goertzel')
-        ax.plot(snr_range, dat['Random Forest'], 'g-s', label='Random Forest')
-        ax.plot(snr_range, dat['MUSIC'], 'r-^', label='MUSIC')
-        
-        ax.set_title(f'Window Length: {length*1000:.0f}ms')
-        ax.set_xlabel('SNR (dB)')
-        ax.grid(True, alpha=0.3)
-        ax.set_ylim(0, 1.05)
-        
-        if i == 0:
-            ax.set_ylabel('Accuracy')
-            ax.legend(loc='lower right')
-            
-    plt.suptitle('Impact of Signal Duration on Detection Algorithms', fontsize=16)
-    plt.tight_layout()
+            print(f"  SNR={snr:3d}dB | G:{c_g/iterations:.0%} | ML:{c_ml/iterations:.0%} | MU:{c_music/iterations:.0%}")
     
-    out_path = os.path.join(config.IMG_DIR, 'window_length_study.png')
-    plt.savefig(out_path, dpi=150)
-    print(f"\nStudy plot saved to {out_path}")
+    # === 绘图 (读取结果存储) ===
+    store.flush()
+    visualize.plot_window_length_study(run=store.run)
 
 if __name__ == "__main__":
     run_study()
@@ -1,4 +1,24 @@
 # Machine Learning classifiers
-from .enhanced_classifier import EnhancedClassifier
-from .spectrogram_cnn import SpectrogramCNNClassifier
-from .adaptive_detector import AdaptiveDetector
+# 按需导入：sklearn / torch 只在第一次访问对应分类器时加载
+from importlib import import_module
+
+_EXPORTS = {
+    'EnhancedClassifier': '.enhanced_classifier',
+    'SpectrogramCNNClassifier': '.spectrogram_cnn',
+    'AdaptiveDetector': '.adaptive_detector',
+    'Detection': '.detectors',
+    'Detector': '.detectors',
+    'create_detector': '.detectors',
+    'available_detectors': '.detectors',
+    'register_detector': '.detectors',
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
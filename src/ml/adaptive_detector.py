@@ -10,16 +10,47 @@ adaptive_detector.py
   3. 在极端环境下，启用深度积分模式 (1000ms)
 - 意义：实现了响应速度与鲁棒性的自适应平衡，是真正的工程优化。
 """
+import time
+from typing import NamedTuple
+
 import numpy as np
-import matplotlib.pyplot as plt
 from ..core import config, dsp
 
+
+class AdaptiveResult(NamedTuple):
+    """
+    一次自适应检测的结果与代价
+    :param key: 识别的按键，失败为 None
+    :param mode: 模式描述 (Fast / Standard / Deep / Insufficient)
+    :param samples: 实际积分的采样点数
+    :param latency_ms: 积分时长 (决策延迟) = samples / fs
+    :param snr_db: 40ms 探测段的估计 SNR，信号不足 40ms 时为 nan
+    :param cpu_s: 本次检测消耗的 CPU 时间 (秒)，批量检测时为均摊值
+    :param stages: 实际执行的阶段 ((名称, 采样点数), ...)，如 (('probe', 320), ('integrate', 1600))
+    """
+    key: object
+    mode: str
+    samples: int
+    latency_ms: float
+    snr_db: float
+    cpu_s: float
+    stages: tuple
+
+
 class AdaptiveDetector:
-    def __init__(self, quick_snr_threshold=10, standard_snr_threshold=0):
+    # 常量定义（与 Java 端一致）
+    MIN_DURATION = 0.04   # 最短 40ms
+    MAX_DURATION = 1.0    # 最长 1000ms
+    TARGET_SNR = 5.0      # 目标 SNR (dB)
+    BASE_DURATION = 0.04  # 基准时长 40ms
+
+    def __init__(self, quick_snr_threshold=10, standard_snr_threshold=0, cfg=None):
         """
         :param quick_snr_threshold: 允许快速模式的最低 SNR (dB)
         :param standard_snr_threshold: 允许标准模式的最低 SNR (dB)
+        :param cfg: 检测配置 (采样率、频率方案)，若为 None 则使用 config.DEFAULT
         """
+        self.cfg = cfg or config.DEFAULT
         self.quick_snr_threshold = quick_snr_threshold  # >10dB 用快速模式 (40ms)
         self.standard_snr_threshold = standard_snr_threshold # >0dB 用标准模式 (200ms)
         self.is_ready = True
@@ -35,8 +66,8 @@ class AdaptiveDetector:
         
         使用频域方法：计算 DTMF 双频峰值能量与噪声能量的比值
         """
-        all_freqs = config.low_freqs + config.high_freqs  # 8个DTMF频率
-        energies = [dsp.goertzel(signal, f) for f in all_freqs]
+        # 8个DTMF频率的能量 (cfg 缓存的 DFT 基，与逐频点 goertzel 相同的整数频点)
+        energies = list(np.hstack(dsp.dtmf_powers(signal, self.cfg))[0])
         total_energy = sum(energies)
         
         # 找出低频组最大值 (索引 0-3)
@@ -72,20 +103,22 @@ class AdaptiveDetector:
         => T2 = T1 * 10^((TARGET_SNR - current_snr) / 10)
         
         :param long_signal: 输入的长信号缓存 (最长 1s)
-        :return: (result_key, mode_string)
+        :return: AdaptiveResult
         """
-        fs = config.fs
-        
-        # 常量定义（与 Java 端一致）
-        MIN_DURATION = 0.04   # 最短 40ms
-        MAX_DURATION = 1.0    # 最长 1000ms
-        TARGET_SNR = 5.0      # 目标 SNR (dB)
-        BASE_DURATION = 0.04  # 基准时长 40ms
+        t0 = time.process_time()
+        fs = self.cfg.fs
+        MIN_DURATION = self.MIN_DURATION
+        MAX_DURATION = self.MAX_DURATION
+        TARGET_SNR = self.TARGET_SNR
+        BASE_DURATION = self.BASE_DURATION
         
         # 1. 用短窗口(40ms)快速估算当前 SNR
         len_quick = int(MIN_DURATION * fs)
         if len(long_signal) < len_quick:
-            return dsp.identify_key(long_signal), "Insufficient"
+            n = len(long_signal)
+            key = dsp.identify_key(long_signal, cfg=self.cfg, cached=False)
+            return AdaptiveResult(key, "Insufficient", n, n / fs * 1000, float('nan'),
+                                  time.process_time() - t0, (('integrate', n),))
             
         sig_quick = long_signal[:len_quick]
         current_snr, peak_ratio = self.estimate_quality(sig_quick)
@@ -118,21 +151,85 @@ class AdaptiveDetector:
         if verbose:
             print(f"  [Adaptive] Required: {required_duration*1000:.0f}ms")
         
-        # 3. 截取所需时长的信号并进行检测
+        # 3. 截取所需时长的信号并进行检测 (积分长度随 SNR 变化，不缓存该长度的 DFT 基)
         len_final = int(required_duration * fs)
         sig_final = long_signal[:len_final]
-        result = dsp.identify_key(sig_final)
+        result = dsp.identify_key(sig_final, cfg=self.cfg, cached=False)
         
-        # 4. 生成模式描述
+        # 4. 结果：模式描述 + 实际积分长度 / CPU 时间
+        return AdaptiveResult(result, self._mode_label(required_duration), len_final,
+                              len_final / fs * 1000, float(current_snr), time.process_time() - t0,
+                              (('probe', len_quick), ('integrate', len_final)))
+
+    @staticmethod
+    def _mode_label(required_duration):
         duration_ms = int(required_duration * 1000)
         if duration_ms <= 50:
-            mode = f"Fast({duration_ms}ms)"
+            return f"Fast({duration_ms}ms)"
         elif duration_ms <= 250:
-            mode = f"Standard({duration_ms}ms)"
+            return f"Standard({duration_ms}ms)"
         else:
-            mode = f"Deep({duration_ms}ms)"
-        
-        return result, mode
+            return f"Deep({duration_ms}ms)"
+
+    def detect_batch(self, signals):
+        """
+        批量自适应检测，结果与逐个调用 detect() 一致
+        1. 所有信号的 40ms 探测段堆叠为矩阵，一次 goertzel_batch 估算 SNR
+        2. 按所需积分长度分组，每组一次 goertzel_batch 完成判决
+        :param signals: 信号列表 (长度可不同)
+        :return: [AdaptiveResult, ...]，cpu_s 为探测阶段的均摊时间加所在分组的均摊时间
+        """
+        t0 = time.process_time()
+        cfg = self.cfg
+        fs = cfg.fs
+        len_quick = int(self.MIN_DURATION * fs)
+        results = [None] * len(signals)
+
+        idx = [i for i, sig in enumerate(signals) if len(sig) >= len_quick]
+        for i in set(range(len(signals))) - set(idx):
+            results[i] = self.detect(signals[i])
+        if not idx:
+            return results
+
+        probe = np.stack([np.asarray(signals[i][:len_quick], dtype=float) for i in idx])
+        current_snr = _quality_from_energies(*dsp.dtmf_powers(probe, cfg))[0]
+
+        with np.errstate(over='ignore'):
+            required = self.BASE_DURATION * 10 ** ((self.TARGET_SNR - current_snr) / 10.0)
+        required = np.where(current_snr >= self.TARGET_SNR, self.MIN_DURATION, required)
+        required = np.clip(required, self.MIN_DURATION, self.MAX_DURATION)
+        available = np.array([len(signals[i]) / fs for i in idx])
+        required = np.minimum(required, available)
+        len_final = (required * fs).astype(int)
+        probe_cpu = (time.process_time() - t0) / len(idx)
+
+        for n in np.unique(len_final):
+            t1 = time.process_time()
+            members = np.flatnonzero(len_final == n)
+            frames = np.stack([np.asarray(signals[idx[m]][:n], dtype=float) for m in members])
+            keys = dsp.codes_to_keys(dsp.classify_powers(*dsp.dtmf_powers(frames, cfg, cached=False), cfg=cfg), cfg)
+            cpu_s = probe_cpu + (time.process_time() - t1) / len(members)
+            stages = (('probe', len_quick), ('integrate', int(n)))
+            for m, key in zip(members, keys):
+                results[idx[m]] = AdaptiveResult(key, self._mode_label(required[m]), int(n), float(n / fs * 1000),
+                                                 float(current_snr[m]), cpu_s, stages)
+
+        return results
+
+
+def _quality_from_energies(l_energies, h_energies):
+    """
+    estimate_quality 的向量化版本
+    :param l_energies: (n, 4) 低频组频点能量
+    :param h_energies: (n, 4) 高频组频点能量
+    :return: (snr_db, peak_ratio)，各为 (n,) 数组
+    """
+    signal_energy = l_energies.max(axis=1) + h_energies.max(axis=1)
+    total_energy = l_energies.sum(axis=1) + h_energies.sum(axis=1)
+    noise_energy = np.maximum(total_energy - signal_energy, 1e-10)
+    with np.errstate(divide='ignore'):
+        snr = 10 * np.log10(signal_energy / noise_energy)
+    return snr, signal_energy / (total_energy + 1e-10)
 
 
 def run_adaptive_demo():
@@ -156,38 +253,43 @@ def run_adaptive_demo():
         ("Extreme", -25)
     ]
     
-    print(f"\n{'Condition':<15} | {'Real SNR':<10} | {'Mode Selected':<18} | {'Result':<6}")
-    print("-" * 65)
+    print(f"\n{'Condition':<15} | {'Real SNR':<10} | {'Est SNR':<9} | {'Mode Selected':<18} | "
+          f"{'CPU':>8} | {'Result':<6}")
+    print("-" * 85)
     
     for label, snr in test_cases:
         key = '5'
         # 生成 1秒长的信号供自适应调用
         long_signal = dsp.generate_dtmf(key, snr_db=snr, duration=1.0)
         
-        result, mode = detector.detect(long_signal, verbose=False)
-        match = "PASS" if result == key else "FAIL"
+        res = detector.detect(long_signal, verbose=False)
+        match = "PASS" if res.key == key else "FAIL"
         
-        print(f"{label:<15} | {snr:>3}dB       | {mode:<18} | {match:<6}")
-    print("-" * 65)
+        print(f"{label:<15} | {snr:>3}dB       | {res.snr_db:>5.1f}dB   | {res.mode:<18} | "
+              f"{res.cpu_s * 1000:>6.2f}ms | {match:<6}")
+    print("-" * 85)
 
 
 def run_comparison_experiment():
     """
     对比实验：固定 200ms vs 自适应
+    每次试验写入结果存储 (results/adaptive_comparison)，绘图由 visualize 读取存储完成
+    每条记录包含积分时长 latency_ms (决策延迟) 与实测 CPU 时间 cpu_ms (计算代价)
     """
+    from ..utils import visualize
+    from ..utils.results_store import ResultsStore
+
     print("\nRunning Performance Comparison...")
     detector = AdaptiveDetector()
+    store = ResultsStore('adaptive_comparison')
     snr_range = range(-25, 21, 5)
     
-    # 存储结果
-    acc_std = [] # 固定 200ms (传统)
-    acc_apt = [] # 自适应
-    avg_dur = [] # 自适应平均耗时
-    
     for snr in snr_range:
         c_std = 0
         c_apt = 0
         dur_sum = 0
+        cpu_std = 0
+        cpu_apt = 0
         iters = 100
         
         for _ in range(iters):
@@ -197,46 +299,34 @@ def run_comparison_experiment():
             
             # 1. 传统方法 (强制截取 200ms)
             sig_200 = sig_long[:int(0.2*config.fs)]
-            if dsp.identify_key(sig_200) == key:
+            t0 = time.process_time()
+            res_std = dsp.identify_key(sig_200)
+            cpu_ms = (time.process_time() - t0) * 1000
+            cpu_std += cpu_ms
+            store.add(algorithm='Standard', snr=snr, noise_type='gaussian', key=key,
+                      prediction=res_std, latency_ms=200.0, cpu_ms=cpu_ms)
+            if res_std == key:
                 c_std += 1
                 
             # 2. 自适应方法
-            res, mode = detector.detect(sig_long)
-            if res == key:
+            res = detector.detect(sig_long)
+            if res.key == key:
                 c_apt += 1
             
-            # 记录耗时
-            if "40ms" in mode: dur_sum += 0.04
-            elif "200ms" in mode: dur_sum += 0.2
-            else: dur_sum += 1.0
-            
-        acc_std.append(c_std/iters)
-        acc_apt.append(c_apt/iters)
-        avg_dur.append(dur_sum/iters)
+            # 记录实际积分时长与 CPU 时间
+            dur_sum += res.latency_ms
+            cpu_apt += res.cpu_s * 1000
+            store.add(algorithm='Adaptive', snr=snr, noise_type='gaussian', key=key,
+                      prediction=res.key, latency_ms=res.latency_ms, cpu_ms=res.cpu_s * 1000,
+                      est_snr=res.snr_db, mode=res.mode.split('(')[0])
         
-        print(f"SNR={snr:3d}dB | Std(200ms):{acc_std[-1]:.0%} | Adapt:{acc_apt[-1]:.0%} | Time:{avg_dur[-1]*1000:.0f}ms")
+        print(f"SNR={snr:3d}dB | Std(200ms):{c_std/iters:.0%} | Adapt:{c_apt/iters:.0%} | "
+              f"Time:{dur_sum/iters:.0f}ms | CPU Std/Adapt:{cpu_std/iters:.3f}/{cpu_apt/iters:.3f}ms")
+
+    store.flush()
+    visualize.plot_adaptive_time_analysis(run=store.run)
+    visualize.plot_adaptive_cost_distribution(run=store.run)
 
-    # 绘制双轴图
-    fig, ax1 = plt.subplots(figsize=(10, 6))
-    
-    ax1.plot(snr_range, acc_std, 'b--o', label='Standard (Fixed 200ms)')
-    ax1.plot(snr_range, acc_apt, 'g-^', label='Adaptive (Variable Time)', linewidth=2)
-    ax1.set_xlabel('SNR (dB)')
-    ax1.set_ylabel('Accuracy', color='k')
-    ax1.set_ylim(0, 1.05)
-    ax1.legend(loc='upper left')
-    ax1.grid(True, alpha=0.3)
-    
-    ax2 = ax1.twinx()
-    ax2.plot(snr_range, [d*1000 for d in avg_dur], 'r:', label='Avg Detection Time', linewidth=2)
-    ax2.set_ylabel('Time Cost (ms)', color='r')
-    ax2.set_ylim(0, 1100)
-    ax2.legend(loc='center right')
-    
-    plt.title('Adaptive Time-Integration Performance Analysis')
-    out_path = config.IMG_DIR + '/adaptive_time_analysis.png'
-    plt.savefig(out_path)
-    print(f"\nPlot saved to {out_path}")
 
 if __name__ == "__main__":
     run_comparison_experiment()
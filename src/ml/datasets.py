@@ -0,0 +1,95 @@
+"""
+datasets.py
+在线合成的流式训练数据 (On-the-fly Training Data)
+
+CNN / 随机森林原先先把全部样本生成为 Python 列表再转成数组，训练开始前所有频谱图都驻留内存。
+这里改为按需逐批合成：
+- synth_batch():         一批 (信号, 按键)，按 SNR 区间权重抽样，可选 core.channel 真实噪声
+- iter_batches():        无限 / 定长的 NumPy 批生成器，可用多个工作进程并行合成 (有界预取，内存恒定)，
+                         适合 scikit-learn partial_fit 或分块提取特征
+PyTorch 的 IterableDataset 封装见 torch_models.SyntheticDTMFDataset (本模块不导入 torch)
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ..core import config, channel
+
+# SNR 抽样区间 ((权重, 下限dB, 上限dB), ...)
+CNN_SNR_BANDS = ((0.6, -30, -5), (0.4, -5, 20))
+RF_SNR_BANDS = ((0.3, -30, -15), (0.4, -15, 0), (0.3, 0, 20))
+
+
+def sample_snr(rng, n, bands=CNN_SNR_BANDS):
+    """按区间权重抽取 n 个 SNR (dB)"""
+    weights = np.array([b[0] for b in bands], dtype=float)
+    choice = rng.choice(len(bands), size=n, p=weights / weights.sum())
+    low = np.array([b[1] for b in bands], dtype=float)[choice]
+    high = np.array([b[2] for b in bands], dtype=float)[choice]
+    return rng.uniform(low, high)
+
+
+def synth_batch(batch_size, rng, snr_bands=CNN_SNR_BANDS, noise_types=None, duration=None):
+    """
+    合成一批带噪 DTMF 信号
+    :param snr_bands: 高斯白噪声的 SNR 抽样区间
+    :param noise_types: 若给定 (如 ('impulse', 'pink', 'voice', 'mixed'))，
+                        改为逐样本随机选择 core.channel 真实噪声类型，严重程度 U(0, 1)
+    :return: (signals (batch_size, n), keys (batch_size,))
+    """
+    keys = rng.choice(config.keys, size=batch_size)
+    if noise_types is not None:
+        types = rng.choice(noise_types, size=batch_size)
+        severity = rng.uniform(0, 1, size=batch_size)
+        return channel.realistic_dtmf_batch(keys, types, severity, rng, duration), keys
+    clean = channel.dtmf_batch(keys, duration)
+    return channel.white_noise(clean, sample_snr(rng, batch_size, snr_bands), rng), keys
+
+
+def _make_batch(args):
+    """工作进程入口：合成一批并做特征变换"""
+    seed, batch_size, transform, snr_bands, noise_types, duration = args
+    rng = np.random.default_rng(seed)
+    signals, keys = synth_batch(batch_size, rng, snr_bands, noise_types, duration)
+    return (transform(signals) if transform is not None else signals), keys
+
+
+def iter_batches(batch_size=256, transform=None, n_batches=None, seed=None, workers=0,
+                 prefetch=2, snr_bands=CNN_SNR_BANDS, noise_types=None, duration=None):
+    """
+    流式批生成器
+    :param transform: 批量特征变换 signals -> X (需可 pickle，如模块级函数)，None 返回原始信号
+    :param n_batches: 批数，None 表示无限
+    :param seed: 随机种子 (每批由 SeedSequence 派生独立子种子)，None 表示由全局随机状态派生
+    :param workers: 合成进程数，0 表示在当前进程中合成
+    :param prefetch: 每个工作进程预取的批数，在途批数上限为 workers * prefetch
+    :return: 逐批产出 (X, keys)
+    """
+    if seed is None:
+        seed = np.random.randint(2**31)
+    seeds = np.random.SeedSequence(seed)
+
+    def jobs():
+        i = 0
+        while n_batches is None or i < n_batches:
+            yield (seeds.spawn(1)[0], batch_size, transform, snr_bands, noise_types, duration)
+            i += 1
+
+    if workers <= 0:
+        for job in jobs():
+            yield _make_batch(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        job_iter = jobs()
+        for job in job_iter:
+            pending.append(pool.submit(_make_batch, job))
+            if len(pending) >= workers * prefetch:
+                break
+        while pending:
+            yield pending.popleft().result()
+            job = next(job_iter, None)
+            if job is not None:
+                pending.append(pool.submit(_make_batch, job))
@@ -0,0 +1,412 @@
+"""
+detectors.py
+统一检测器接口与注册表 (Detector Protocol & Registry)
+
+各检测引擎原有的接口各不相同：identify_key 返回按键，MusicDetector 返回 (按键, 峰值)，
+AdaptiveDetector 返回 AdaptiveResult，ExtremeSNRDetector 返回 (按键, 置信度)，
+分类器只有 predict。这里给每个引擎包一层适配器，统一为：
+- detect(frame)          -> Detection(key, confidence, samples, cpu_s, info)
+- detect_batch(frames)   -> [Detection, ...]，frames 可以是等长矩阵或长度不一的信号列表
+注册表按名称创建检测器，实验、桥接程序与基准测试都通过 create_detector(name) 选择引擎。
+CascadeDetector ('cascade') 组合两级：Goertzel 门控 + 只处理模糊帧的昂贵检测器。
+FixedPointDetector ('fixed_point') 用整数运算仿真嵌入式 / FPGA 上的定点 Goertzel (core.fixed_point)。
+随机森林 / CNN 的 sklearn、torch 依赖在创建对应检测器时才导入。
+
+Usage:
+    from src.ml.detectors import create_detector, available_detectors
+    det = create_detector('music', n_elements=80)
+    det.detect(signal).key
+"""
+import time
+from importlib import import_module
+from typing import NamedTuple, Protocol, runtime_checkable
+
+import numpy as np
+
+from ..core import config, dsp, fixed_point, instrument
+
+
+class Detection(NamedTuple):
+    """
+    单帧检测结果
+    :param key: 按键字符，未检出为 None
+    :param confidence: 置信度 (0-1，越大越可信)，检测器不提供时为 nan
+    :param samples: 判决实际使用的采样点数 (决策延迟 = samples / fs)
+    :param cpu_s: 该帧的 CPU 时间 (秒)，批量检测时为组内均摊值
+    :param info: 检测器特有的附加信息 (如自适应模式、MUSIC 峰值)
+    """
+    key: object
+    confidence: float
+    samples: int
+    cpu_s: float
+    info: dict = None
+
+
+@runtime_checkable
+class Detector(Protocol):
+    """检测器协议：名称 + 单帧 / 批量检测"""
+    name: str
+
+    def detect(self, frame): ...
+
+    def detect_batch(self, frames): ...
+
+
+class BaseDetector:
+    """
+    适配器基类：子类实现 _detect_matrix(frames)，对等长帧矩阵返回
+    [(key, confidence, samples, info), ...]；计时与按长度分组由基类完成
+    (开启 core.instrument 时每组计入计时器 detector.<name>，帧数计入 detector.<name>.frames；
+    未注册的子类直接构造时 name 为 None，以类名代替)
+    input_dtype 为 detect_batch 堆叠帧时转换的类型；None 保留输入类型 (如直接处理整数 PCM 的检测器)
+    """
+    name = None
+    input_dtype = float
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg or config.DEFAULT
+
+    def _detect_matrix(self, frames):
+        raise NotImplementedError
+
+    def detect(self, frame):
+        """单帧检测，返回 Detection"""
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """
+        批量检测
+        :param frames: 帧矩阵 (n, N)，或长度可不同的信号列表 (按长度分组后逐组批量处理)
+        :return: [Detection, ...]，顺序与输入一致
+        """
+        results = [None] * len(frames)
+        metric = 'detector.' + (self.name or type(self).__name__)
+        groups = {}
+        for i, frame in enumerate(frames):
+            groups.setdefault(len(frame), []).append(i)
+        for length, members in groups.items():
+            matrix = np.stack([np.asarray(frames[i], dtype=self.input_dtype) for i in members])
+            t0 = time.process_time()
+            with instrument.timer(metric):
+                if length == 0:
+                    out = [(None, float('nan'), 0, None)] * len(members)
+                else:
+                    out = self._detect_matrix(matrix)
+            cpu_s = (time.process_time() - t0) / len(members)
+            instrument.count(metric + '.frames', len(members))
+            for i, (key, conf, samples, info) in zip(members, out):
+                results[i] = Detection(key, float(conf), int(samples), cpu_s, info)
+        return results
+
+
+# ===== 注册表 =====
+# 名称 -> 工厂 (可调用对象，或 'module:attr' 字符串，首次创建时才导入)
+_REGISTRY = {}
+
+
+def register_detector(name, factory=None):
+    """
+    注册检测器工厂；可作为类装饰器使用
+    :param factory: 可调用对象 (返回 Detector)，或 'package.module:attr' 形式的延迟导入路径
+    """
+    if factory is None:
+        def decorator(obj):
+            _REGISTRY[name] = obj
+            if isinstance(obj, type) and obj.name is None:
+                obj.name = name
+            return obj
+        return decorator
+    _REGISTRY[name] = factory
+    return factory
+
+
+def available_detectors():
+    """已注册的检测器名称"""
+    return sorted(_REGISTRY)
+
+
+def create_detector(name, **kwargs):
+    """
+    按名称创建检测器
+    :param kwargs: 传给检测器构造函数的参数 (如 cfg, n_elements, method)
+    :return: 满足 Detector 协议的对象；name 未设置时 (延迟导入或函数工厂) 设为注册名
+    """
+    if name not in _REGISTRY:
+        raise KeyError(f"Unknown detector {name!r}; available: {', '.join(available_detectors())}")
+    factory = _REGISTRY[name]
+    if isinstance(factory, str):
+        module, attr = factory.split(':')
+        factory = getattr(import_module(module), attr)
+    detector = factory(**kwargs)
+    if getattr(detector, 'name', None) is None:
+        detector.name = name
+    return detector
+
+
+def _peak_share(l_values, h_values):
+    """两组各自最大值占组内总和的比例取较小者，作为 0-1 的置信度"""
+    l_share = l_values.max(axis=1) / (l_values.sum(axis=1) + 1e-30)
+    h_share = h_values.max(axis=1) / (h_values.sum(axis=1) + 1e-30)
+    return np.minimum(l_share, h_share)
+
+
+@register_detector('goertzel')
+class GoertzelDetector(BaseDetector):
+    """
+    Goertzel 检测 (dsp.identify_key 的批量形式)
+    :param use_filter: 是否带通滤波预处理
+    :param require_valid: 是否执行有效性验证，失败时 key 为 None
+    :param duration: 只使用每帧的前 duration 秒 (固定时长检测)，None 表示全长
+    """
+
+    def __init__(self, use_filter=False, require_valid=False, duration=None, cfg=None):
+        super().__init__(cfg)
+        self.use_filter = use_filter
+        self.require_valid = require_valid
+        self.duration = duration
+
+    def _detect_matrix(self, frames):
+        cfg = self.cfg
+        if self.duration is not None:
+            frames = frames[:, :int(self.duration * cfg.fs)]
+        if self.use_filter:
+            frames = dsp.bandpass_filter(frames, cfg=cfg)
+        n = frames.shape[1]
+        l_powers, h_powers = dsp.dtmf_powers(frames, cfg)
+        frame_power = np.mean(frames**2, axis=1) if self.require_valid else None
+        keys = dsp.codes_to_keys(dsp.classify_powers(l_powers, h_powers, frame_power, n, cfg), cfg)
+        conf = _peak_share(l_powers, h_powers)
+        return [(key, c, n, None) for key, c in zip(keys, conf)]
+
+
+@register_detector('music')
+class MusicAdapter(BaseDetector):
+    """
+    MUSIC 子空间检测；帧长小于子空间维数 M 时无法检测 (与 MusicDetector.detect 相同)，key 为 None
+    置信度为各组伪谱 (线性刻度) 峰值占比
+    """
+
+    def __init__(self, n_elements=80, n_signals=4, cfg=None):
+        super().__init__(cfg)
+        from ..core.music import MusicDetector
+        self.detector = MusicDetector(n_elements=n_elements, n_signals=n_signals, cfg=self.cfg)
+
+    def _detect_matrix(self, frames):
+        cfg = self.cfg
+        n = frames.shape[1]
+        if n < self.detector.M:
+            return [(None, float('nan'), n, None)] * len(frames)
+        spectrum = self.detector.spectrum_batch(frames)
+        power = 10 ** (spectrum / 10)
+        l_power, h_power = power[:, :cfg.n_low], power[:, cfg.n_low:]
+        idx_l = np.argmax(l_power, axis=1)
+        idx_h = np.argmax(h_power, axis=1)
+        keys = dsp.codes_to_keys(cfg.code_table[idx_l, idx_h], cfg)
+        conf = _peak_share(l_power, h_power)
+        rows = np.arange(len(frames))
+        l_peak, h_peak = spectrum[rows, idx_l], spectrum[rows, cfg.n_low + idx_h]
+        return [(key, c, n, {'peaks_db': (float(l), float(h))})
+                for key, c, l, h in zip(keys, conf, l_peak, h_peak)]
+
+
+@register_detector('adaptive')
+class AdaptiveAdapter(BaseDetector):
+    """
+    自适应积分时长检测；samples 为实际积分长度，info 为模式描述、探测段估计 SNR 与执行的阶段
+    AdaptiveDetector 不输出置信度 (nan)
+    """
+
+    def __init__(self, cfg=None, **kwargs):
+        super().__init__(cfg)
+        from .adaptive_detector import AdaptiveDetector
+        self.detector = AdaptiveDetector(cfg=self.cfg, **kwargs)
+
+    def _detect_matrix(self, frames):
+        return [(r.key, float('nan'), r.samples, {'mode': r.mode, 'snr_db': r.snr_db, 'stages': r.stages})
+                for r in self.detector.detect_batch(list(frames))]
+
+
+@register_detector('extreme')
+class ExtremeAdapter(BaseDetector):
+    """
+    极端低 SNR 检测
+    :param method: 'vote' | 'accumulate' | 'correlation'
+    """
+
+    def __init__(self, method='vote', frame_length=0.1, hop_length=0.05, cfg=None):
+        super().__init__(cfg)
+        from .extreme_snr_detector import ExtremeSNRDetector
+        self.method = method
+        self.detector = ExtremeSNRDetector(frame_length, hop_length, cfg=self.cfg)
+
+    def _detect_matrix(self, frames):
+        out = []
+        for frame in frames:
+            key, conf = self.detector.detect(frame, method=self.method)
+            out.append((key, conf, len(frame), None))
+        return out
+
+
+@register_detector('rf')
+class RandomForestAdapter(BaseDetector):
+    """
+    随机森林分类器 (EnhancedClassifier)；未传入已训练的 classifier 时先在线训练
+    置信度为最大类别概率
+    """
+
+    def __init__(self, classifier=None, samples_per_key=200, cfg=None, **kwargs):
+        super().__init__(cfg)
+        if classifier is None:
+            from .enhanced_classifier import EnhancedClassifier
+            classifier = EnhancedClassifier(**kwargs)
+            classifier.train(samples_per_key=samples_per_key)
+        self.classifier = classifier
+
+    def _detect_matrix(self, frames):
+        from .enhanced_classifier import FLAT_MAX_BATCH, extract_features_batch
+        X = extract_features_batch(frames)
+        if len(X) <= FLAT_MAX_BATCH:
+            classes, proba = self.classifier.flat.classes, self.classifier.flat.predict_proba(X)
+        else:
+            classes, proba = self.classifier.model.classes_, self.classifier.model.predict_proba(X)
+        best = np.argmax(proba, axis=1)
+        return [(str(classes[b]), p[b], frames.shape[1], None) for b, p in zip(best, proba)]
+
+
+@register_detector('cnn')
+class CNNAdapter(BaseDetector):
+    """
+    频谱图 CNN 分类器 (SpectrogramCNNClassifier)；未传入已训练的 classifier 时先在线训练
+    帧按训练时长 (cfg.duration) 截断或补零后输入网络，置信度为最大类别概率
+    """
+
+    def __init__(self, classifier=None, samples_per_key=200, epochs=10, cfg=None):
+        super().__init__(cfg)
+        if classifier is None:
+            from .spectrogram_cnn import SpectrogramCNNClassifier
+            classifier = SpectrogramCNNClassifier()
+            classifier.train(samples_per_key=samples_per_key, epochs=epochs)
+        self.classifier = classifier
+
+    def _detect_matrix(self, frames):
+        n = frames.shape[1]
+        length = int(self.cfg.fs * self.cfg.duration)
+        x = np.zeros((len(frames), length))
+        x[:, :min(n, length)] = frames[:, :length]
+        proba = self.classifier.predict_proba_batch(x)
+        best = np.argmax(proba, axis=1)
+        return [(self.cfg.keys[b], p[b], min(n, length), None) for b, p in zip(best, proba)]
+
+
+@register_detector('fixed_point')
+class FixedPointDetector(BaseDetector):
+    """
+    定点 Goertzel 检测 (core.fixed_point)：uint8 (FPGA 串口字节) / int16 PCM 帧不经浮点转换直接做整数运算，
+    浮点帧先量化为 input_format 整数 PCM；按 coef_bits 位系数、acc_bits 位累加器仿真嵌入式 / FPGA 实现的精度
+    :param coef_bits: 系数位宽
+    :param acc_bits: 状态 (累加器) 位宽
+    :param input_format: 浮点输入的量化格式，'int16' 或 'uint8' (FPGA 串口格式)；整数输入按其自身类型处理
+    :param require_valid: 是否执行有效性验证 (整数门限比较)，失败时 key 为 None
+    """
+    input_dtype = None
+
+    def __init__(self, coef_bits=16, acc_bits=32, input_format='int16', require_valid=False, cfg=None):
+        super().__init__(cfg)
+        if input_format not in fixed_point.INPUT_BITS:
+            raise ValueError(f"input_format must be one of {sorted(fixed_point.INPUT_BITS)}, got {input_format!r}")
+        self.coef_bits = coef_bits
+        self.acc_bits = acc_bits
+        self.input_format = input_format
+        self.require_valid = require_valid
+
+    def _detect_matrix(self, frames):
+        cfg = self.cfg
+        n = frames.shape[1]
+        if frames.dtype in (np.uint8, np.int16):
+            pcm = frames
+        elif np.issubdtype(frames.dtype, np.integer):
+            raise TypeError(f"Integer PCM must be uint8 or int16, got {frames.dtype}")
+        else:
+            pcm = fixed_point.quantize_input(frames, self.input_format)
+        l_powers, h_powers, sum_sq = fixed_point.fixed_powers(pcm, self.coef_bits, self.acc_bits, cfg=cfg)
+        codes = fixed_point.classify_fixed(l_powers, h_powers, sum_sq if self.require_valid else None, cfg)
+        keys = dsp.codes_to_keys(codes, cfg)
+        conf = _peak_share(l_powers.astype(float), h_powers.astype(float))
+        return [(key, c, n, None) for key, c in zip(keys, conf)]
+
+
+def inband_fraction(l_powers, h_powers, frame_power, n):
+    """
+    DTMF 频点能量占帧总能量的比例 (0-1)：纯双音约为 1，白噪声约为 8/N，语音通常很低
+    2 * (低频组最大 + 高频组最大) / (N^2 * mean(x^2))；全零帧为 0
+    (白噪声每个频点的期望为 2/N，每组取 4 个频点的最大值约为其 2 倍，两组合计约 8/N)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = 2 * (l_powers.max(axis=1) + h_powers.max(axis=1)) / (n * n * frame_power)
+    return np.clip(np.nan_to_num(frac, nan=0.0, posinf=0.0), 0.0, 1.0)
+
+
+@register_detector('cascade')
+class CascadeDetector(BaseDetector):
+    """
+    级联检测：先用向量化 Goertzel 门控，只把模糊的帧升级给昂贵的检测器
+    门控置信度为 DTMF 频点能量占比 (inband_fraction)：
+    - 置信度 >= band[1] 且通过有效性验证 (峰值显著性 + 能量门限)：直接采用 Goertzel 结果
+    - 置信度 <  band[0]：判为静音 / 语音，key 为 None
+    - 其余：升级给 fallback，其置信度低于 min_confidence 时 key 为 None
+    (分类器没有 "非 DTMF" 类别，门控拒绝与 min_confidence 负责把静音 / 语音挡在外面)
+    self.stats 累计各路帧数，escalation_rate 为升级比例
+    :param fallback: 第二级检测器名称 ('rf' | 'cnn' | 'music' ...) 或满足 Detector 协议的对象
+    :param band: 门控置信度的模糊区间 (low, high)，默认值按 200ms 帧标定 (噪声帧的占比约为 8/N，短帧需调高 low)；
+                 low 越小，低 SNR 的 DTMF 升级越多 (准确率上升)，静音 / 语音的误报与升级比例也随之上升
+    :param min_confidence: 第二级结果的最低置信度 (置信度为 nan 的检测器不做此检查)
+    :param kwargs: fallback 为名称时传给 create_detector (如 classifier, samples_per_key)
+    """
+
+    def __init__(self, fallback='rf', band=(0.01, 0.15), min_confidence=0.4, cfg=None, **kwargs):
+        super().__init__(cfg)
+        if isinstance(fallback, str):
+            fallback = create_detector(fallback, cfg=self.cfg, **kwargs)
+        self.fallback = fallback
+        self.band = band
+        self.min_confidence = min_confidence
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'frames': 0, 'accepted': 0, 'rejected': 0, 'escalated': 0}
+
+    @property
+    def escalation_rate(self):
+        return self.stats['escalated'] / max(self.stats['frames'], 1)
+
+    def _detect_matrix(self, frames):
+        cfg = self.cfg
+        n = frames.shape[1]
+        low, high = self.band
+        l_powers, h_powers = dsp.dtmf_powers(frames, cfg)
+        frame_power = np.mean(frames**2, axis=1)
+        codes = dsp.classify_powers(l_powers, h_powers, frame_power, n, cfg)
+        conf = inband_fraction(l_powers, h_powers, frame_power, n)
+
+        accept = (codes >= 0) & (conf >= high)
+        escalate = ~accept & (conf >= low)
+        keys = dsp.codes_to_keys(np.where(accept, codes, -1), cfg)
+        out = [(key, c, n, {'stage': 'gate', 'gate_conf': float(c)}) for key, c in zip(keys, conf)]
+
+        idx = np.flatnonzero(escalate)
+        if len(idx):
+            with instrument.timer('cascade.escalate'):
+                results = self.fallback.detect_batch(frames[idx])
+            stage = self.fallback.name
+            for i, d in zip(idx, results):
+                key = d.key if np.isnan(d.confidence) or d.confidence >= self.min_confidence else None
+                out[i] = (key, d.confidence, d.samples, {'stage': stage, 'gate_conf': float(conf[i])})
+
+        n_escalated = len(idx)
+        n_accepted = int(accept.sum())
+        self.stats['frames'] += len(frames)
+        self.stats['accepted'] += n_accepted
+        self.stats['escalated'] += n_escalated
+        self.stats['rejected'] += len(frames) - n_accepted - n_escalated
+        instrument.count('cascade.escalated', n_escalated)
+        return out
@@ -4,11 +4,12 @@ enhanced_classifier.py
 使用更丰富的特征设计，包括二阶谐波检测和置信度特征
 """
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from ..core import config
 from ..core import dsp
 
+# 不超过该批量时用展平森林推理，更大的批量交给 sklearn (可多线程，逐样本开销已被摊薄)
+FLAT_MAX_BATCH = 1024
+
 class EnhancedClassifier:
     """
     增强型 DTMF 分类器
@@ -17,16 +18,27 @@ class EnhancedClassifier:
     2. 7 个二阶谐波能量
     3. 低频组和高频组的峰值比（置信度）
     4. 总信号能量
+    
+    训练可多线程 (n_jobs)，add_trees() 以 warm start 增量加树；
+    单帧推理走展平森林 (FlatForest)，不经过 sklearn 的单次调用开销
     """
     
-    def __init__(self):
+    def __init__(self, n_estimators=100, max_depth=10, n_jobs=None):
+        """
+        :param n_jobs: 训练与 sklearn 批量预测的并行线程数 (-1 为全部核心)
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        
         # 使用随机森林（比 KNN 更鲁棒）
         self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            n_jobs=n_jobs,
             random_state=42
         )
+        self.n_estimators = n_estimators
         self.is_trained = False
+        self._flat = None  # 展平的推理结构，训练后按需构建
         
         # 二阶谐波频率
         self.harmonic_freqs = [f * 2 for f in config.low_freqs + config.high_freqs]
@@ -71,68 +83,208 @@ class EnhancedClassifier:
         # 总计: 7 + 7 + 1 + 1 + 1 + 1 = 18 维
         return features
     
-    def train(self, samples_per_key=400):
+    def extract_features_batch(self, signals):
         """
-        训练模型，重点覆盖低 SNR 区间
+        批量提取特征 (等长信号矩阵)，与逐个调用 extract_features 一致
+        :param signals: 信号矩阵 (n, N)
+        :return: 特征矩阵 (n, 20)
         """
-        print("Generating enhanced training data...")
+        return extract_features_batch(signals)
+
+    def _generate_features(self, samples_per_key, batch_size, workers, snr_bands, noise_types):
+        """逐批合成训练信号并立即转换为特征，返回 (X, y)"""
+        from .datasets import iter_batches
+
+        n_samples = samples_per_key * len(config.keys)
         X, y = [], []
-        
-        for key in config.keys:
-            # 30% 极低 SNR (-30 to -15)
-            for _ in range(int(samples_per_key * 0.3)):
-                snr = np.random.uniform(-30, -15)
-                signal = dsp.generate_dtmf(key, snr_db=snr)
-                X.append(self.extract_features(signal))
-                y.append(key)
-            
-            # 40% 中低 SNR (-15 to 0)
-            for _ in range(int(samples_per_key * 0.4)):
-                snr = np.random.uniform(-15, 0)
-                signal = dsp.generate_dtmf(key, snr_db=snr)
-                X.append(self.extract_features(signal))
-                y.append(key)
-            
-            # 30% 高 SNR (0 to 20)
-            for _ in range(int(samples_per_key * 0.3)):
-                snr = np.random.uniform(0, 20)
-                signal = dsp.generate_dtmf(key, snr_db=snr)
-                X.append(self.extract_features(signal))
-                y.append(key)
-        
-        X, y = np.array(X), np.array(y)
+        for features, keys in iter_batches(batch_size, extract_features_batch,
+                                           n_batches=-(-n_samples // batch_size), workers=workers,
+                                           snr_bands=snr_bands, noise_types=noise_types):
+            X.append(features)
+            y.append(keys)
+        return np.concatenate(X)[:n_samples], np.concatenate(y)[:n_samples]
+
+    def train(self, samples_per_key=400, batch_size=1024, workers=0):
+        """
+        训练模型，重点覆盖低 SNR 区间 (30% -30~-15dB, 40% -15~0dB, 30% 0~20dB)
+        训练信号由 datasets.iter_batches 逐批合成并立即转换为特征，原始信号不会整体驻留内存
+        :param batch_size: 每批合成的信号数
+        :param workers: 合成与特征提取的工作进程数
+        """
+        from sklearn.model_selection import train_test_split
+        from .datasets import RF_SNR_BANDS
+
+        print("Generating enhanced training data...")
+        X, y = self._generate_features(samples_per_key, batch_size, workers, RF_SNR_BANDS, None)
         
         X_train, X_val, y_train, y_val = train_test_split(
             X, y, test_size=0.2, random_state=42
         )
         
-        print(f"Training Random Forest with {len(X_train)} samples, {len(X[0])} features...")
+        print(f"Training Random Forest with {len(X_train)} samples, {X.shape[1]} features...")
+        self.model.set_params(warm_start=False, n_estimators=self.n_estimators)
         self.model.fit(X_train, y_train)
         self.is_trained = True
+        self._flat = None
         
         val_accuracy = self.model.score(X_val, y_val)
         print(f"Validation accuracy: {val_accuracy:.2%}")
         
         return val_accuracy
-    
-    def predict(self, signal):
+
+    def add_trees(self, n_trees=50, samples_per_key=200, snr_bands=None, noise_types=None,
+                  batch_size=1024, workers=0):
+        """
+        增量扩充森林 (warm start)：已有的树保持不变，新增 n_trees 棵树只在新数据上训练，
+        用于加入新的噪声条件而无需从头训练
+        :param snr_bands: 新数据的 SNR 区间 (见 datasets.sample_snr)，默认同 train
+        :param noise_types: 新数据的 core.channel 噪声类型，如 ('impulse', 'voice')
+        :return: 新数据上的验证准确率 (整个森林)
+        :raises ValueError: 新训练数据的类别集合与原森林 (classes_) 不同 (新树无法与旧树合并投票，需重新 train)
+        """
+        from sklearn.model_selection import train_test_split
+        from .datasets import RF_SNR_BANDS
+
         if not self.is_trained:
             raise RuntimeError("Model not trained.")
-        features = self.extract_features(signal)
-        return self.model.predict([features])[0]
+        X, y = self._generate_features(samples_per_key, batch_size, workers,
+                                       snr_bands or RF_SNR_BANDS, noise_types)
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=0.2, random_state=42, stratify=y
+        )
+        new_classes = np.unique(y_train)
+        if not np.array_equal(new_classes, self.model.classes_):
+            missing = sorted(map(str, set(self.model.classes_) - set(new_classes)))
+            extra = sorted(map(str, set(new_classes) - set(self.model.classes_)))
+            raise ValueError(f"add_trees needs the same classes as the original fit "
+                             f"(missing: {missing}, new: {extra}); retrain with train() instead")
+
+        n_total = self.model.n_estimators + n_trees
+        print(f"Growing Random Forest to {n_total} trees with {len(X_train)} new samples...")
+        self.model.set_params(warm_start=True, n_estimators=n_total)
+        self.model.fit(X_train, y_train)
+        self._flat = None
+
+        val_accuracy = self.model.score(X_val, y_val)
+        print(f"Validation accuracy on new conditions: {val_accuracy:.2%}")
+        return val_accuracy
+
+    @property
+    def flat(self):
+        """展平的森林 (FlatForest)，用于低延迟推理"""
+        if not self.is_trained:
+            raise RuntimeError("Model not trained.")
+        if self._flat is None:
+            self._flat = FlatForest(self.model)
+        return self._flat
     
+    def predict(self, signal):
+        """单帧预测：批量特征 + 展平森林，绕开 sklearn 的单次调用开销"""
+        return self.predict_proba(signal)[0]
+    
+    def predict_batch(self, signals):
+        """批量预测 (等长信号矩阵)，返回按键数组"""
+        X = self.extract_features_batch(signals)
+        if len(X) <= FLAT_MAX_BATCH:
+            return self.flat.predict(X)
+        return self.model.predict(X)
+
     def predict_proba(self, signal):
         """
         预测并返回置信度
         """
-        if not self.is_trained:
-            raise RuntimeError("Model not trained.")
-        
-        features = self.extract_features(signal)
-        proba = self.model.predict_proba([features])[0]
-        predicted_key = self.model.classes_[np.argmax(proba)]
-        confidence = np.max(proba)
-        return predicted_key, confidence
+        proba = self.flat.predict_proba(extract_features_batch(signal))[0]
+        best = np.argmax(proba)
+        return self.flat.classes[best], proba[best]
+
+
+class FlatForest:
+    """
+    随机森林的展平表示
+    所有树的节点数组拼接为连续的 NumPy 数组 (特征下标 / 阈值 / 左右子节点 / 叶节点类别概率)，
+    推理时所有样本 x 所有树同步逐层下降，共 max_depth 次向量化迭代，
+    与 RandomForestClassifier.predict_proba 结果一致
+    """
+
+    def __init__(self, forest):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth = 0
+        for est in forest.estimators_:
+            tree = est.tree_
+            n = tree.node_count
+            leaf = tree.children_left < 0
+            node_ids = np.arange(n)
+            # 叶节点指向自身，逐层下降时停留不动
+            lefts.append(np.where(leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(leaf, node_ids, tree.children_right) + offset)
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            value = tree.value[:, 0, :]
+            values.append(value / value.sum(axis=1, keepdims=True))
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        # children[2*i] 为右子节点，children[2*i + 1] 为左子节点，下降时一次查表
+        self.children = np.column_stack((np.concatenate(rights),
+                                         np.concatenate(lefts))).ravel().astype(np.intp)
+        self.value = np.concatenate(values)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.depth = depth
+        self.classes = forest.classes_
+
+    def predict_proba(self, X):
+        """
+        :param X: 特征矩阵 (n, n_features)
+        :return: 类别概率 (n, n_classes)
+        """
+        # sklearn 的树在 float32 特征上比较阈值
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32)).astype(float)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = self.children[2 * node + go_left]
+        return self.value[node].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def extract_features_batch(signals):
+    """
+    EnhancedClassifier 特征的批量版本 (模块级函数，可在工作进程中使用)
+    基频与谐波能量各用一次 goertzel_batch 完成
+    :param signals: 信号矩阵 (n, N)
+    :return: 特征矩阵 (n, 20)
+    """
+    signals = np.atleast_2d(np.asarray(signals, dtype=float))
+    all_freqs = config.low_freqs + config.high_freqs
+    harmonic_freqs = [f * 2 for f in all_freqs]
+    powers = dsp.goertzel_batch(signals, all_freqs + harmonic_freqs)
+    base, harm = powers[:, :len(all_freqs)], powers[:, len(all_freqs):]
+
+    max_base = base.max(axis=1, keepdims=True)
+    max_harm = harm.max(axis=1, keepdims=True)
+    base_norm = base / np.where(max_base > 0, max_base, 1)
+    harm_norm = harm / np.where(max_harm > 0, max_harm, 1)
+
+    low_sorted = np.sort(base[:, :4], axis=1)[:, ::-1]
+    high_sorted = np.sort(base[:, 4:], axis=1)[:, ::-1]
+    low_conf = np.minimum(low_sorted[:, 0] / (low_sorted[:, 1] + 1e-10), 10) / 10
+    high_conf = np.minimum(high_sorted[:, 0] / (high_sorted[:, 1] + 1e-10), 10) / 10
+
+    harmonic_ratio = base.sum(axis=1) / (harm.sum(axis=1) + 1e-10)
+    signal_energy = np.mean(signals**2, axis=1)
+
+    return np.column_stack([
+        base_norm, harm_norm, low_conf, high_conf,
+        np.minimum(harmonic_ratio, 100) / 100,
+        np.minimum(signal_energy, 10) / 10,
+    ])
 
 
 def run_enhanced_comparison():
@@ -201,6 +353,7 @@ def run_enhanced_comparison():
     plt.xlim(snr_range[0] - 1, snr_range[-1] + 1)
     plt.ylim(0, 1.05)
     
+    config.ensure_dirs()
     out_path = os.path.join(config.IMG_DIR, 'enhanced_comparison.png')
     plt.savefig(out_path, dpi=150, bbox_inches='tight')
     print(f"\nPlot saved: {out_path}")
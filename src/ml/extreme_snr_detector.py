@@ -13,25 +13,27 @@ class ExtremeSNRDetector:
     使用多帧投票 + 能量积累 + 相关检测
     """
     
-    def __init__(self, frame_length=0.1, hop_length=0.05, min_votes=3):
+    def __init__(self, frame_length=0.1, hop_length=0.05, min_votes=3, cfg=None):
         """
         :param frame_length: 每帧长度 (秒)
         :param hop_length: 帧移 (秒)
         :param min_votes: 最少需要的投票数
+        :param cfg: 检测配置 (采样率、频率方案)，若为 None 则使用 config.DEFAULT
         """
+        self.cfg = cfg or config.DEFAULT
         self.frame_length = frame_length
         self.hop_length = hop_length
         self.min_votes = min_votes
         
         # 预计算理想 DTMF 模板（用于相关检测）
         self.templates = {}
-        for key in config.keys:
+        for key in self.cfg.keys:
             self.templates[key] = self._generate_template(key)
     
     def _generate_template(self, key, duration=0.1):
         """生成理想 DTMF 模板"""
-        fL, fH = config.freq_map[key]
-        t = np.linspace(0, duration, int(config.fs * duration), endpoint=False)
+        fL, fH = self.cfg.freq_map[key]
+        t = np.linspace(0, duration, int(self.cfg.fs * duration), endpoint=False)
         template = np.sin(2 * np.pi * fL * t) + np.sin(2 * np.pi * fH * t)
         # 归一化
         template = template / np.sqrt(np.sum(template**2))
@@ -39,9 +41,7 @@ class ExtremeSNRDetector:
     
     def _goertzel_energy_vector(self, signal):
         """计算 7 个频点的能量向量"""
-        all_freqs = config.low_freqs + config.high_freqs
-        energies = [dsp.goertzel(signal, f) for f in all_freqs]
-        return np.array(energies)
+        return np.hstack(dsp.dtmf_powers(signal, self.cfg))[0]
     
     def _correlation_detect(self, signal):
         """使用互相关检测"""
@@ -84,15 +84,15 @@ class ExtremeSNRDetector:
     
     def _multi_frame_vote(self, signal):
         """多帧投票法"""
-        frame_samples = int(self.frame_length * config.fs)
-        hop_samples = int(self.hop_length * config.fs)
+        frame_samples = int(self.frame_length * self.cfg.fs)
+        hop_samples = int(self.hop_length * self.cfg.fs)
         
         votes = []
         n_frames = 0
         
         for start in range(0, len(signal) - frame_samples + 1, hop_samples):
             frame = signal[start:start + frame_samples]
-            key = dsp.identify_key(frame)
+            key = dsp.identify_key(frame, cfg=self.cfg)
             if key:
                 votes.append(key)
             n_frames += 1
@@ -110,25 +110,107 @@ class ExtremeSNRDetector:
     def _energy_accumulation(self, signal):
         """能量累积法：对整个信号进行能量累积"""
         # 使用整个信号长度
-        l_powers = [dsp.goertzel(signal, f) for f in config.low_freqs]
-        h_powers = [dsp.goertzel(signal, f) for f in config.high_freqs]
-        
-        # 找最大能量点
-        best_l = config.low_freqs[np.argmax(l_powers)]
-        best_h = config.high_freqs[np.argmax(h_powers)]
+        cfg = self.cfg
+        l_powers, h_powers = dsp.dtmf_powers(signal, cfg)
+        l_powers, h_powers = l_powers[0], h_powers[0]
         
         # 计算置信度
-        sorted_l = sorted(l_powers, reverse=True)
-        sorted_h = sorted(h_powers, reverse=True)
+        sorted_l = np.sort(l_powers)[::-1]
+        sorted_h = np.sort(h_powers)[::-1]
         conf = min(sorted_l[0] / (sorted_l[1] + 1e-10),
                    sorted_h[0] / (sorted_h[1] + 1e-10)) / 10
         conf = min(conf, 1.0)
         
-        for key, (fL, fH) in config.freq_map.items():
-            if fL == best_l and fH == best_h:
-                return key, conf
-        
-        return None, 0.0
+        # 最大能量点的下标直接查表
+        return cfg.key_table[np.argmax(l_powers)][np.argmax(h_powers)], conf
+
+    def scan_onsets(self, long_signal, threshold=0.5, chunk_size=65536):
+        """
+        长录音中的按键起点搜索 (FFT 分块匹配滤波器组)
+
+        模板与 _generate_template 同长 (100ms)。为了对未知起点的相位不敏感，
+        16 个按键模板被拆成 8 个复指数单音匹配滤波器 (I/Q 两路)，
+        按键得分 = 2 * (|c_L|^2 + |c_H|^2) / (N * 窗内能量)，理想双音时约为 1。
+        相关运算使用 scipy.signal.oaconvolve (overlap-add FFT)，
+        按 chunk_size 个输出点分块处理，内存占用与录音长度无关。
+
+        :param long_signal: 任意长度的输入信号 (可为 np.memmap)
+        :param threshold: 候选峰值的最低得分 (0-1)
+        :param chunk_size: 每块处理的输出点数
+        :return: [(offset, key, score), ...]，按 offset 升序
+        """
+        from scipy import signal as scipy_signal
+        from scipy.ndimage import maximum_filter1d
+
+        n = len(next(iter(self.templates.values())))
+        total = len(long_signal) - n + 1
+        if total <= 0:
+            return []
+
+        cfg = self.cfg
+        all_freqs = np.array(cfg.freqs)
+        n_low, n_high = len(cfg.low_freqs), len(cfg.high_freqs)
+        t = np.arange(n) / cfg.fs
+        # 相关 = 与时间反转的共轭模板做卷积
+        kernels = np.exp(-2j * np.pi * all_freqs[:, np.newaxis] * t)[:, ::-1]
+
+        offsets, keys, scores = [], [], []
+        for start in range(0, total, chunk_size):
+            stop = min(start + chunk_size, total)
+            seg = np.asarray(long_signal[start:stop + n - 1], dtype=float)
+
+            corr = scipy_signal.oaconvolve(seg[np.newaxis, :], kernels, mode='valid', axes=1)
+            power = corr.real**2 + corr.imag**2
+
+            # 滑动窗口能量
+            csum = np.concatenate(([0.0], np.cumsum(seg**2)))
+            energy = csum[n:] - csum[:-n]
+
+            # (4, 1, L) + (1, 4, L) -> 16 个按键得分，顺序与 cfg.keys 一致
+            key_power = (power[:n_low, np.newaxis, :] + power[np.newaxis, n_low:, :]).reshape(n_low * n_high, -1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                key_scores = np.where(energy > 1e-12, 2 * key_power / (n * energy), 0.0)
+
+            best_idx = np.argmax(key_scores, axis=0)
+            best_score = key_scores[best_idx, np.arange(len(best_idx))]
+
+            # 局部极大值 (半个模板长度邻域) 且超过门限
+            local_max = maximum_filter1d(best_score, size=n, mode='nearest')
+            cand = np.flatnonzero((best_score >= threshold) & (best_score >= local_max))
+            keep = _non_max_suppress(cand, best_score[cand], n)
+
+            offsets.extend(start + keep)
+            keys.extend(best_idx[keep])
+            scores.extend(best_score[keep])
+
+        if not offsets:
+            return []
+
+        # 块边界两侧的候选再做一次全局抑制
+        offsets = np.array(offsets)
+        scores = np.array(scores)
+        keys = np.array(keys)
+        keep = _non_max_suppress(np.arange(len(offsets)), scores, n, positions=offsets)
+
+        return [(int(offsets[i]), cfg.keys[keys[i]], float(scores[i])) for i in keep]
+
+
+def _non_max_suppress(indices, scores, min_distance, positions=None):
+    """
+    贪心非极大值抑制：按得分从高到低保留，距离已保留峰小于 min_distance 的丢弃
+    :return: 保留下来的 indices，按位置升序
+    """
+    if positions is None:
+        positions = indices
+    positions = np.asarray(positions)
+    order = np.lexsort((positions, -np.asarray(scores)))
+
+    kept = []
+    for i in order:
+        if all(abs(positions[i] - positions[j]) >= min_distance for j in kept):
+            kept.append(i)
+    kept.sort(key=lambda i: positions[i])
+    return np.asarray(indices)[kept] if len(kept) else np.array([], dtype=int)
 
 
 def test_extreme_snr():
@@ -3,22 +3,15 @@ spectrogram_cnn.py
 基于频谱图的卷积神经网络 DTMF 分类器
 这是一个轻量级的 CNN，使用 STFT 频谱图作为输入
 """
+import importlib.util
 import numpy as np
 import os
-from sklearn.model_selection import train_test_split
 from ..core import config
 from ..core import dsp
 
-# 尝试导入 PyTorch，如果没有则使用 sklearn 的 MLP 作为备选
-try:
-    import torch
-    import torch.nn as nn
-    import torch.optim as optim
-    from torch.utils.data import DataLoader, TensorDataset
-    HAS_TORCH = True
-except ImportError:
-    HAS_TORCH = False
-    from sklearn.neural_network import MLPClassifier
+# 有 PyTorch 时使用 CNN (torch_models)，否则使用 sklearn 的 MLP 作为备选
+# 只检查是否安装，torch / sklearn 在训练或推理时才导入 (import torch 需要 1s 以上)
+HAS_TORCH = importlib.util.find_spec('torch') is not None
 
 
 def compute_spectrogram(signal, n_fft=128, hop_length=32):
@@ -26,64 +19,28 @@ def compute_spectrogram(signal, n_fft=128, hop_length=32):
     计算短时傅里叶变换 (STFT) 频谱图
     返回: 2D 数组 (频率 x 时间)
     """
-    # 简化版 STFT
-    n_frames = (len(signal) - n_fft) // hop_length + 1
-    spectrogram = []
-    
-    window = np.hanning(n_fft)
-    
-    for i in range(n_frames):
-        start = i * hop_length
-        frame = signal[start:start + n_fft] * window
-        fft_result = np.abs(np.fft.rfft(frame))
-        spectrogram.append(fft_result)
-    
-    spectrogram = np.array(spectrogram).T  # (freq_bins, time_frames)
+    return compute_spectrogram_batch(np.asarray(signal)[np.newaxis], n_fft, hop_length)[0]
+
+
+def compute_spectrogram_batch(signals, n_fft=128, hop_length=32):
+    """
+    批量计算频谱图 (等长信号矩阵)，与逐个调用 compute_spectrogram 一致
+    分帧为零拷贝视图，整批一次 rfft
+    返回: 3D 数组 (样本 x 频率 x 时间)
+    """
+    signals = np.atleast_2d(np.asarray(signals, dtype=float))
+    frames = np.lib.stride_tricks.sliding_window_view(signals, n_fft, axis=-1)[:, ::hop_length]
+    spectrogram = np.abs(np.fft.rfft(frames * np.hanning(n_fft), axis=-1))
     
     # 只取 0-2500Hz 范围（DTMF 频率都在这个范围内）
     freq_bins = n_fft // 2 + 1
     max_freq_bin = int(2500 / (config.fs / 2) * freq_bins)
-    spectrogram = spectrogram[:max_freq_bin, :]
+    spectrogram = spectrogram[:, :, :max_freq_bin].transpose(0, 2, 1)  # (N, freq_bins, time_frames)
     
     # 归一化
     spectrogram = np.log1p(spectrogram)  # 对数压缩
-    if spectrogram.max() > 0:
-        spectrogram = spectrogram / spectrogram.max()
-    
-    return spectrogram
-
-
-class SimpleCNN(nn.Module):
-    """简单的 CNN 分类器"""
-    def __init__(self, input_shape, num_classes=12):
-        super(SimpleCNN, self).__init__()
-        
-        h, w = input_shape
-        
-        self.conv = nn.Sequential(
-            nn.Conv2d(1, 16, kernel_size=3, padding=1),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Conv2d(16, 32, kernel_size=3, padding=1),
-            nn.ReLU(),
-            nn.MaxPool2d(2),
-            nn.Conv2d(32, 64, kernel_size=3, padding=1),
-            nn.ReLU(),
-            nn.AdaptiveAvgPool2d((4, 4))
-        )
-        
-        self.fc = nn.Sequential(
-            nn.Flatten(),
-            nn.Linear(64 * 4 * 4, 128),
-            nn.ReLU(),
-            nn.Dropout(0.3),
-            nn.Linear(128, num_classes)
-        )
-    
-    def forward(self, x):
-        x = self.conv(x)
-        x = self.fc(x)
-        return x
+    peak = spectrogram.max(axis=(1, 2), keepdims=True)
+    return spectrogram / np.where(peak > 0, peak, 1)
 
 
 class SpectrogramCNNClassifier:
@@ -101,62 +58,86 @@ class SpectrogramCNNClassifier:
         spec = compute_spectrogram(signal)
         return spec
     
-    def train(self, samples_per_key=500, epochs=30):
-        """训练 CNN 模型"""
-        print("Generating spectrogram training data...")
-        
-        X, y = [], []
-        for key in config.keys:
-            for _ in range(samples_per_key):
-                # 覆盖广泛的 SNR 范围，重点低 SNR
-                if np.random.random() < 0.6:
-                    snr = np.random.uniform(-30, -5)
-                else:
-                    snr = np.random.uniform(-5, 20)
-                
-                signal = dsp.generate_dtmf(key, snr_db=snr)
-                spec = self._signal_to_features(signal)
-                X.append(spec)
-                y.append(self.key_to_idx[key])
-        
-        X = np.array(X)
-        y = np.array(y)
+    def train(self, samples_per_key=500, epochs=30, batch_size=64, workers=0):
+        """
+        训练 CNN 模型
+        训练数据在线合成 (torch_models.SyntheticDTMFDataset)：不预先生成数据集，内存占用恒定，
+        每个 epoch 都是新的 samples_per_key * 0.8 * 16 个样本；验证集固定为 20%
+        :param workers: 合成训练数据的工作进程数 (DataLoader num_workers)
+        """
+        from .datasets import iter_batches
         
-        self.input_shape = X[0].shape
+        n_samples = samples_per_key * len(config.keys)
+        self.input_shape = self._signal_to_features(np.zeros(int(config.fs * config.duration))).shape
         print(f"Spectrogram shape: {self.input_shape}")
         
-        X_train, X_val, y_train, y_val = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
+        # 覆盖广泛的 SNR 范围，重点低 SNR (datasets.CNN_SNR_BANDS)
+        print("Generating validation spectrograms...")
+        X_val, keys = next(iter_batches(n_samples // 5, compute_spectrogram_batch, n_batches=1))
+        y_val = np.array([self.key_to_idx[k] for k in keys])
+        batches_per_epoch = max(1, (n_samples - len(y_val)) // batch_size)
         
         if HAS_TORCH:
-            self._train_pytorch(X_train, y_train, X_val, y_val, epochs)
+            from torch.utils.data import DataLoader
+            from .torch_models import SyntheticDTMFDataset
+            dataset = SyntheticDTMFDataset(batches_per_epoch, batch_size,
+                                           compute_spectrogram_batch, self.key_to_idx)
+            train_loader = DataLoader(dataset, batch_size=None, num_workers=workers)
+            self._fit_pytorch(train_loader, X_val, y_val, epochs)
         else:
-            self._train_sklearn(X_train, y_train, X_val, y_val)
+            batches = iter_batches(batch_size, compute_spectrogram_batch,
+                                   n_batches=batches_per_epoch * epochs, workers=workers)
+            self._fit_sklearn(batches, X_val, y_val)
         
         self.is_trained = True
     
     def _train_pytorch(self, X_train, y_train, X_val, y_val, epochs):
-        """使用 PyTorch 训练"""
-        print("Training CNN with PyTorch...")
-        
-        # 添加通道维度
-        X_train = X_train[:, np.newaxis, :, :]
-        X_val = X_val[:, np.newaxis, :, :]
+        """使用 PyTorch 训练 (预先生成的数组数据)"""
+        import torch
+        from torch.utils.data import DataLoader, TensorDataset
         
         train_dataset = TensorDataset(
             torch.FloatTensor(X_train),
             torch.LongTensor(y_train)
         )
+        train_loader = DataLoader(train_dataset, batch_size=64, shuffle=True)
+        self._fit_pytorch(train_loader, X_val, y_val, epochs)
+    
+    def _evaluate(self, val_loader):
+        """验证集准确率"""
+        import torch
+        
+        self.model.eval()
+        correct = 0
+        total = 0
+        with torch.no_grad():
+            for batch_x, batch_y in val_loader:
+                outputs = self.model(batch_x.unsqueeze(1))
+                _, predicted = torch.max(outputs, 1)
+                total += batch_y.size(0)
+                correct += (predicted == batch_y).sum().item()
+        return correct / total
+    
+    def _fit_pytorch(self, train_loader, X_val, y_val, epochs):
+        """
+        使用 PyTorch 训练
+        :param train_loader: 产出 (频谱图批 (B, F, T), 类别下标批) 的 DataLoader
+        """
+        import torch
+        import torch.nn as nn
+        import torch.optim as optim
+        from torch.utils.data import DataLoader, TensorDataset
+        from .torch_models import SimpleCNN
+        
+        print("Training CNN with PyTorch...")
+        
         val_dataset = TensorDataset(
             torch.FloatTensor(X_val),
             torch.LongTensor(y_val)
         )
-        
-        train_loader = DataLoader(train_dataset, batch_size=64, shuffle=True)
         val_loader = DataLoader(val_dataset, batch_size=64)
         
-        self.model = SimpleCNN(self.input_shape, num_classes=12)
+        self.model = SimpleCNN(self.input_shape, num_classes=len(config.keys))
         criterion = nn.CrossEntropyLoss()
         optimizer = optim.Adam(self.model.parameters(), lr=0.001)
         
@@ -164,53 +145,35 @@ class SpectrogramCNNClassifier:
             self.model.train()
             for batch_x, batch_y in train_loader:
                 optimizer.zero_grad()
-                outputs = self.model(batch_x)
+                outputs = self.model(batch_x.unsqueeze(1))  # 添加通道维度
                 loss = criterion(outputs, batch_y)
                 loss.backward()
                 optimizer.step()
             
             # 验证
             if (epoch + 1) % 10 == 0:
-                self.model.eval()
-                correct = 0
-                total = 0
-                with torch.no_grad():
-                    for batch_x, batch_y in val_loader:
-                        outputs = self.model(batch_x)
-                        _, predicted = torch.max(outputs, 1)
-                        total += batch_y.size(0)
-                        correct += (predicted == batch_y).sum().item()
-                print(f"  Epoch {epoch+1}/{epochs}, Val Accuracy: {correct/total:.2%}")
+                print(f"  Epoch {epoch+1}/{epochs}, Val Accuracy: {self._evaluate(val_loader):.2%}")
         
         # 最终验证
-        self.model.eval()
-        correct = 0
-        total = 0
-        with torch.no_grad():
-            for batch_x, batch_y in val_loader:
-                outputs = self.model(batch_x)
-                _, predicted = torch.max(outputs, 1)
-                total += batch_y.size(0)
-                correct += (predicted == batch_y).sum().item()
-        print(f"Final validation accuracy: {correct/total:.2%}")
+        print(f"Final validation accuracy: {self._evaluate(val_loader):.2%}")
     
-    def _train_sklearn(self, X_train, y_train, X_val, y_val):
-        """使用 sklearn MLP 作为备选"""
-        print("Training MLP with sklearn (PyTorch not available)...")
+    def _fit_sklearn(self, batches, X_val, y_val):
+        """使用 sklearn MLP 作为备选 (流式 partial_fit)"""
+        from sklearn.neural_network import MLPClassifier
         
-        # 展平频谱图
-        X_train_flat = X_train.reshape(len(X_train), -1)
-        X_val_flat = X_val.reshape(len(X_val), -1)
+        print("Training MLP with sklearn partial_fit (PyTorch not available)...")
         
         self.model = MLPClassifier(
             hidden_layer_sizes=(256, 128, 64),
             max_iter=100,
-            random_state=42,
-            verbose=True
+            random_state=42
         )
-        self.model.fit(X_train_flat, y_train)
+        classes = np.arange(len(config.keys))
+        for X, keys in batches:
+            y = np.array([self.key_to_idx[k] for k in keys])
+            self.model.partial_fit(X.reshape(len(X), -1), y, classes=classes)
         
-        val_acc = self.model.score(X_val_flat, y_val)
+        val_acc = self.model.score(X_val.reshape(len(X_val), -1), y_val)
         print(f"Validation accuracy: {val_acc:.2%}")
     
     def predict(self, signal):
@@ -221,6 +184,7 @@ class SpectrogramCNNClassifier:
         spec = self._signal_to_features(signal)
         
         if HAS_TORCH:
+            import torch
             self.model.eval()
             with torch.no_grad():
                 x = torch.FloatTensor(spec[np.newaxis, np.newaxis, :, :])
@@ -232,6 +196,27 @@ class SpectrogramCNNClassifier:
             pred_idx = self.model.predict(spec_flat)[0]
             return self.idx_to_key[pred_idx]
 
+    def predict_proba_batch(self, signals):
+        """
+        批量预测类别概率 (等长信号矩阵，长度应与训练时一致)
+        :return: (n, 16) 概率矩阵，列顺序同 config.keys
+        """
+        if not self.is_trained:
+            raise RuntimeError("Model not trained.")
+
+        specs = compute_spectrogram_batch(signals)
+
+        if HAS_TORCH:
+            import torch
+            self.model.eval()
+            with torch.no_grad():
+                output = self.model(torch.FloatTensor(specs[:, np.newaxis, :, :]))
+                return torch.softmax(output, dim=1).numpy()
+
+        proba = np.zeros((len(specs), len(config.keys)))
+        proba[:, self.model.classes_] = self.model.predict_proba(specs.reshape(len(specs), -1))
+        return proba
+
 
 def run_cnn_comparison():
     """运行 CNN vs Goertzel 对比实验"""
@@ -291,6 +276,7 @@ def run_cnn_comparison():
     plt.xlim(snr_range[0] - 1, snr_range[-1] + 1)
     plt.ylim(0, 1.05)
     
+    config.ensure_dirs()
     out_path = os.path.join(config.IMG_DIR, 'cnn_comparison.png')
     plt.savefig(out_path, dpi=150, bbox_inches='tight')
     print(f"\nPlot saved: {out_path}")
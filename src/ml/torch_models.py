@@ -0,0 +1,84 @@
+"""
+torch_models.py
+依赖 PyTorch 的组件 (仅在需要时由 spectrogram_cnn 导入)
+- SimpleCNN:             频谱图分类网络
+- SyntheticDTMFDataset:  在线合成训练集 (IterableDataset)
+"""
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import IterableDataset, get_worker_info
+
+from ..core import config
+from .datasets import CNN_SNR_BANDS, iter_batches
+
+
+class SimpleCNN(nn.Module):
+    """简单的 CNN 分类器"""
+    def __init__(self, input_shape, num_classes=len(config.keys)):
+        super(SimpleCNN, self).__init__()
+        
+        h, w = input_shape
+        
+        self.conv = nn.Sequential(
+            nn.Conv2d(1, 16, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Conv2d(16, 32, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.MaxPool2d(2),
+            nn.Conv2d(32, 64, kernel_size=3, padding=1),
+            nn.ReLU(),
+            nn.AdaptiveAvgPool2d((4, 4))
+        )
+        
+        self.fc = nn.Sequential(
+            nn.Flatten(),
+            nn.Linear(64 * 4 * 4, 128),
+            nn.ReLU(),
+            nn.Dropout(0.3),
+            nn.Linear(128, num_classes)
+        )
+    
+    def forward(self, x):
+        x = self.conv(x)
+        x = self.fc(x)
+        return x
+
+
+class SyntheticDTMFDataset(IterableDataset):
+    """
+    在线合成训练集 (PyTorch IterableDataset)
+    每次迭代产出整批张量，配合 DataLoader(dataset, batch_size=None, num_workers=k) 使用；
+    批在工作进程内向量化合成，每个 epoch 的种子由 DataLoader 重新分配
+    :param batches_per_epoch: 每个 epoch 的总批数 (多个工作进程平分)
+    :param transform: 批量特征变换 signals -> X
+    :param key_to_idx: 按键到类别下标的映射
+    """
+
+    def __init__(self, batches_per_epoch, batch_size=64, transform=None, key_to_idx=None,
+                 snr_bands=CNN_SNR_BANDS, noise_types=None, duration=None):
+        self.batches_per_epoch = batches_per_epoch
+        self.batch_size = batch_size
+        self.transform = transform
+        self.key_to_idx = key_to_idx or {key: idx for idx, key in enumerate(config.keys)}
+        self.snr_bands = snr_bands
+        self.noise_types = noise_types
+        self.duration = duration
+
+    def __iter__(self):
+        info = get_worker_info()
+        if info is None:
+            n_batches, seed = self.batches_per_epoch, np.random.randint(2**31)
+        else:
+            n_batches = len(range(info.id, self.batches_per_epoch, info.num_workers))
+            seed = info.seed % 2**32
+
+        for X, keys in iter_batches(self.batch_size, self.transform, n_batches, seed,
+                                    snr_bands=self.snr_bands, noise_types=self.noise_types,
+                                    duration=self.duration):
+            y = np.array([self.key_to_idx[k] for k in keys])
+            yield torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32)), torch.from_numpy(y)
+
+    def __len__(self):
+        return self.batches_per_epoch
@@ -1,2 +1,15 @@
 # Utility functions for visualization
-from .visualize import *
+# visualize 依赖 matplotlib，按需导入：只用 results_store / esc50_corpus 时不会加载
+from importlib import import_module
+
+
+def __getattr__(name):
+    if name.startswith('__'):
+        raise AttributeError(name)
+    visualize = import_module('.visualize', __name__)
+    if name == 'visualize':
+        return visualize
+    try:
+        return getattr(visualize, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
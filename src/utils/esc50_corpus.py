@@ -0,0 +1,200 @@
+"""
+esc50_corpus.py
+ESC-50 环境噪声语料预处理与采样 (Preloaded Noise Corpus)
+
+原先每次试验都要 glob 目录、打开并解码一个随机 WAV、转浮点再重采样，
+噪声加载占据了 ESC-50 扫参的大部分时间。这里改为一次性预处理：
+- build_corpus(): 把全部片段重采样到 config.fs (8kHz) float32，依次写入单个 .npy 数组，
+  另存偏移量索引 (offsets / lengths) 与类别标签
+- NoiseCorpus: 以内存映射方式打开，sample() 返回随机噪声段的零拷贝切片，
+  sample_batch() 一次取出一批 (n, duration) 噪声段
+
+Usage:
+    python -m src.utils.esc50_corpus                        # datasets/esc50/audio -> datasets/esc50/corpus_8k
+    python -m src.utils.esc50_corpus --audio-dir /data/ESC-50/audio --out /tmp/esc50_8k
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+
+import numpy as np
+from scipy.io import wavfile
+
+from ..core import config
+from ..core.decoder import pcm_to_float
+from ..core.resample import resample, _ratio
+
+ESC50_DIR = os.path.join(config.PROJECT_ROOT, 'datasets', 'esc50')
+AUDIO_DIR = os.path.join(ESC50_DIR, 'audio')
+CORPUS_DIR = os.path.join(ESC50_DIR, 'corpus_8k')
+
+
+def _load_categories(audio_dir):
+    """
+    读取 ESC-50 元数据 (meta/esc50.csv) 中的类别名
+    :return: {文件名: 类别}，元数据缺失时返回空字典
+    """
+    meta = os.path.join(os.path.dirname(os.path.abspath(audio_dir)), 'meta', 'esc50.csv')
+    if not os.path.exists(meta):
+        return {}
+    with open(meta, newline='') as f:
+        return {row['filename']: row['category'] for row in csv.DictReader(f)}
+
+
+def _category_from_name(filename):
+    """无元数据时从文件名 {fold}-{clip}-{take}-{target}.wav 取类别编号"""
+    stem = os.path.splitext(filename)[0]
+    return stem.rsplit('-', 1)[-1] if '-' in stem else ''
+
+
+def build_corpus(audio_dir=AUDIO_DIR, out_dir=CORPUS_DIR, fs=None):
+    """
+    一次性预处理：全部片段重采样并拼接为单个 float32 数组
+    先用内存映射读取各文件头得到输出长度，再逐个文件写入 open_memmap，峰值内存只有单个片段
+    :param audio_dir: ESC-50 音频目录
+    :param out_dir: 输出目录 (audio.npy + index.npz)
+    :param fs: 目标采样率，若为 None 则使用 config.fs
+    :return: 片段数量
+    """
+    if fs is None:
+        fs = config.fs
+    files = sorted(glob.glob(os.path.join(audio_dir, '*.wav')))
+    if not files:
+        raise FileNotFoundError(f"No WAV files found under {audio_dir}")
+
+    # 第一遍：只读文件头，计算每个片段重采样后的长度
+    lengths = []
+    for path in files:
+        fs_orig, data = wavfile.read(path, mmap=True)
+        up, down = _ratio(fs_orig, fs)
+        lengths.append(-(-len(data) * up // down))
+        del data
+    lengths = np.array(lengths, dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    os.makedirs(out_dir, exist_ok=True)
+    audio = np.lib.format.open_memmap(os.path.join(out_dir, 'audio.npy'), mode='w+',
+                                      dtype=np.float32, shape=(int(lengths.sum()),))
+
+    # 第二遍：解码、重采样、写入
+    for path, off, n in zip(files, offsets, lengths):
+        fs_orig, data = wavfile.read(path)
+        if data.ndim > 1:
+            data = data[:, 0]
+        audio[off:off + n] = resample(pcm_to_float(data), fs_orig, fs)
+    audio.flush()
+    del audio
+
+    names = [os.path.basename(p) for p in files]
+    categories = _load_categories(audio_dir)
+    np.savez(os.path.join(out_dir, 'index.npz'),
+             offsets=offsets, lengths=lengths, fs=fs,
+             filenames=np.array(names),
+             categories=np.array([categories.get(n, _category_from_name(n)) for n in names]))
+    return len(files)
+
+
+class NoiseCorpus:
+    """
+    预处理后的噪声语料 (内存映射，只读)
+    :param path: build_corpus 的输出目录
+    :param seed: 语料自带随机数生成器的种子 (抽样时未传入 rng 则使用它)，None 为不固定种子
+    """
+
+    def __init__(self, path=CORPUS_DIR, seed=None):
+        self.path = path
+        self.rng = np.random.default_rng(seed)
+        self.audio = np.load(os.path.join(path, 'audio.npy'), mmap_mode='r')
+        with np.load(os.path.join(path, 'index.npz')) as index:
+            self.offsets = index['offsets']
+            self.lengths = index['lengths']
+            self.fs = int(index['fs'])
+            self.filenames = index['filenames']
+            self.categories = index['categories']
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def clip(self, i):
+        """第 i 个完整片段 (零拷贝切片)"""
+        return self.audio[self.offsets[i]:self.offsets[i] + self.lengths[i]]
+
+    def _candidates(self, category):
+        if category is None:
+            return np.arange(len(self))
+        idx = np.flatnonzero(self.categories == category)
+        if len(idx) == 0:
+            raise ValueError(f"Unknown category: {category}")
+        return idx
+
+    def _draw(self, n, n_samples, rng, category):
+        """随机选择 n 个 (片段, 起点)；短于 n_samples 的片段起点固定为 0"""
+        clips = rng.choice(self._candidates(category), size=n)
+        span = np.maximum(self.lengths[clips] - n_samples, 0)
+        starts = self.offsets[clips] + (rng.random(n) * (span + 1)).astype(np.int64)
+        return clips, starts
+
+    def sample(self, n_samples, rng=None, category=None):
+        """
+        随机抽取一段噪声
+        :param n_samples: 采样点数
+        :param rng: np.random.Generator，若为 None 则使用 self.rng
+        :param category: 只从该类别中抽取 (如 'rain')
+        :return: float32 噪声段；片段足够长时为内存映射的零拷贝切片 (只读)
+        """
+        rng = rng or self.rng
+        (clip,), (start,) = self._draw(1, n_samples, rng, category)
+        if self.lengths[clip] >= n_samples:
+            return self.audio[start:start + n_samples]
+        # 片段过短时循环拼接 (与原 load_esc50_noise 行为一致)
+        reps = int(np.ceil(n_samples / self.lengths[clip]))
+        return np.tile(self.clip(clip), reps)[:n_samples]
+
+    def sample_batch(self, batch_size, n_samples, rng=None, category=None):
+        """
+        批量抽取噪声段，一次 gather 得到 (batch_size, n_samples) 矩阵
+        短片段按循环拼接的方式取模索引
+        """
+        rng = rng or self.rng
+        clips, starts = self._draw(batch_size, n_samples, rng, category)
+        pos = (starts - self.offsets[clips])[:, None] + np.arange(n_samples)
+        pos %= self.lengths[clips][:, None]
+        return self.audio[self.offsets[clips][:, None] + pos]
+
+
+def open_corpus(audio_dir=AUDIO_DIR, path=CORPUS_DIR, build=True, seed=None):
+    """
+    打开预处理语料；不存在时 (build=True) 先从 audio_dir 构建
+    :param seed: 传给 NoiseCorpus 的抽样种子
+    :return: NoiseCorpus，数据集缺失时返回 None
+    """
+    if not os.path.exists(os.path.join(path, 'index.npz')):
+        if not build or not glob.glob(os.path.join(audio_dir, '*.wav')):
+            return None
+        print(f"Preprocessing ESC-50 clips from {audio_dir} ...")
+        n = build_corpus(audio_dir, path)
+        print(f"Corpus with {n} clips saved to {path}")
+    return NoiseCorpus(path, seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resample ESC-50 clips into a memory-mapped 8 kHz corpus")
+    parser.add_argument('--audio-dir', default=AUDIO_DIR, help="ESC-50 audio directory")
+    parser.add_argument('--out', default=CORPUS_DIR, help="output directory")
+    args = parser.parse_args(argv)
+
+    try:
+        n = build_corpus(args.audio_dir, args.out)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 1
+    corpus = NoiseCorpus(args.out)
+    print(f"{n} clips, {len(corpus.audio) / corpus.fs / 3600:.2f} h at {corpus.fs} Hz "
+          f"({corpus.audio.nbytes / 2**20:.0f} MiB) -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+results_store.py
+实验结果列式存储 (Append-only Columnar Results Store)
+
+扫参实验的每一次试验记录为一行 (算法、SNR、噪声类型、按键、预测、置信度、决策延迟 ...)，
+常用列为 run, algorithm, snr, noise_type, key, prediction, correct, confidence, latency_ms，
+也可以附加任意其他列 (如 severity, level, window_ms)。按列写入 results/<experiment>/ 下的分片文件：
+- 只追加：每次 flush 写一个新分片，从不修改已有文件，多个并行进程可同时写入同一实验
+- 加载时合并所有分片 (可按 run 过滤)，绘图直接读取，无需重新跑实验
+- 默认 NPZ (仅依赖 NumPy)；安装了 pyarrow 时可选 Parquet
+"""
+import glob
+import os
+import time
+import uuid
+
+import numpy as np
+
+from ..core import config
+
+RESULTS_DIR = os.path.join(config.PROJECT_ROOT, 'results')
+
+
+def _to_column(values):
+    """把一列 Python 值转换为 NumPy 数组：字符串 / 布尔 / 浮点 (None 转为 '' 或 NaN)"""
+    non_null = [v for v in values if v is not None]
+    if non_null and all(isinstance(v, (str, np.str_)) for v in non_null):
+        return np.array(['' if v is None else str(v) for v in values])
+    if non_null and all(isinstance(v, (bool, np.bool_)) for v in non_null):
+        return np.array([bool(v) for v in values])
+    return np.array([np.nan if v is None else float(v) for v in values])
+
+
+def _new_run_id():
+    """
+    运行标识：时间戳精确到微秒 (按字典序即按时间排序，load_results 的 'latest' 依赖这一点)，
+    再加随机后缀，同一时刻启动的两次扫参也不会共用标识而被合并
+    """
+    now = time.time()
+    return f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}_{int(now % 1 * 1e6):06d}_{uuid.uuid4().hex[:4]}"
+
+
+def _all_null(column):
+    """_to_column 把全为 None 的列存为全 NaN 的浮点列，它本身不决定列的类型"""
+    return column.dtype.kind == 'f' and bool(np.isnan(column).all())
+
+
+def _fill_value(dtype):
+    if dtype.kind == 'U':
+        return ''
+    if dtype.kind == 'b':
+        return False
+    return np.nan
+
+
+class ResultsStore:
+    """
+    单个实验的结果存储
+    :param experiment: 实验名，对应 results/<experiment>/ 目录
+    :param run: 本次运行的标识；并行分片希望合并为同一次运行时传入相同的值
+    :param fmt: 'npz' 或 'parquet'
+    """
+
+    def __init__(self, experiment, run=None, root=None, fmt='npz', flush_every=10000):
+        self.experiment = experiment
+        self.run = run or _new_run_id()
+        self.path = os.path.join(root or RESULTS_DIR, experiment)
+        self.fmt = fmt
+        self.flush_every = flush_every
+        self._rows = []
+
+    def add(self, **record):
+        """记录一次试验；prediction 与 key 相同时自动计算 correct"""
+        record.setdefault('run', self.run)
+        if 'correct' not in record and 'key' in record and 'prediction' in record:
+            record['correct'] = record['prediction'] == record['key']
+        self._rows.append(record)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """把缓存的记录写成一个新分片"""
+        if not self._rows:
+            return None
+        names = list(dict.fromkeys(k for row in self._rows for k in row))
+        columns = {name: _to_column([row.get(name) for row in self._rows]) for name in names}
+        self._rows = []
+
+        os.makedirs(self.path, exist_ok=True)
+        shard = os.path.join(self.path, f"{self.run}-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        if self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            shard += '.parquet'
+            pq.write_table(pa.table(columns), shard)
+        else:
+            shard += '.npz'
+            np.savez(shard, **columns)
+        return shard
+
+    def load(self, run='latest'):
+        """加载本实验的结果，参数同 load_results"""
+        return load_results(self.experiment, run=run, root=os.path.dirname(self.path))
+
+
+def load_results(experiment, run='latest', root=None):
+    """
+    合并实验的全部分片
+    :param run: 'latest' 只取最近一次运行；None 取全部；也可以是具体的 run 标识
+    :return: {列名: 数组}，记录数为 0 时返回空字典
+    """
+    path = os.path.join(root or RESULTS_DIR, experiment)
+    shards = []
+    for f in sorted(glob.glob(os.path.join(path, '*.npz'))):
+        with np.load(f, allow_pickle=False) as data:
+            shards.append({k: data[k] for k in data.files})
+    parquet_files = sorted(glob.glob(os.path.join(path, '*.parquet')))
+    if parquet_files:
+        import pyarrow.parquet as pq
+        for f in parquet_files:
+            table = pq.read_table(f)
+            shards.append({name: np.asarray(table.column(name).to_numpy(zero_copy_only=False))
+                           for name in table.column_names})
+    if not shards:
+        return {}
+
+    names = list(dict.fromkeys(k for shard in shards for k in shard))
+    merged = {}
+    for name in names:
+        # 列类型跨分片决定：全 None 的分片 (全 NaN 浮点) 不参与，
+        # 否则字符串列与之拼接会得到字面量 'nan'
+        columns = [shard[name] for shard in shards if name in shard]
+        dtype = next((c.dtype for c in columns if not _all_null(c)), columns[0].dtype)
+        parts = []
+        for shard in shards:
+            n = len(next(iter(shard.values())))
+            if name not in shard or (dtype.kind != 'f' and _all_null(shard[name])):
+                parts.append(np.full(n, _fill_value(dtype)))
+            else:
+                parts.append(shard[name])
+        merged[name] = np.concatenate(parts)
+
+    if run == 'latest' and 'run' in merged:
+        run = np.unique(merged['run'])[-1]
+    if run is not None and 'run' in merged:
+        mask = merged['run'] == run
+        merged = {k: v[mask] for k, v in merged.items()}
+    return merged
+
+
+def mean_table(data, column, x, group='algorithm', where=None):
+    """
+    按 (group, x) 聚合数值列的均值 (如 latency_ms)
+    :param data: load_results 的返回值
+    :param x: 横轴列名 (如 'snr', 'severity')
+    :param where: 额外的过滤条件 {列名: 值}
+    :return: (x 取值数组, {组名: 均值数组})
+    """
+    mask = np.ones(len(data[x]), dtype=bool)
+    for col, val in (where or {}).items():
+        mask &= data[col] == val
+    xs = np.unique(data[x][mask])
+    values = data[column].astype(float)
+    table = {}
+    for g in dict.fromkeys(data[group][mask]):
+        gm = mask & (data[group] == g)
+        table[g] = np.array([np.nanmean(values[gm & (data[x] == v)]) for v in xs])
+    return xs, table
+
+
+def accuracy_table(data, x, group='algorithm', where=None):
+    """按 (group, x) 聚合准确率，返回格式同 mean_table"""
+    return mean_table(data, 'correct', x, group, where)
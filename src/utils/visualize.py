@@ -5,6 +5,10 @@ import subprocess
 from scipy.io import wavfile
 from ..core import config
 from ..core import dsp
+from .results_store import load_results, accuracy_table, mean_table
+
+# 本模块的函数都会写入 images/ 或 audio/
+config.ensure_dirs()
 
 def save_wav(path, rate, data):
     """保存 WAV 文件，确保转换为 int16"""
@@ -121,3 +125,287 @@ def generate_noise_comparison_ffmpeg(key='5'):
     for f in [path_clean, path_noisy]:
         if os.path.exists(f): os.remove(f)
     print(f"Noise comparison generated: {noise_comp_path}")
+
+
+# ========== 基于结果存储的实验绘图 ==========
+# 以下函数只读取 results/<experiment>/ 中的逐次试验记录，重新绘图无需重跑实验
+# run: 'latest' 为最近一次运行，None 为合并全部运行 (包括并行分片)
+
+def plot_adaptive_time_analysis(run='latest'):
+    data = load_results('adaptive_comparison', run=run)
+    snr_range, acc = accuracy_table(data, 'snr')
+    _, latency = mean_table(data, 'latency_ms', 'snr')
+
+    fig, ax1 = plt.subplots(figsize=(10, 6))
+    
+    ax1.plot(snr_range, acc['Standard'], 'b--o', label='Standard (Fixed 200ms)')
+    ax1.plot(snr_range, acc['Adaptive'], 'g-^', label='Adaptive (Variable Time)', linewidth=2)
+    ax1.set_xlabel('SNR (dB)')
+    ax1.set_ylabel('Accuracy', color='k')
+    ax1.set_ylim(0, 1.05)
+    ax1.legend(loc='upper left')
+    ax1.grid(True, alpha=0.3)
+    
+    ax2 = ax1.twinx()
+    ax2.plot(snr_range, latency['Adaptive'], 'r:', label='Avg Detection Time', linewidth=2)
+    ax2.set_ylabel('Time Cost (ms)', color='r')
+    ax2.set_ylim(0, 1100)
+    ax2.legend(loc='center right')
+    
+    plt.title('Adaptive Time-Integration Performance Analysis')
+    out_path = os.path.join(config.IMG_DIR, 'adaptive_time_analysis.png')
+    plt.savefig(out_path)
+    print(f"\nPlot saved to {out_path}")
+
+
+def plot_adaptive_cost_distribution(run='latest'):
+    """
+    自适应检测的代价分布：
+    左图为各 SNR 下实际积分时长 (决策延迟) 的箱线图，右图为 Standard / Adaptive 单次检测 CPU 时间的分布
+    """
+    data = load_results('adaptive_comparison', run=run)
+    adaptive = data['algorithm'] == 'Adaptive'
+    snr_range = np.unique(data['snr'][adaptive])
+    latency = data['latency_ms'].astype(float)
+    cpu = data['cpu_ms'].astype(float)
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+
+    groups = [latency[adaptive & (data['snr'] == snr)] for snr in snr_range]
+    ax1.boxplot([g[~np.isnan(g)] for g in groups])
+    ax1.set_xticks(np.arange(1, len(snr_range) + 1), [f"{snr:g}" for snr in snr_range])
+    ax1.axhline(200, color='b', linestyle='--', label='Standard (Fixed 200ms)')
+    ax1.set_xlabel('SNR (dB)')
+    ax1.set_ylabel('Integration Time (ms)')
+    ax1.set_title('Adaptive Integration Latency')
+    ax1.legend(loc='upper right')
+    ax1.grid(True, alpha=0.3)
+
+    valid = cpu[~np.isnan(cpu) & (cpu > 0)]
+    bins = np.logspace(np.log10(valid.min()), np.log10(valid.max()), 40) if len(valid) else 40
+    for name, color in (('Standard', 'b'), ('Adaptive', 'g')):
+        values = cpu[(data['algorithm'] == name) & ~np.isnan(cpu)]
+        ax2.hist(values, bins=bins, alpha=0.5, color=color,
+                 label=f"{name} (median {np.median(values):.3f}ms)")
+    ax2.set_xscale('log')
+    ax2.set_xlabel('CPU Time per Detection (ms)')
+    ax2.set_ylabel('Count')
+    ax2.set_title('Compute Cost')
+    ax2.legend()
+    ax2.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    out_path = os.path.join(config.IMG_DIR, 'adaptive_cost_distribution.png')
+    plt.savefig(out_path)
+    print(f"Plot saved to {out_path}")
+
+
+def plot_cascade_comparison(run='latest'):
+    """
+    级联检测对比：左图为 DTMF 帧的准确率 vs SNR，右图为每帧平均 CPU 时间 (标注升级比例与误报率)
+    """
+    data = load_results('cascade_comparison', run=run)
+    snr_range, acc = accuracy_table(data, 'snr', where={'kind': 'dtmf'})
+    names = list(acc)
+    cpu = data['cpu_ms'].astype(float)
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 6))
+    styles = {'Goertzel': 'b-o', 'RF': 'g-s', 'CNN': 'm-^', 'Cascade(RF)': 'g--D', 'Cascade(CNN)': 'r--D'}
+    for name in names:
+        ax1.plot(snr_range, acc[name], styles.get(name, '-o'), label=name)
+    ax1.set_xlabel('SNR (dB)')
+    ax1.set_ylabel('Accuracy (DTMF frames)')
+    ax1.set_ylim(0, 1.05)
+    ax1.set_title('Accuracy on DTMF Frames')
+    ax1.legend()
+    ax1.grid(True, alpha=0.3)
+
+    means = [np.nanmean(cpu[data['algorithm'] == name]) for name in names]
+    bars = ax2.bar(names, means, color=['b', 'g', 'm', 'lightgreen', 'salmon'][:len(names)])
+    for bar, name in zip(bars, names):
+        rows = data['algorithm'] == name
+        non_dtmf = rows & (data['kind'] != 'dtmf')
+        label = f"FA {np.mean(data['prediction'][non_dtmf] != ''):.1%}"
+        if name.startswith('Cascade'):
+            label += f"\nesc {np.mean(data['stage'][rows] != 'gate'):.1%}"
+        ax2.annotate(label, (bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                     ha='center', va='bottom', fontsize=9)
+    ax2.set_yscale('log')
+    ax2.set_ylabel('Mean CPU Time per Frame (ms)')
+    ax2.set_title('Compute Cost (FA = false alarms on silence / speech)')
+    ax2.grid(True, axis='y', alpha=0.3)
+
+    plt.tight_layout()
+    out_path = os.path.join(config.IMG_DIR, 'cascade_comparison.png')
+    plt.savefig(out_path, dpi=150)
+    print(f"\nPlot saved: {out_path}")
+
+
+def plot_fixed_point_study(run='latest'):
+    """
+    定点位宽研究：左图为最宽累加器下各系数位宽的准确率 vs SNR (与 Float64 对比)，
+    其余每种输入格式一张热图，为 coef_bits × acc_bits 下与浮点判决的一致率
+    """
+    data = load_results('fixed_point_study', run=run)
+    fixed = data['input_format'] != 'float64'
+    formats = list(dict.fromkeys(data['input_format'][fixed]))
+    coef_bits = np.unique(data['coef_bits'][fixed]).astype(int)
+    acc_bits = np.unique(data['acc_bits'][fixed]).astype(int)
+    agree = data['agree'].astype(float)
+
+    fig, axes = plt.subplots(1, 1 + len(formats), figsize=(6 * (1 + len(formats)), 5))
+    ax = axes[0]
+    snr_range, acc = accuracy_table(data, 'snr')
+    ax.plot(snr_range, acc['Float64'], 'k-o', linewidth=2, label='Float64')
+    for fmt, style in zip(formats, ('-', '--')):
+        for cb in coef_bits:
+            ax.plot(snr_range, acc[f"{fmt} c{cb}/a{acc_bits[-1]}"], style, label=f"{fmt} c{cb}/a{acc_bits[-1]}")
+    ax.set_xlabel('SNR (dB)')
+    ax.set_ylabel('Accuracy')
+    ax.set_ylim(0, 1.05)
+    ax.set_title('Accuracy vs SNR')
+    ax.legend(fontsize=8)
+    ax.grid(True, alpha=0.3)
+
+    for ax, fmt in zip(axes[1:], formats):
+        grid = np.array([[np.mean(agree[(data['input_format'] == fmt) & (data['coef_bits'] == cb)
+                                        & (data['acc_bits'] == ab)]) for ab in acc_bits] for cb in coef_bits])
+        im = ax.imshow(grid, vmin=0, vmax=1, cmap='viridis', origin='lower', aspect='auto')
+        for (i, j), v in np.ndenumerate(grid):
+            ax.text(j, i, f"{v:.0%}", ha='center', va='center', color='w' if v < 0.6 else 'k', fontsize=9)
+        ax.set_xticks(range(len(acc_bits)), acc_bits)
+        ax.set_yticks(range(len(coef_bits)), coef_bits)
+        ax.set_xlabel('Accumulator bits')
+        ax.set_ylabel('Coefficient bits')
+        ax.set_title(f'{fmt} input: agreement with Float64')
+    fig.colorbar(im, ax=axes[1:].tolist(), shrink=0.8)
+
+    out_path = os.path.join(config.IMG_DIR, 'fixed_point_study.png')
+    plt.savefig(out_path, dpi=150)
+    print(f"\nPlot saved: {out_path}")
+
+
+def plot_esc50_comparison(run='latest'):
+    data = load_results('esc50_comparison', run=run)
+    snr_range, acc = accuracy_table(data, 'snr')
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(snr_range, acc['Goertzel'], 'b-o', label='Goertzel (200ms)')
+    plt.plot(snr_range, acc['Random Forest'], 'g-s', label='Random Forest (200ms)')
+    plt.plot(snr_range, acc['MUSIC'], 'm-x', label='MUSIC (200ms)')
+    plt.plot(snr_range, acc['Adaptive'], 'r-^', label='Adaptive (Var-Time)', linewidth=2)
+    
+    plt.xlabel('SNR (dB)')
+    plt.ylabel('Accuracy')
+    plt.title('Real-World Noise (ESC-50) Robustness Comparison')
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.ylim(0, 1.05)
+    
+    out_path = os.path.join(config.IMG_DIR, 'esc50_noise_comparison.png')
+    plt.savefig(out_path, dpi=150)
+    print(f"\nPlot saved to {out_path}")
+
+
+def plot_realistic_noise_comparison(run='latest'):
+    data = load_results('realistic_noise_comparison', run=run)
+    noise_types = ['impulse', 'pink', 'voice', 'mixed']
+    titles = {
+        'impulse': 'Impulse Noise (Electrical Interference)',
+        'pink': 'Pink Noise (Environmental)',
+        'voice': 'Voice Interference (Talk-off Test)',
+        'mixed': 'Mixed Realistic Noise'
+    }
+
+    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    axes = axes.flatten()
+    
+    for idx, noise_type in enumerate(noise_types):
+        ax = axes[idx]
+        severity_levels, acc = accuracy_table(data, 'severity', where={'noise_type': noise_type})
+        g_arr, c_arr = acc['Goertzel'], acc['CNN']
+        ax.plot(severity_levels, g_arr, 'b-o', 
+                label='Goertzel', linewidth=2, markersize=6)
+        ax.plot(severity_levels, c_arr, 'm-^', 
+                label='CNN', linewidth=2, markersize=6)
+        
+        # 高亮 CNN 优势区域
+        ax.fill_between(severity_levels, g_arr, c_arr,
+                        where=c_arr > g_arr,
+                        alpha=0.3, color='purple', label='CNN advantage')
+        
+        ax.set_title(titles[noise_type], fontsize=12)
+        ax.set_xlabel('Noise Severity (0=clean, 1=severe)')
+        ax.set_ylabel('Accuracy')
+        ax.legend(loc='lower left')
+        ax.grid(True, alpha=0.3)
+        ax.set_ylim(0, 1.05)
+    
+    plt.suptitle('DTMF Detection: Goertzel vs CNN in Realistic Noise', fontsize=14, y=1.02)
+    plt.tight_layout()
+    
+    out_path = os.path.join(config.IMG_DIR, 'realistic_noise_comparison.png')
+    plt.savefig(out_path, dpi=150, bbox_inches='tight')
+    print(f"\nPlot saved: {out_path}")
+
+
+def plot_talkoff_test(run='latest'):
+    data = load_results('talkoff_test', run=run)
+    talkoff_levels, acc = accuracy_table(data, 'level')
+    g_arr, c_arr = acc['Goertzel'], acc['CNN']
+
+    plt.figure(figsize=(12, 7))
+    plt.plot(talkoff_levels, g_arr, 'b-o', label='Goertzel', linewidth=2, markersize=6)
+    plt.plot(talkoff_levels, c_arr, 'm-^', label='CNN', linewidth=2, markersize=6)
+    
+    # 填充优势区域
+    plt.fill_between(talkoff_levels, g_arr, c_arr,
+                     where=c_arr > g_arr,
+                     alpha=0.3, color='purple', label='CNN wins')
+    plt.fill_between(talkoff_levels, g_arr, c_arr,
+                     where=g_arr > c_arr,
+                     alpha=0.3, color='blue', label='Goertzel wins')
+    
+    plt.axhline(y=0.95, color='orange', linestyle=':', alpha=0.7)
+    plt.xlabel('Talk-off Interference Level (relative to DTMF)', fontsize=12)
+    plt.ylabel('Accuracy', fontsize=12)
+    plt.title('Talk-off Test: DTMF Detection Under Voice-like Interference', fontsize=14)
+    plt.legend(loc='lower left', fontsize=10)
+    plt.grid(True, alpha=0.3)
+    plt.ylim(0, 1.05)
+    
+    out_path = os.path.join(config.IMG_DIR, 'talkoff_test.png')
+    plt.savefig(out_path, dpi=150, bbox_inches='tight')
+    print(f"\nPlot saved: {out_path}")
+
+
+def plot_window_length_study(run='latest'):
+    data = load_results('window_length_study', run=run)
+    window_lengths = np.unique(data['window_ms'])
+
+    fig, axes = plt.subplots(1, len(window_lengths), figsize=(6 * len(window_lengths), 5), sharey=True)
+    
+    for i, length_ms in enumerate(window_lengths):
+        ax = axes[i]
+        snr_range, dat = accuracy_table(data, 'snr', where={'window_ms': length_ms})
+        
+        ax.plot(snr_range, dat['Goertzel'], 'b-o', label='Goertzel')
+        ax.plot(snr_range, dat['Random Forest'], 'g-s', label='Random Forest')
+        ax.plot(snr_range, dat['MUSIC'], 'r-^', label='MUSIC')
+        
+        ax.set_title(f'Window Length: {length_ms:.0f}ms')
+        ax.set_xlabel('SNR (dB)')
+        ax.grid(True, alpha=0.3)
+        ax.set_ylim(0, 1.05)
+        
+        if i == 0:
+            ax.set_ylabel('Accuracy')
+            ax.legend(loc='lower right')
+            
+    plt.suptitle('Impact of Signal Duration on Detection Algorithms', fontsize=16)
+    plt.tight_layout()
+    
+    out_path = os.path.join(config.IMG_DIR, 'window_length_study.png')
+    plt.savefig(out_path, dpi=150)
+    print(f"\nStudy plot saved to {out_path}")
+